@@ -3,11 +3,14 @@ API v1 主路由
 """
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import users, auth, items
+from app.api.v1.endpoints import users, auth, items, jobs, webhooks, snapshots
 
 api_router = APIRouter()
 
 # 注册各个模块的路由
 api_router.include_router(auth.router, prefix="/auth", tags=["认证"])
 api_router.include_router(users.router, prefix="/users", tags=["用户管理"])
-api_router.include_router(items.router, prefix="/items", tags=["物品管理"]) 
\ No newline at end of file
+api_router.include_router(items.router, prefix="/items", tags=["物品管理"]) 
+api_router.include_router(jobs.router, prefix="/jobs", tags=["后台任务"])
+api_router.include_router(webhooks.router, prefix="/webhooks", tags=["Webhook"])
+api_router.include_router(snapshots.router, prefix="/snapshots", tags=["数据快照"])
@@ -2,13 +2,15 @@
 认证相关的 API 端点 - MongoDB 版本
 """
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.core.auth import verify_password, create_access_token, get_current_user, get_password_hash, get_user_by_username
 from app.core.config import settings
 from app.core.database import get_database
 from app.models.user import UserResponse, UserCreate, UserDocument, Token
+from app.services.idempotency import request_fingerprint, run_idempotent
 from loguru import logger
 
 router = APIRouter()
@@ -73,14 +75,16 @@ async def login(
 @router.post("/register", response_model=UserResponse)
 async def register(
     user_data: UserCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     database = Depends(get_database_dependency)
 ):
     """
     用户注册接口
     
     - **user_data**: 用户注册信息
+    - **Idempotency-Key**: 幂等键（可选），重试时携带相同的键不会重复注册
     """
-    try:
+    async def create():
         # 检查用户名是否已存在
         existing_user = await database.users.find_one({"username": user_data.username})
         if existing_user:
@@ -112,6 +116,15 @@ async def register(
             is_superuser=user_doc.is_superuser,
             created_at=user_doc.created_at
         )
+    
+    try:
+        return await run_idempotent(
+            database,
+            idempotency_key,
+            "auth.register",
+            request_fingerprint(user_data.model_dump()),
+            create
+        )
     except HTTPException:
         raise
     except Exception as e:
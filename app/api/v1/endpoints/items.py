@@ -2,18 +2,44 @@
 物品管理相关的 API 端点 - MongoDB 版本
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
 from bson import ObjectId
 from datetime import datetime
 
 from app.core.auth import get_current_active_user
+from app.core.config import settings
 from app.core.database import get_database
+from app.core.query_guard import check_query
+from app.utils.batch import find_by_ids, parse_object_ids
+from app.utils.counting import COUNT_MODE_EXACT, count_total, set_total_count_headers
+from app.utils.singleflight import SingleFlight
+from app.models.common import BatchGetRequest
 from app.models.user import UserDocument
-from app.models.item import ItemCreate, ItemUpdate, ItemResponse, ItemDocument
+from app.models.item import (
+    ItemCreate, ItemUpdate, ItemResponse, ItemDocument, ItemPage, ImportReport, PriceHistoryResponse, PriceChange,
+    ItemBatchEntry, ItemBatchResponse
+)
+from app.services.catalog import catalog
+from app.services.events import (
+    ITEM_CREATED, ITEM_DELETED, ITEM_UPDATED, ITEMS_IMPORTED, item_events, publish_item_event
+)
+from app.services.idempotency import request_fingerprint, run_idempotent
+from app.services.item_import import FORMAT_CSV, FORMAT_NDJSON, ItemImporter, detect_format
+from app.services.items import (
+    DEFAULT_ITEM_SORT, ITEM_LIST_PROJECTION, ITEM_SORT_PATTERN,
+    build_item_query, list_items_by_owner, parse_item_sort, to_item_response
+)
+from app.services.price_history import (
+    PENDING_PRICE_CHANGES_FIELD, get_price_history, new_price_change, record_price_change, to_naive_utc,
+)
 from loguru import logger
 
 router = APIRouter()
 
+# 热点物品的并发读取合并为一次查询
+item_reads = SingleFlight("items.get_item")
+
 # 获取数据库依赖
 async def get_database_dependency():
     database = get_database()
@@ -23,8 +49,14 @@ async def get_database_dependency():
 
 @router.get("/", response_model=List[ItemResponse])
 async def get_items(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    with_total: bool = False,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    owner_id: Optional[str] = None,
+    sort: str = Query(DEFAULT_ITEM_SORT, pattern=ITEM_SORT_PATTERN),
     current_user: UserDocument = Depends(get_current_active_user),
     database = Depends(get_database_dependency)
 ):
@@ -33,28 +65,159 @@ async def get_items(
     
     - **skip**: 跳过的记录数
     - **limit**: 返回的最大记录数
+    - **with_total**: 是否在 X-Total-Count 响应头中返回总数
+    - **min_price** / **max_price**: 价格范围
+    - **owner_id**: 所有者 ID
+    - **sort**: 排序字段 created_at / price / title，“-” 前缀表示倒序，默认 -created_at
     """
     try:
-        cursor = database.items.find().skip(skip).limit(limit)
-        items = []
-        async for item_data in cursor:
-            # 确保数据格式正确
-            item_data["id"] = item_data.pop("_id", None)
-            item_doc = ItemDocument(**item_data)
-            items.append(ItemResponse(
-                id=str(item_doc.id),
-                title=item_doc.title,
-                description=item_doc.description,
-                price=item_doc.price,
-                owner_id=str(item_doc.owner_id),
-                created_at=item_doc.created_at
-            ))
-        return items
+        if owner_id is not None and not ObjectId.is_valid(owner_id):
+            raise HTTPException(status_code=400, detail="无效的所有者ID")
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise HTTPException(status_code=422, detail="最低价格不能高于最高价格")
+        
+        query = build_item_query(min_price, max_price, ObjectId(owner_id) if owner_id else None)
+        sort_spec = parse_item_sort(sort)
+        await check_query(database.items, query, sort_spec)
+        
+        if with_total:
+            total, mode = await count_total(database.items, query)
+            set_total_count_headers(response, total, mode)
+        
+        cursor = database.items.find(query, ITEM_LIST_PROJECTION).sort(sort_spec).skip(skip).limit(limit)
+        return [to_item_response(item_data) async for item_data in cursor]
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取物品列表失败: {e}")
         raise HTTPException(status_code=500, detail="获取物品列表失败")
 
 
+@router.get("/stream")
+async def stream_item_events(
+    current_user: UserDocument = Depends(get_current_active_user)
+):
+    """
+    物品变更事件流（Server-Sent Events）
+    
+    事件类型：item.created、item.updated、item.deleted、items.imported
+    """
+    if not item_events.has_capacity():
+        raise HTTPException(status_code=503, detail="订阅者数量已达上限")
+    
+    # 在消息流开始后才订阅，客户端在响应开始前断开不会占用订阅名额
+    return StreamingResponse(
+        item_events.open_stream(settings.SSE_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/price-range", response_model=List[ItemResponse])
+async def get_items_by_price_range(
+    response: Response,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: UserDocument = Depends(get_current_active_user),
+    database = Depends(get_database_dependency)
+):
+    """
+    按价格升序浏览价格范围内的物品，总数在 X-Total-Count 响应头中返回
+    
+    启用物品目录内存副本（CATALOG_ENABLED）且加载完成时直接从内存返回，否则查询 MongoDB
+    
+    - **min_price** / **max_price**: 价格范围（含边界）
+    - **skip**: 跳过的记录数
+    - **limit**: 返回的最大记录数
+    """
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=422, detail="最低价格不能高于最高价格")
+    try:
+        if catalog.ready:
+            total, items = catalog.price_range(min_price, max_price, skip, limit)
+        else:
+            query = build_item_query(min_price, max_price)
+            total, mode = await count_total(database.items, query)
+            cursor = database.items.find(query, ITEM_LIST_PROJECTION).sort(
+                parse_item_sort("price")
+            ).skip(skip).limit(limit)
+            items = [to_item_response(item_data) async for item_data in cursor]
+            set_total_count_headers(response, total, mode)
+            return items
+        set_total_count_headers(response, total, COUNT_MODE_EXACT)
+        return items
+    except Exception as e:
+        logger.error(f"按价格范围获取物品失败: {e}")
+        raise HTTPException(status_code=500, detail="按价格范围获取物品失败")
+
+
+@router.get("/cheapest", response_model=List[ItemResponse])
+async def get_cheapest_items(
+    n: int = Query(10, ge=1, le=500),
+    current_user: UserDocument = Depends(get_current_active_user),
+    database = Depends(get_database_dependency)
+):
+    """
+    获取价格最低的 N 个物品（优先从物品目录内存副本返回）
+    
+    - **n**: 返回的物品数量
+    """
+    try:
+        if catalog.ready:
+            return catalog.cheapest(n)
+        cursor = database.items.find({}, ITEM_LIST_PROJECTION).sort(parse_item_sort("price")).limit(n)
+        return [to_item_response(item_data) async for item_data in cursor]
+    except Exception as e:
+        logger.error(f"获取最便宜的物品失败: {e}")
+        raise HTTPException(status_code=500, detail="获取最便宜的物品失败")
+
+
+@router.get("/catalog/status")
+async def get_catalog_status(
+    verify: bool = False,
+    current_user: UserDocument = Depends(get_current_active_user),
+    database = Depends(get_database_dependency)
+):
+    """
+    物品目录内存副本状态
+    
+    - **verify**: 是否同时与 MongoDB 做一致性检查（数量对比和抽样）
+    """
+    try:
+        status_info = catalog.stats()
+        if verify:
+            status_info["consistency"] = await catalog.verify(database, settings.CATALOG_VERIFY_SAMPLE)
+        return status_info
+    except Exception as e:
+        logger.error(f"获取物品目录副本状态失败: {e}")
+        raise HTTPException(status_code=500, detail="获取物品目录副本状态失败")
+
+
+@router.get("/mine", response_model=ItemPage)
+async def get_my_items(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: UserDocument = Depends(get_current_active_user),
+    database = Depends(get_database_dependency)
+):
+    """
+    获取当前用户的物品（按创建时间倒序，游标分页）
+    
+    - **cursor**: 上一页返回的 next_cursor
+    - **limit**: 返回的最大记录数
+    """
+    try:
+        items, next_cursor = await list_items_by_owner(database, current_user.id, cursor, limit)
+        return ItemPage(items=items, next_cursor=next_cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"获取我的物品失败: {e}")
+        raise HTTPException(status_code=500, detail="获取我的物品失败")
+
+
 @router.get("/{item_id}", response_model=ItemResponse)
 async def get_item(
     item_id: str,
@@ -70,11 +233,14 @@ async def get_item(
         if not ObjectId.is_valid(item_id):
             raise HTTPException(status_code=400, detail="无效的物品ID")
         
-        item_data = await database.items.find_one({"_id": ObjectId(item_id)})
+        item_data = await item_reads.do(
+            item_id, lambda: database.items.find_one({"_id": ObjectId(item_id)})
+        )
         if not item_data:
             raise HTTPException(status_code=404, detail="物品不存在")
         
-        # 确保数据格式正确
+        # 结果可能被合并的请求共享，复制后再修改
+        item_data = dict(item_data)
         item_data["id"] = item_data.pop("_id", None)
         item_doc = ItemDocument(**item_data)
         return ItemResponse(
@@ -92,9 +258,44 @@ async def get_item(
         raise HTTPException(status_code=500, detail="获取物品失败")
 
 
+@router.post("/batch-get", response_model=ItemBatchResponse)
+async def batch_get_items(
+    request: BatchGetRequest,
+    current_user: UserDocument = Depends(get_current_active_user),
+    database = Depends(get_database_dependency)
+):
+    """
+    按 ID 批量获取物品，结果顺序与请求一致，不存在的物品 found 为 false
+    
+    - **ids**: 物品 ID 列表（数量上限见 BATCH_GET_MAX_IDS）
+    """
+    try:
+        if len(request.ids) > settings.BATCH_GET_MAX_IDS:
+            raise HTTPException(status_code=400, detail=f"一次最多获取 {settings.BATCH_GET_MAX_IDS} 个物品")
+        try:
+            object_ids = parse_object_ids(request.ids)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        documents = await find_by_ids(database.items, object_ids, ITEM_LIST_PROJECTION)
+        results = [
+            ItemBatchEntry(id=item_id, found=False) if item_data is None
+            else ItemBatchEntry(id=item_id, found=True, item=to_item_response(item_data))
+            for item_id, item_data in zip(request.ids, documents)
+        ]
+        found = sum(1 for entry in results if entry.found)
+        return ItemBatchResponse(results=results, found=found, missing=len(results) - found)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"批量获取物品失败: {e}")
+        raise HTTPException(status_code=500, detail="批量获取物品失败")
+
+
 @router.post("/", response_model=ItemResponse)
 async def create_item(
     item: ItemCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: UserDocument = Depends(get_current_active_user),
     database = Depends(get_database_dependency)
 ):
@@ -102,8 +303,9 @@ async def create_item(
     创建新物品
     
     - **item**: 物品信息
+    - **Idempotency-Key**: 幂等键（可选），重试时携带相同的键不会重复创建
     """
-    try:
+    async def create():
         from app.models.common import PyObjectId
         item_doc = ItemDocument(
             title=item.title,
@@ -112,10 +314,12 @@ async def create_item(
             owner_id=current_user.id if current_user.id else PyObjectId()
         )
         
-        result = await database.items.insert_one(item_doc.dict(by_alias=True))
+        document = item_doc.dict(by_alias=True)
+        result = await database.items.insert_one(document)
         item_doc.id = result.inserted_id
+        catalog.upsert(document)
         
-        return ItemResponse(
+        item_response = ItemResponse(
             id=str(item_doc.id),
             title=item_doc.title,
             description=item_doc.description,
@@ -123,11 +327,60 @@ async def create_item(
             owner_id=str(item_doc.owner_id),
             created_at=item_doc.created_at
         )
+        publish_item_event(ITEM_CREATED, item_response.model_dump())
+        return item_response
+    
+    try:
+        return await run_idempotent(
+            database,
+            idempotency_key,
+            f"items.create:{current_user.id}",
+            request_fingerprint(item.model_dump()),
+            create
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"创建物品失败: {e}")
         raise HTTPException(status_code=500, detail="创建物品失败")
 
 
+@router.post("/import", response_model=ImportReport)
+async def import_items(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern=f"^({FORMAT_CSV}|{FORMAT_NDJSON})$"),
+    current_user: UserDocument = Depends(get_current_active_user),
+    database = Depends(get_database_dependency)
+):
+    """
+    从 CSV 或 NDJSON 文件批量导入物品
+    
+    - **file**: 上传的文件（CSV 表头：title,description,price；NDJSON：每行一个 JSON 对象）
+    - **format**: 文件格式（可选，默认根据文件名或 Content-Type 判断）
+    """
+    try:
+        file_format = format or detect_format(file.filename, file.content_type)
+        if file_format is None:
+            raise HTTPException(status_code=400, detail="无法识别文件格式，请指定 format=csv 或 format=ndjson")
+        
+        await file.seek(0)
+        importer = ItemImporter(database, current_user.id, file_format)
+        await importer.run(file.file)
+        logger.info(
+            f"导入物品完成: 共 {importer.total_rows} 行，成功 {importer.inserted} 行，失败 {importer.failed} 行"
+        )
+        if importer.inserted:
+            publish_item_event(ITEMS_IMPORTED, {"owner_id": str(current_user.id), "inserted": importer.inserted})
+        return importer.report()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"导入物品失败: {e}")
+        raise HTTPException(status_code=500, detail="导入物品失败")
+    finally:
+        await file.close()
+
+
 @router.put("/{item_id}", response_model=ItemResponse)
 async def update_item(
     item_id: str,
@@ -164,23 +417,42 @@ async def update_item(
             update_data["price"] = item_update.price
         
         update_data["updated_at"] = datetime.utcnow()
+        update = {"$set": update_data}
+        
+        # 价格变更随物品更新原子地写入待写列表，写入历史前进程退出时由启动时补写
+        price_change = None
+        if item_update.price is not None and item_update.price != existing_item["price"]:
+            price_change = new_price_change(
+                old_price=existing_item["price"],
+                new_price=item_update.price,
+                changed_by=current_user.id,
+                changed_at=update_data["updated_at"]
+            )
+            update["$push"] = {PENDING_PRICE_CHANGES_FIELD: price_change}
         
         # 更新物品
         await database.items.update_one(
             {"_id": ObjectId(item_id)},
-            {"$set": update_data}
+            update
         )
+        item_reads.forget(item_id)
+        
+        # 记录价格变更历史
+        if price_change is not None:
+            await record_price_change(database, ObjectId(item_id), price_change)
         
         # 获取更新后的物品
         updated_item_data = await database.items.find_one({"_id": ObjectId(item_id)})
         if not updated_item_data:
             raise HTTPException(status_code=404, detail="物品不存在")
         
+        catalog.upsert(updated_item_data)
+        
         # 确保数据格式正确
         updated_item_data["id"] = updated_item_data.pop("_id", None)
         updated_item = ItemDocument(**updated_item_data)
         
-        return ItemResponse(
+        item_response = ItemResponse(
             id=str(updated_item.id),
             title=updated_item.title,
             description=updated_item.description,
@@ -188,6 +460,8 @@ async def update_item(
             owner_id=str(updated_item.owner_id),
             created_at=updated_item.created_at
         )
+        publish_item_event(ITEM_UPDATED, item_response.model_dump())
+        return item_response
     except HTTPException:
         raise
     except Exception as e:
@@ -195,6 +469,49 @@ async def update_item(
         raise HTTPException(status_code=500, detail="更新物品失败")
 
 
+@router.get("/{item_id}/price-history", response_model=PriceHistoryResponse)
+async def get_item_price_history(
+    item_id: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    limit: int = Query(1000, ge=1, le=10000),
+    current_user: UserDocument = Depends(get_current_active_user),
+    database = Depends(get_database_dependency)
+):
+    """
+    获取物品价格历史
+    
+    - **item_id**: 物品 ID
+    - **from**: 开始时间（可选）
+    - **to**: 结束时间（可选）
+    - **limit**: 返回的最大记录数
+    """
+    try:
+        if not ObjectId.is_valid(item_id):
+            raise HTTPException(status_code=400, detail="无效的物品ID")
+        if start and end and to_naive_utc(start) > to_naive_utc(end):
+            raise HTTPException(status_code=400, detail="开始时间不能晚于结束时间")
+        
+        changes = await get_price_history(database, ObjectId(item_id), start, end, limit)
+        return PriceHistoryResponse(
+            item_id=item_id,
+            changes=[
+                PriceChange(
+                    price=change["price"],
+                    old_price=change.get("old_price"),
+                    changed_at=change["changed_at"],
+                    changed_by=str(change["changed_by"]) if change.get("changed_by") else None
+                )
+                for change in changes
+            ]
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取价格历史失败: {e}")
+        raise HTTPException(status_code=500, detail="获取价格历史失败")
+
+
 @router.delete("/{item_id}")
 async def delete_item(
     item_id: str,
@@ -221,6 +538,9 @@ async def delete_item(
         
         # 删除物品
         await database.items.delete_one({"_id": ObjectId(item_id)})
+        item_reads.forget(item_id)
+        catalog.remove(ObjectId(item_id))
+        publish_item_event(ITEM_DELETED, {"id": item_id, "owner_id": str(existing_item["owner_id"])})
         
         return {"message": f"物品 {item_id} 已删除"}
     except HTTPException:
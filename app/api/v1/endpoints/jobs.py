@@ -0,0 +1,57 @@
+"""
+后台任务相关的 API 端点
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from bson import ObjectId
+
+from app.core.auth import get_current_active_user
+from app.core.database import get_database
+from app.models.user import UserDocument
+from app.models.job import JobResponse
+from app.services.jobs import get_job
+from loguru import logger
+
+router = APIRouter()
+
+# 获取数据库依赖
+async def get_database_dependency():
+    database = get_database()
+    if database is None:
+        raise HTTPException(status_code=500, detail="数据库连接失败")
+    return database
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job_status(
+    job_id: str,
+    current_user: UserDocument = Depends(get_current_active_user),
+    database = Depends(get_database_dependency)
+):
+    """
+    获取后台任务状态和进度
+    
+    - **job_id**: 任务 ID
+    """
+    try:
+        if not ObjectId.is_valid(job_id):
+            raise HTTPException(status_code=400, detail="无效的任务ID")
+        
+        job = await get_job(database, ObjectId(job_id))
+        if not job:
+            raise HTTPException(status_code=404, detail="任务不存在")
+        
+        return JobResponse(
+            id=str(job["_id"]),
+            type=job["type"],
+            status=job["status"],
+            processed=job.get("processed", 0),
+            error=job.get("error"),
+            created_at=job["created_at"],
+            updated_at=job.get("updated_at"),
+            finished_at=job.get("finished_at")
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取任务状态失败: {e}")
+        raise HTTPException(status_code=500, detail="获取任务状态失败")
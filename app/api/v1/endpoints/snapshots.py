@@ -0,0 +1,76 @@
+"""
+物品列式快照相关的 API 端点
+"""
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.core.auth import get_current_active_user
+from app.core.database import get_database
+from app.models.user import UserDocument
+from app.models.snapshot import SnapshotInfo, PriceStats
+from app.services.snapshot import SNAPSHOT_FILENAME, build_items_snapshot, read_price_stats, snapshot_path
+from loguru import logger
+
+router = APIRouter()
+
+# 获取数据库依赖
+async def get_database_dependency():
+    database = get_database()
+    if database is None:
+        raise HTTPException(status_code=500, detail="数据库连接失败")
+    return database
+
+
+@router.post("/items", response_model=SnapshotInfo)
+async def build_snapshot(
+    full: bool = False,
+    current_user: UserDocument = Depends(get_current_active_user),
+    database = Depends(get_database_dependency)
+):
+    """
+    构建物品快照
+    
+    - **full**: 是否全量重建（增量构建不会移除已删除的物品）
+    """
+    try:
+        return await build_items_snapshot(database, full=full)
+    except Exception as e:
+        logger.error(f"构建物品快照失败: {e}")
+        raise HTTPException(status_code=500, detail="构建物品快照失败")
+
+
+@router.get("/items")
+async def download_snapshot(
+    current_user: UserDocument = Depends(get_current_active_user)
+):
+    """下载物品快照文件（格式见 app/services/snapshot.py）"""
+    path = snapshot_path()
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="快照不存在，请先构建")
+    return FileResponse(path, media_type="application/octet-stream", filename=SNAPSHOT_FILENAME)
+
+
+@router.get("/items/stats", response_model=PriceStats)
+async def get_snapshot_price_stats(
+    bins: int = Query(20, ge=1, le=1000),
+    top_owners: int = Query(10, ge=0, le=1000),
+    current_user: UserDocument = Depends(get_current_active_user)
+):
+    """
+    基于快照计算价格统计（汇总、百分位数、直方图、按所有者汇总），不访问数据库
+    
+    - **bins**: 直方图区间数
+    - **top_owners**: 返回价格总和最高的所有者数量
+    """
+    try:
+        stats = await run_in_threadpool(read_price_stats, bins, top_owners)
+        if stats is None:
+            raise HTTPException(status_code=404, detail="快照不存在，请先构建")
+        return stats
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"计算快照价格统计失败: {e}")
+        raise HTTPException(status_code=500, detail="计算快照价格统计失败")
@@ -1,14 +1,23 @@
 """
 用户管理相关的 API 端点 - MongoDB 版本
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from bson import ObjectId
 from datetime import datetime
 
-from app.core.auth import get_current_active_user, get_password_hash
+from app.core.auth import get_current_active_user, get_password_hash, user_reads
+from app.core.config import settings
 from app.core.database import get_database
-from app.models.user import UserDocument, UserResponse, UserCreate, UserUpdate
+from app.utils.batch import find_by_ids, parse_object_ids
+from app.utils.counting import count_total, set_total_count_headers
+from app.models.common import BatchGetRequest
+from app.models.user import UserDocument, UserResponse, UserCreate, UserUpdate, UserSummary, UserBatchEntry, UserBatchResponse
+from app.models.item import ItemPage
+from app.services.idempotency import request_fingerprint, run_idempotent
+from app.services.items import list_items_by_owner
+from app.services.jobs import job_runner
+from app.services.users import get_user_summary, to_user_response
 from loguru import logger
 
 router = APIRouter()
@@ -23,8 +32,10 @@ async def get_database_dependency():
 
 @router.get("/", response_model=List[UserResponse])
 async def get_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    with_total: bool = False,
     current_user: UserDocument = Depends(get_current_active_user),
     database = Depends(get_database_dependency)
 ):
@@ -33,8 +44,13 @@ async def get_users(
     
     - **skip**: 跳过的记录数
     - **limit**: 返回的最大记录数
+    - **with_total**: 是否在 X-Total-Count 响应头中返回总数
     """
     try:
+        if with_total:
+            total, mode = await count_total(database.users)
+            set_total_count_headers(response, total, mode)
+        
         cursor = database.users.find().skip(skip).limit(limit)
         users = []
         async for user_data in cursor:
@@ -92,9 +108,102 @@ async def get_user(
         raise HTTPException(status_code=500, detail="获取用户失败")
 
 
+@router.get("/{user_id}/summary", response_model=UserSummary)
+async def get_user_summary_info(
+    user_id: str,
+    recent: int = Query(5, ge=1, le=50),
+    current_user: UserDocument = Depends(get_current_active_user),
+    database = Depends(get_database_dependency)
+):
+    """
+    获取用户概览：用户信息、物品数量、价格统计和最近的物品（一次聚合查询）
+    
+    - **user_id**: 用户 ID
+    - **recent**: 返回最近物品的数量
+    """
+    try:
+        if not ObjectId.is_valid(user_id):
+            raise HTTPException(status_code=400, detail="无效的用户ID")
+        
+        summary = await get_user_summary(database, ObjectId(user_id), recent)
+        if summary is None:
+            raise HTTPException(status_code=404, detail="用户不存在")
+        return summary
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取用户概览失败: {e}")
+        raise HTTPException(status_code=500, detail="获取用户概览失败")
+
+
+@router.get("/{user_id}/items", response_model=ItemPage)
+async def get_user_items(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: UserDocument = Depends(get_current_active_user),
+    database = Depends(get_database_dependency)
+):
+    """
+    获取指定用户的物品（按创建时间倒序，游标分页）
+    
+    - **user_id**: 用户 ID
+    - **cursor**: 上一页返回的 next_cursor
+    - **limit**: 返回的最大记录数
+    """
+    try:
+        if not ObjectId.is_valid(user_id):
+            raise HTTPException(status_code=400, detail="无效的用户ID")
+        
+        items, next_cursor = await list_items_by_owner(database, ObjectId(user_id), cursor, limit)
+        return ItemPage(items=items, next_cursor=next_cursor)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"获取用户物品失败: {e}")
+        raise HTTPException(status_code=500, detail="获取用户物品失败")
+
+
+@router.post("/batch-get", response_model=UserBatchResponse)
+async def batch_get_users(
+    request: BatchGetRequest,
+    current_user: UserDocument = Depends(get_current_active_user),
+    database = Depends(get_database_dependency)
+):
+    """
+    按 ID 批量获取用户，结果顺序与请求一致，不存在的用户 found 为 false
+    
+    - **ids**: 用户 ID 列表（数量上限见 BATCH_GET_MAX_IDS）
+    """
+    try:
+        if len(request.ids) > settings.BATCH_GET_MAX_IDS:
+            raise HTTPException(status_code=400, detail=f"一次最多获取 {settings.BATCH_GET_MAX_IDS} 个用户")
+        try:
+            object_ids = parse_object_ids(request.ids)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        documents = await find_by_ids(database.users, object_ids, {"hashed_password": 0})
+        results = [
+            UserBatchEntry(id=user_id, found=False) if user_data is None
+            else UserBatchEntry(id=user_id, found=True, user=to_user_response(user_data))
+            for user_id, user_data in zip(request.ids, documents)
+        ]
+        found = sum(1 for entry in results if entry.found)
+        return UserBatchResponse(results=results, found=found, missing=len(results) - found)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"批量获取用户失败: {e}")
+        raise HTTPException(status_code=500, detail="批量获取用户失败")
+
+
 @router.post("/", response_model=UserResponse)
 async def create_user(
     user: UserCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: UserDocument = Depends(get_current_active_user),
     database = Depends(get_database_dependency)
 ):
@@ -102,8 +211,9 @@ async def create_user(
     创建新用户
     
     - **user**: 用户信息
+    - **Idempotency-Key**: 幂等键（可选），重试时携带相同的键不会重复创建
     """
-    try:
+    async def create():
         # 检查用户名是否已存在
         existing_user = await database.users.find_one({"username": user.username})
         if existing_user:
@@ -135,6 +245,15 @@ async def create_user(
             is_superuser=user_doc.is_superuser,
             created_at=user_doc.created_at
         )
+    
+    try:
+        return await run_idempotent(
+            database,
+            idempotency_key,
+            f"users.create:{current_user.id}",
+            request_fingerprint(user.model_dump()),
+            create
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -195,6 +314,7 @@ async def update_user(
             {"_id": ObjectId(user_id)},
             {"$set": update_data}
         )
+        user_reads.forget(existing_user["username"])
         
         # 获取更新后的用户
         updated_user_data = await database.users.find_one({"_id": ObjectId(user_id)})
@@ -222,27 +342,52 @@ async def update_user(
 @router.delete("/{user_id}")
 async def delete_user(
     user_id: str,
+    reassign_to: Optional[str] = None,
     current_user: UserDocument = Depends(get_current_active_user),
     database = Depends(get_database_dependency)
 ):
     """
-    删除用户
+    删除用户，其物品由后台任务分批删除（或转移给 reassign_to 指定的用户）
     
     - **user_id**: 用户 ID
+    - **reassign_to**: 接收物品的用户 ID（可选，不传则删除物品）
     """
     try:
         if not ObjectId.is_valid(user_id):
             raise HTTPException(status_code=400, detail="无效的用户ID")
+        if reassign_to is not None:
+            if not ObjectId.is_valid(reassign_to):
+                raise HTTPException(status_code=400, detail="无效的接收用户ID")
+            if reassign_to == user_id:
+                raise HTTPException(status_code=400, detail="不能将物品转移给被删除的用户")
+            if not await database.users.find_one({"_id": ObjectId(reassign_to)}, {"_id": 1}):
+                raise HTTPException(status_code=404, detail="接收物品的用户不存在")
         
         # 检查用户是否存在
         existing_user = await database.users.find_one({"_id": ObjectId(user_id)})
         if not existing_user:
             raise HTTPException(status_code=404, detail="用户不存在")
         
-        # 删除用户
-        await database.users.delete_one({"_id": ObjectId(user_id)})
+        # 物品的级联处理交给后台任务：先创建任务记录，任务创建失败时不删除用户
+        job = await job_runner.create_user_items_cascade(
+            ObjectId(user_id),
+            ObjectId(reassign_to) if reassign_to else None
+        )
+        
+        # 删除用户，失败时撤销任务记录
+        try:
+            result = await database.users.delete_one({"_id": ObjectId(user_id)})
+        except Exception:
+            await job_runner.discard(job["_id"])
+            raise
+        if result.deleted_count == 0:
+            await job_runner.discard(job["_id"])
+            raise HTTPException(status_code=404, detail="用户不存在")
+        user_reads.forget(existing_user["username"])
+        
+        job_runner.submit(job)
         
-        return {"message": f"用户 {user_id} 已删除"}
+        return {"message": f"用户 {user_id} 已删除", "job_id": str(job["_id"])}
     except HTTPException:
         raise
     except Exception as e:
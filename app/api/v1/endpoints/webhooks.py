@@ -0,0 +1,162 @@
+"""
+Webhook 订阅管理相关的 API 端点
+"""
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from bson import ObjectId
+from datetime import datetime
+
+from app.core.auth import get_current_active_user
+from app.core.database import get_database
+from app.models.user import UserDocument
+from app.models.webhook import WebhookCreate, WebhookResponse, WebhookDeadLetter
+from app.services.events import ITEM_EVENT_TYPES
+from app.services.webhooks import (
+    DEAD_LETTERS_COLLECTION,
+    WEBHOOKS_COLLECTION,
+    WebhookURLError,
+    validate_webhook_url,
+    webhook_dispatcher,
+)
+from loguru import logger
+
+router = APIRouter()
+
+# 获取数据库依赖
+async def get_database_dependency():
+    database = get_database()
+    if database is None:
+        raise HTTPException(status_code=500, detail="数据库连接失败")
+    return database
+
+
+def to_webhook_response(webhook: dict) -> WebhookResponse:
+    return WebhookResponse(
+        id=str(webhook["_id"]),
+        url=webhook["url"],
+        events=webhook.get("events", []),
+        is_active=webhook.get("is_active", True),
+        created_at=webhook["created_at"]
+    )
+
+
+@router.get("/", response_model=List[WebhookResponse])
+async def get_webhooks(
+    current_user: UserDocument = Depends(get_current_active_user),
+    database = Depends(get_database_dependency)
+):
+    """获取当前用户的 Webhook 订阅"""
+    try:
+        cursor = database[WEBHOOKS_COLLECTION].find({"owner_id": current_user.id})
+        return [to_webhook_response(webhook) async for webhook in cursor]
+    except Exception as e:
+        logger.error(f"获取 Webhook 列表失败: {e}")
+        raise HTTPException(status_code=500, detail="获取 Webhook 列表失败")
+
+
+@router.post("/", response_model=WebhookResponse)
+async def create_webhook(
+    webhook: WebhookCreate,
+    current_user: UserDocument = Depends(get_current_active_user),
+    database = Depends(get_database_dependency)
+):
+    """
+    创建 Webhook 订阅
+    
+    - **url**: 接收事件的地址（https，不能指向内网地址），事件以 {"events": [...]} 的形式批量 POST
+    - **events**: 订阅的事件类型（item.created、item.updated、item.deleted、items.imported），为空表示全部
+    - **secret**: 可选的签名密钥
+    """
+    try:
+        unknown = [event for event in webhook.events if event not in ITEM_EVENT_TYPES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"不支持的事件类型: {', '.join(unknown)}")
+        try:
+            await validate_webhook_url(str(webhook.url))
+        except WebhookURLError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        webhook_doc = {
+            "url": str(webhook.url),
+            "events": list(dict.fromkeys(webhook.events)),
+            "secret": webhook.secret,
+            "owner_id": current_user.id,
+            "is_active": True,
+            "created_at": datetime.utcnow(),
+        }
+        result = await database[WEBHOOKS_COLLECTION].insert_one(webhook_doc)
+        webhook_doc["_id"] = result.inserted_id
+        await webhook_dispatcher.reload_subscriptions()
+        
+        return to_webhook_response(webhook_doc)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"创建 Webhook 失败: {e}")
+        raise HTTPException(status_code=500, detail="创建 Webhook 失败")
+
+
+@router.get("/dead-letters", response_model=List[WebhookDeadLetter])
+async def get_dead_letters(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: UserDocument = Depends(get_current_active_user),
+    database = Depends(get_database_dependency)
+):
+    """
+    获取当前用户的 Webhook 投递失败记录（最新的在前）
+    
+    - **limit**: 返回的最大记录数
+    """
+    try:
+        webhook_ids = await database[WEBHOOKS_COLLECTION].distinct("_id", {"owner_id": current_user.id})
+        cursor = database[DEAD_LETTERS_COLLECTION].find(
+            {"webhook_id": {"$in": webhook_ids}}
+        ).sort("created_at", -1).limit(limit)
+        return [
+            WebhookDeadLetter(
+                id=str(record["_id"]),
+                webhook_id=str(record["webhook_id"]) if record.get("webhook_id") else None,
+                url=record["url"],
+                events=record["events"],
+                error=record.get("error"),
+                attempts=record["attempts"],
+                created_at=record["created_at"]
+            )
+            async for record in cursor
+        ]
+    except Exception as e:
+        logger.error(f"获取 Webhook 死信失败: {e}")
+        raise HTTPException(status_code=500, detail="获取 Webhook 死信失败")
+
+
+@router.delete("/{webhook_id}")
+async def delete_webhook(
+    webhook_id: str,
+    current_user: UserDocument = Depends(get_current_active_user),
+    database = Depends(get_database_dependency)
+):
+    """
+    删除 Webhook 订阅
+    
+    - **webhook_id**: 订阅 ID
+    """
+    try:
+        if not ObjectId.is_valid(webhook_id):
+            raise HTTPException(status_code=400, detail="无效的 Webhook ID")
+        
+        webhook = await database[WEBHOOKS_COLLECTION].find_one({"_id": ObjectId(webhook_id)})
+        if not webhook:
+            raise HTTPException(status_code=404, detail="Webhook 不存在")
+        
+        if webhook["owner_id"] != current_user.id:
+            raise HTTPException(status_code=403, detail="没有权限删除此 Webhook")
+        
+        await database[WEBHOOKS_COLLECTION].delete_one({"_id": ObjectId(webhook_id)})
+        await webhook_dispatcher.reload_subscriptions()
+        
+        return {"message": f"Webhook {webhook_id} 已删除"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"删除 Webhook 失败: {e}")
+        raise HTTPException(status_code=500, detail="删除 Webhook 失败")
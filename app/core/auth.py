@@ -13,6 +13,7 @@ from bson import ObjectId
 from app.core.config import settings
 from app.models.user import UserDocument
 from app.core.database import get_database
+from app.utils.singleflight import SingleFlight
 
 # 密码加密上下文
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -20,6 +21,9 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # JWT Bearer 认证
 security = HTTPBearer()
 
+# 同一用户的并发鉴权查询合并为一次
+user_reads = SingleFlight("users.get_user_by_username")
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
@@ -57,11 +61,16 @@ def verify_token(token: str) -> Optional[dict]:
 
 
 async def get_user_by_username(username: str) -> Optional[UserDocument]:
-    """根据用户名获取用户"""
+    """根据用户名获取用户（并发的相同查询会被合并，返回的对象不应被修改）"""
     database = get_database()
     if database is None:
         return None
     
+    return await user_reads.do(username, lambda: _find_user_by_username(database, username))
+
+
+async def _find_user_by_username(database, username: str) -> Optional[UserDocument]:
+    """从 MongoDB 查询用户"""
     user_data = await database.users.find_one({"username": username})
     if user_data:
         # 确保数据格式正确
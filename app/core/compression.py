@@ -0,0 +1,105 @@
+"""
+响应压缩工具
+
+- 根据 Accept-Encoding 选择编码：安装了 brotli 时优先 br，其次 gzip
+- StreamCompressor 支持增量压缩，每个分块压缩后立即 flush，流式响应（如 SSE）不会被缓冲
+- PrecompressedPayload 保存一次生成、预先压缩好的静态内容（如 OpenAPI 文档）
+"""
+import hashlib
+import zlib
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只使用 gzip
+    brotli = None
+
+GZIP = "gzip"
+BROTLI = "br"
+
+
+def supported_encodings():
+    return (BROTLI, GZIP) if brotli is not None else (GZIP,)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """按 Accept-Encoding（含 q 值）选择服务端支持的编码，都不可接受时返回 None"""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in supported_encodings():
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    """内容类型是否在允许压缩的列表中（忽略 charset 等参数）"""
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type in settings.COMPRESSION_CONTENT_TYPES
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """一次性压缩完整内容"""
+    compressor = StreamCompressor(encoding, level)
+    return compressor.compress(data, flush=False) + compressor.finish()
+
+
+class StreamCompressor:
+    """增量压缩器"""
+
+    def __init__(self, encoding: str, level: Optional[int] = None):
+        self.encoding = encoding
+        if encoding == BROTLI:
+            quality = settings.COMPRESSION_BROTLI_QUALITY if level is None else level
+            self._compressor = brotli.Compressor(quality=quality)
+        else:
+            level = settings.COMPRESSION_GZIP_LEVEL if level is None else level
+            # wbits=31 输出 gzip 格式
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool = True) -> bytes:
+        """压缩一个分块；flush 为 True 时立即输出已压缩的数据"""
+        if self.encoding == BROTLI:
+            output = self._compressor.process(data)
+            return output + self._compressor.flush() if flush else output
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else output
+
+    def finish(self) -> bytes:
+        if self.encoding == BROTLI:
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class PrecompressedPayload:
+    """预先按所有支持的编码压缩好的内容，请求时按 Accept-Encoding 直接返回"""
+
+    def __init__(self, body: bytes, media_type: str):
+        self.media_type = media_type
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        # 只在生成时压缩一次，使用最高压缩级别
+        self.variants: Dict[Optional[str], bytes] = {None: body, GZIP: compress(body, GZIP, 9)}
+        if brotli is not None:
+            self.variants[BROTLI] = compress(body, BROTLI, 11)
+
+    def select(self, accept_encoding: str):
+        """返回 (编码, 内容)，编码为 None 表示未压缩"""
+        encoding = choose_encoding(accept_encoding)
+        return encoding, self.variants[encoding]
@@ -1,7 +1,7 @@
 """
 应用配置管理
 """
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -31,18 +31,170 @@ class Settings(BaseSettings):
     # 数据库配置
     MONGODB_URL: str = "mongodb://localhost:27017"
     MONGODB_DB_NAME: str = "fastapi-learning-db"
+    # 连接池最大连接数
+    MONGODB_MAX_POOL_SIZE: int = 100
+    
+    # 数据库往返预算：每个请求允许的 MongoDB 操作次数，0 表示不限制
+    DB_ROUNDTRIP_BUDGET: int = 10
+    # 按路由模板覆盖预算，如 {"/api/v1/users/{user_id}": 6}
+    DB_ROUNDTRIP_BUDGETS: Dict[str, int] = {"/api/v1/items/import": 0, "/api/v1/snapshots/items": 0}
+    # 严格模式下超出预算直接抛出异常（用于测试），否则只记录警告
+    DB_ROUNDTRIP_BUDGET_STRICT: bool = False
+    
+    # 健康检查配置
+    # 就绪检查结果缓存时间（秒）
+    HEALTH_CACHE_SECONDS: float = 2.0
+    # MongoDB ping 超时（毫秒）
+    HEALTH_MONGO_TIMEOUT_MS: int = 500
+    # MongoDB ping 延迟阈值（毫秒）
+    HEALTH_MAX_MONGO_PING_MS: float = 250.0
+    # 连接池饱和度阈值（已借出 / 最大连接数）
+    HEALTH_MAX_POOL_SATURATION: float = 0.9
+    # 事件循环延迟阈值（毫秒）
+    HEALTH_MAX_LOOP_LAG_MS: float = 200.0
+    # 事件循环延迟采样间隔（毫秒）
+    HEALTH_LOOP_LAG_INTERVAL_MS: int = 100
+    
+    # 事件循环阻塞监控（默认关闭）
+    WATCHDOG_ENABLED: bool = False
+    # 事件循环未让出控制权超过该时间（毫秒）即记录调用栈
+    WATCHDOG_THRESHOLD_MS: float = 100.0
+    
+    # 物品价格历史配置
+    # 分桶时间窗口（小时）
+    PRICE_HISTORY_BUCKET_HOURS: int = 24
+    # 单个桶最多记录的变更数，超过后新建桶
+    PRICE_HISTORY_BUCKET_SIZE: int = 200
+    
+    # 删除用户后级联处理物品的后台任务配置
+    # 每批处理的物品数
+    CASCADE_BATCH_SIZE: int = 500
+    # 批次之间的休眠时间（毫秒），避免影响前台请求
+    CASCADE_THROTTLE_MS: int = 50
+    
+    # 幂等键配置
+    # 幂等键保留时间（秒）
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    # 重复请求等待第一个请求完成的最长时间（秒）
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
+    # 处理中记录的租约时长（秒），过期后重复请求可以接管执行；应大于请求截止时间上限
+    IDEMPOTENCY_LEASE_SECONDS: float = 120.0
+    
+    # 物品批量导入配置
+    # 每批解析和写入的行数
+    IMPORT_BATCH_SIZE: int = 1000
+    # 错误报告中最多返回的行数
+    IMPORT_MAX_ERRORS: int = 1000
+    
+    # 请求截止时间配置（毫秒），客户端可通过 X-Request-Timeout 请求头缩短或延长（不超过上限）
+    REQUEST_DEADLINE_DEFAULT_MS: int = 10000
+    # 请求头允许的最大值
+    REQUEST_DEADLINE_MAX_MS: int = 60000
+    # 按路由模板覆盖默认值，0 表示不设截止时间
+    REQUEST_DEADLINE_ROUTES: Dict[str, int] = {
+        "/api/v1/items/import": 0, "/api/v1/items/stream": 0, "/api/v1/snapshots/items": 0
+    }
+    
+    # 查询索引守卫（仅 DEBUG 模式生效）：off 关闭，warn 记录警告，reject 拒绝全表扫描或内存排序的查询
+    QUERY_GUARDRAIL_MODE: str = "warn"
+    
+    # 按 ID 批量读取的最大 ID 数量
+    BATCH_GET_MAX_IDS: int = 200
+    
+    # 物品变更事件流（SSE）配置
+    # 每个订阅者的队列长度，积压超过该值的订阅者会被断开
+    SSE_QUEUE_SIZE: int = 100
+    # 单个进程的最大订阅者数量
+    SSE_MAX_SUBSCRIBERS: int = 10000
+    # 心跳间隔（秒）
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+    # 客户端断线重连间隔（毫秒）
+    SSE_RETRY_MS: int = 3000
+    
+    # Webhook 投递配置
+    # 待投递事件队列长度，队列满时丢弃新事件
+    WEBHOOK_QUEUE_SIZE: int = 10000
+    # 投递 worker 数量
+    WEBHOOK_WORKERS: int = 2
+    # 每批最多事件数，以及凑批的最长等待时间（毫秒）
+    WEBHOOK_BATCH_SIZE: int = 50
+    WEBHOOK_BATCH_WAIT_MS: int = 200
+    # 每个订阅待投递的最大批数，订阅地址慢或不可用导致积压超过该值时新批次直接写入死信
+    WEBHOOK_ENDPOINT_QUEUE_SIZE: int = 100
+    # 失败重试次数和首次重试间隔（毫秒，之后指数增长）
+    WEBHOOK_MAX_RETRIES: int = 3
+    WEBHOOK_RETRY_BACKOFF_MS: int = 500
+    # 单次请求超时（秒）和连接池大小
+    WEBHOOK_TIMEOUT_SECONDS: float = 5.0
+    WEBHOOK_MAX_CONNECTIONS: int = 20
+    # 从数据库刷新订阅列表的间隔（秒）
+    WEBHOOK_REFRESH_SECONDS: int = 30
+    # 允许投递的内网主机白名单：这些主机可以使用 http，且不检查解析出的地址是否为公网地址
+    WEBHOOK_ALLOWED_HOSTS: List[str] = []
+    
+    # 物品列式快照配置
+    # 快照文件目录
+    SNAPSHOT_DIR: str = "data/snapshots"
+    # 构建时每批读取的文档数
+    SNAPSHOT_BATCH_SIZE: int = 5000
+    # 增量构建时水位线回退的秒数，覆盖写入时间早于提交时间的物品
+    SNAPSHOT_WATERMARK_LAG_SECONDS: int = 5
+    # 定期增量构建的间隔（秒），0 表示关闭
+    SNAPSHOT_REFRESH_SECONDS: int = 0
+    # 距上次全量构建超过该时间（小时）时改为全量重建，移除已删除的物品，0 表示从不自动全量重建
+    SNAPSHOT_FULL_REBUILD_HOURS: int = 24
+    
+    # 物品目录内存副本配置（价格范围查询和最便宜的 N 个物品）
+    CATALOG_ENABLED: bool = False
+    # 内存预算（MB），超出后副本停用，查询回退到 MongoDB
+    CATALOG_MAX_MEMORY_MB: int = 256
+    # 加载时每批读取的文档数
+    CATALOG_LOAD_BATCH_SIZE: int = 5000
+    # 与 MongoDB 一致性检查的间隔（秒，0 表示关闭）和抽样数量
+    CATALOG_VERIFY_SECONDS: int = 300
+    CATALOG_VERIFY_SAMPLE: int = 100
+    
+    # 响应压缩配置
+    COMPRESSION_ENABLED: bool = True
+    # 小于该大小（字节）的响应不压缩
+    COMPRESSION_MIN_SIZE: int = 1024
+    # gzip 压缩级别（1-9）和 brotli 压缩质量（0-11，需安装 brotli）
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    # 允许压缩的内容类型
+    COMPRESSION_CONTENT_TYPES: List[str] = [
+        "application/json", "text/html", "text/plain", "text/css",
+        "text/csv", "application/x-ndjson", "application/javascript", "text/event-stream"
+    ]
     
     # 安全配置
     SECRET_KEY: str = "change-this-secret-key-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # 列表总数统计配置
+    # estimated_document_count 缓存时间（秒）
+    COUNT_CACHE_TTL_SECONDS: float = 30.0
+    # 带过滤条件时精确统计的上限，超过则返回“多于 N 条”
+    COUNT_MAX_EXACT: int = 10000
+    
     # CORS 配置
     ALLOWED_HOSTS: List[str] = ["*"]
     
     # 日志配置
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "logs/app.log"
+    # 文件日志是否使用 JSON 格式
+    LOG_JSON: bool = True
+    # 日志文件轮转：超过大小（MB）或时间（小时）任一条件即轮转
+    LOG_ROTATION_SIZE_MB: int = 100
+    LOG_ROTATION_HOURS: int = 24
+    # 日志文件保留时间
+    LOG_RETENTION: str = "7 days"
+    # 访问日志采样比例（错误和慢请求总是记录）
+    LOG_ACCESS_SAMPLE_RATE: float = 0.1
+    # 慢请求阈值（毫秒）
+    LOG_ACCESS_SLOW_MS: float = 1000.0
     
     class Config:
         env_file = ".env"
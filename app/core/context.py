@@ -0,0 +1,63 @@
+"""
+请求上下文
+
+通过 contextvars 在同一请求的中间件、依赖、端点以及 motor 执行线程之间共享状态
+"""
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+
+class RequestContext:
+    """单个请求的上下文信息"""
+
+    __slots__ = (
+        "request_id", "scope", "started_at", "db_stats",
+        "requested_timeout_ms", "deadline", "timeout_scope",
+    )
+
+    def __init__(self, scope: dict, request_id: Optional[str] = None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.scope = scope
+        self.started_at = time.perf_counter()
+        # 数据库往返统计，由 RequestContextMiddleware 创建
+        self.db_stats = None
+        # 截止时间相关，由 DeadlineMiddleware 和 request_deadline 依赖设置
+        self.requested_timeout_ms: Optional[int] = None
+        self.deadline: Optional[float] = None
+        self.timeout_scope = None
+
+    @property
+    def route(self) -> str:
+        """路由模板（如 /api/v1/items/{item_id}），路由匹配前返回原始路径"""
+        route = self.scope.get("route")
+        if route is not None:
+            return route.path
+        return self.scope.get("path", "")
+
+    @property
+    def method(self) -> str:
+        return self.scope.get("method", "")
+
+    def elapsed_ms(self) -> float:
+        """请求已耗时（毫秒）"""
+        return (time.perf_counter() - self.started_at) * 1000
+
+
+_request_context: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+def get_request_context() -> Optional[RequestContext]:
+    """获取当前请求上下文，不在请求中时返回 None"""
+    return _request_context.get()
+
+
+def set_request_context(context: Optional[RequestContext]):
+    """设置当前请求上下文，返回用于恢复的 token"""
+    return _request_context.set(context)
+
+
+def reset_request_context(token):
+    """恢复之前的请求上下文"""
+    _request_context.reset(token)
@@ -6,17 +6,37 @@ from pymongo import ASCENDING, DESCENDING
 from loguru import logger
 
 from app.core.config import settings
+from app.core.db_metrics import RequestCommandListener
+from app.services.price_history import PENDING_PRICE_CHANGES_FIELD
+
+# 物品列表查询使用的复合索引，与 app/services/items.py 中允许的过滤和排序对应。
+# 排序都以 _id 作为第二排序键，保证分页稳定且不需要内存排序
+ITEM_QUERY_INDEXES = [
+    # 无过滤条件时的排序
+    [("created_at", DESCENDING), ("_id", DESCENDING)],
+    [("price", ASCENDING), ("_id", ASCENDING)],
+    [("title", ASCENDING), ("_id", ASCENDING)],
+    # 按所有者过滤后的排序；第一个索引同时服务于 “某用户的物品，按创建时间倒序” 和按 owner_id 的查询
+    [("owner_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+    [("owner_id", ASCENDING), ("price", ASCENDING), ("_id", ASCENDING)],
+    [("owner_id", ASCENDING), ("title", ASCENDING), ("_id", ASCENDING)],
+]
 
 # MongoDB 客户端
 client = None
 database = None
 
 
-async def connect_to_mongo():
-    """连接到 MongoDB"""
+async def connect_to_mongo(with_indexes: bool = True):
+    """连接到 MongoDB（批量导入数据时可先不创建索引）"""
     global client, database
     try:
-        client = AsyncIOMotorClient(settings.MONGODB_URL)
+        from app.core.health import pool_monitor
+        client = AsyncIOMotorClient(
+            settings.MONGODB_URL,
+            maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+            event_listeners=[RequestCommandListener(), pool_monitor]
+        )
         database = client[settings.MONGODB_DB_NAME]
         
         # 测试连接
@@ -24,7 +44,8 @@ async def connect_to_mongo():
         logger.info("✅ MongoDB 连接成功")
         
         # 创建索引
-        await create_indexes()
+        if with_indexes:
+            await create_indexes()
         
     except Exception as e:
         logger.error(f"❌ MongoDB 连接失败: {e}")
@@ -52,9 +73,40 @@ async def create_indexes():
         await database.users.create_index([("created_at", DESCENDING)])
         
         # 物品集合索引
-        await database.items.create_index([("title", ASCENDING)])
-        await database.items.create_index([("owner_id", ASCENDING)])
-        await database.items.create_index([("created_at", DESCENDING)])
+        for keys in ITEM_QUERY_INDEXES:
+            await database.items.create_index(keys)
+        
+        # 物品快照增量构建按 updated_at 读取变更
+        await database.items.create_index([("updated_at", ASCENDING)])
+        
+        # 后台任务索引（启动时查询未完成的任务）
+        await database.jobs.create_index([("status", ASCENDING)])
+        
+        # 幂等键过期自动删除
+        await database.idempotency_keys.create_index(
+            [("created_at", ASCENDING)],
+            expireAfterSeconds=settings.IDEMPOTENCY_TTL_SECONDS
+        )
+        
+        # 物品价格历史（分桶）索引
+        await database.item_price_history.create_index(
+            [("item_id", ASCENDING), ("bucket_start", ASCENDING)]
+        )
+        # 补写时查找变更 id，启动时查找还有待写价格变更的物品（只索引有待写变更的文档）
+        await database.item_price_history.create_index(
+            [("item_id", ASCENDING), ("changes.change_id", ASCENDING)]
+        )
+        pending_change_id = f"{PENDING_PRICE_CHANGES_FIELD}.change_id"
+        await database.items.create_index(
+            [(pending_change_id, ASCENDING)],
+            partialFilterExpression={pending_change_id: {"$exists": True}}
+        )
+        
+        # Webhook 订阅和死信索引
+        await database.webhooks.create_index([("owner_id", ASCENDING)])
+        await database.webhook_dead_letters.create_index(
+            [("webhook_id", ASCENDING), ("created_at", DESCENDING)]
+        )
         
         logger.info("✅ 数据库索引创建成功")
     except Exception as e:
@@ -77,6 +129,11 @@ def get_database():
     return database
 
 
+def get_client():
+    """获取 MongoDB 客户端实例"""
+    return client
+
+
 async def get_collection(collection_name: str):
     """获取集合实例"""
     if database is None:
@@ -0,0 +1,102 @@
+"""
+数据库往返统计
+
+通过 pymongo 命令监听器记录每个请求的 MongoDB 操作次数、涉及的集合和总耗时。
+motor 在线程池中执行 pymongo 调用时会复制 contextvars，因此监听器能拿到所属请求的上下文。
+"""
+import threading
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+from pymongo import monitoring
+
+from app.core.config import settings
+from app.core.context import RequestContext, get_request_context
+
+
+class DbRoundTripBudgetExceeded(RuntimeError):
+    """请求的数据库往返次数超出预算（严格模式下抛出）"""
+
+
+class DbStats:
+    """单个请求的数据库操作统计"""
+
+    __slots__ = ("ops", "total_ms", "collections", "_pending", "_lock")
+
+    def __init__(self):
+        self.ops = 0
+        self.total_ms = 0.0
+        self.collections: Counter = Counter()
+        self._pending: Dict[int, Tuple[str, Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def started(self, request_id: int, command_name: str, collection: Optional[str]):
+        with self._lock:
+            self._pending[request_id] = (command_name, collection)
+
+    def finished(self, request_id: int, duration_micros: int):
+        with self._lock:
+            command = self._pending.pop(request_id, None)
+            if command is None:
+                return
+            self.ops += 1
+            self.total_ms += duration_micros / 1000
+            self.collections[command[1] or command[0]] += 1
+
+
+def _command_collection(event: monitoring.CommandStartedEvent) -> Optional[str]:
+    """从命令中提取集合名"""
+    if event.command_name == "getMore":
+        return event.command.get("collection")
+    value = event.command.get(event.command_name)
+    return value if isinstance(value, str) else None
+
+
+class RequestCommandListener(monitoring.CommandListener):
+    """将 MongoDB 命令计入当前请求的 DbStats"""
+
+    def started(self, event):
+        context = get_request_context()
+        if context is not None and context.db_stats is not None:
+            context.db_stats.started(event.request_id, event.command_name, _command_collection(event))
+
+    def succeeded(self, event):
+        context = get_request_context()
+        if context is not None and context.db_stats is not None:
+            context.db_stats.finished(event.request_id, event.duration_micros)
+
+    def failed(self, event):
+        context = get_request_context()
+        if context is not None and context.db_stats is not None:
+            context.db_stats.finished(event.request_id, event.duration_micros)
+
+
+def server_timing_header(stats: DbStats) -> bytes:
+    """生成 Server-Timing 响应头，如 db;dur=3.20;desc="3 ops", db-items;desc="2" """
+    metrics = [f'db;dur={stats.total_ms:.2f};desc="{stats.ops} ops"']
+    for collection, count in stats.collections.most_common():
+        metrics.append(f'db-{collection};desc="{count}"')
+    return ", ".join(metrics).encode("latin-1", "replace")
+
+
+def roundtrip_budget(route: str) -> int:
+    """路由的数据库往返预算，0 表示不限制"""
+    return settings.DB_ROUNDTRIP_BUDGETS.get(route, settings.DB_ROUNDTRIP_BUDGET)
+
+
+def check_roundtrip_budget(context: RequestContext):
+    """检查数据库往返次数是否超出路由预算"""
+    route = context.route
+    budget = roundtrip_budget(route)
+    stats = context.db_stats
+    if not budget or stats.ops <= budget:
+        return
+
+    message = (
+        f"数据库往返次数超出预算: {context.method} {route} "
+        f"{stats.ops} 次 > {budget} 次 {dict(stats.collections)}"
+    )
+    if settings.DB_ROUNDTRIP_BUDGET_STRICT:
+        raise DbRoundTripBudgetExceeded(message)
+    logger.warning(message)
@@ -0,0 +1,108 @@
+"""
+请求截止时间（deadline）
+
+- 预算来源（优先级从高到低）：X-Request-Timeout 请求头（毫秒）、按路由配置、默认值
+- 预算通过 pymongo.timeout 写入 contextvars，motor 执行的每个操作都会带上剩余时间作为 maxTimeMS，
+  超时后 MongoDB 端会主动终止查询
+- 同时通过 DeadlineScope 到点取消请求处理，由 DeadlineMiddleware 返回 504
+"""
+import asyncio
+import time
+from typing import Optional
+
+import pymongo
+
+from app.core.config import settings
+from app.core.context import RequestContext, get_request_context
+
+DEADLINE_HEADER = b"x-request-timeout"
+
+
+class DeadlineScope:
+    """
+    可重新设定时间的取消范围：到点时取消所在任务并标记为已超时
+
+    作用与 Python 3.11 的 asyncio.timeout 相同，这里自行实现以兼容更早的 Python 版本
+    """
+
+    def __init__(self, task: asyncio.Task):
+        self._task = task
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._expired = False
+
+    def reschedule(self, when: Optional[float]):
+        """设定取消时间（事件循环时间），None 表示取消定时"""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if when is not None and not self._expired:
+            self._handle = asyncio.get_running_loop().call_at(when, self._on_timeout)
+
+    def expired(self) -> bool:
+        return self._expired
+
+    def close(self):
+        self.reschedule(None)
+
+    def _on_timeout(self):
+        self._handle = None
+        self._expired = True
+        self._task.cancel()
+
+
+def parse_timeout_header(scope: dict) -> Optional[int]:
+    """读取请求头中的超时时间（毫秒），非法值忽略"""
+    for name, value in scope.get("headers", ()):
+        if name == DEADLINE_HEADER:
+            try:
+                timeout_ms = int(value)
+            except ValueError:
+                return None
+            if timeout_ms <= 0:
+                return None
+            return min(timeout_ms, settings.REQUEST_DEADLINE_MAX_MS)
+    return None
+
+
+def resolve_budget_ms(context: RequestContext) -> int:
+    """计算请求的时间预算（毫秒），0 表示不限制"""
+    route_budget = settings.REQUEST_DEADLINE_ROUTES.get(context.route, settings.REQUEST_DEADLINE_DEFAULT_MS)
+    if route_budget == 0:
+        # 流式接口等不设截止时间的路由，忽略请求头
+        return 0
+    if context.requested_timeout_ms is not None:
+        return context.requested_timeout_ms
+    return route_budget
+
+
+def remaining_seconds() -> Optional[float]:
+    """当前请求剩余的时间（秒），不在请求中或未设置截止时间时为 None"""
+    context = get_request_context()
+    if context is None or context.deadline is None:
+        return None
+    return max(0.0, context.deadline - time.perf_counter())
+
+
+def deadline_expired(context: RequestContext) -> bool:
+    """请求是否已超过截止时间"""
+    return context.deadline is not None and time.perf_counter() >= context.deadline
+
+
+async def request_deadline():
+    """全局依赖：路由匹配后确定预算，设置请求取消时间和 MongoDB 操作超时"""
+    context = get_request_context()
+    if context is None or context.timeout_scope is None:
+        yield
+        return
+
+    budget_ms = resolve_budget_ms(context)
+    if not budget_ms:
+        yield
+        return
+
+    # 预算从请求开始时计算
+    context.deadline = context.started_at + budget_ms / 1000
+    remaining = max(0.001, context.deadline - time.perf_counter())
+    context.timeout_scope.reschedule(asyncio.get_running_loop().time() + remaining)
+    with pymongo.timeout(remaining):
+        yield
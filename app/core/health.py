@@ -0,0 +1,185 @@
+"""
+健康检查：存活探针与就绪探针
+
+就绪检查包含：
+- MongoDB ping 延迟（带短超时）
+- 连接池饱和度（通过 pymongo 连接池事件统计）
+- 事件循环延迟（后台定时任务测量）
+检查结果会短暂缓存，并发探针合并为一次检查
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from loguru import logger
+from pymongo import monitoring
+
+from app.core.config import settings
+from app.core.database import get_client
+from app.utils.singleflight import SingleFlight
+
+
+class LoopLagMonitor:
+    """事件循环延迟监控：定时 sleep，实际唤醒时间与预期的差值即为延迟"""
+
+    def __init__(self, interval_seconds: float, window: int = 10):
+        self.interval_seconds = interval_seconds
+        self._samples = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def lag_ms(self) -> Optional[float]:
+        """最近窗口内的最大延迟（毫秒），未运行时为 None"""
+        if not self._samples:
+            return None
+        return max(self._samples)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval_seconds)
+            lag = loop.time() - start - self.interval_seconds
+            self._samples.append(max(0.0, lag) * 1000)
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """统计连接池中已借出和等待中的连接数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.max_pool_size = settings.MONGODB_MAX_POOL_SIZE
+        self.checked_out = 0
+        self.waiting = 0
+
+    def pool_created(self, event):
+        max_pool_size = event.options.get("maxPoolSize")
+        if max_pool_size:
+            self.max_pool_size = max_pool_size
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    @property
+    def saturation(self) -> float:
+        """连接池饱和度：已借出连接数 / 最大连接数"""
+        if not self.max_pool_size:
+            return 0.0
+        return self.checked_out / self.max_pool_size
+
+
+loop_lag_monitor = LoopLagMonitor(settings.HEALTH_LOOP_LAG_INTERVAL_MS / 1000)
+pool_monitor = PoolMonitor()
+
+_readiness_checks = SingleFlight("health.readiness")
+_cached_readiness: Optional[dict] = None
+_cached_at = 0.0
+
+
+async def _ping_mongo() -> dict:
+    """MongoDB ping，超时即判定为不可用"""
+    client = get_client()
+    if client is None:
+        return {"ok": False, "error": "数据库未连接"}
+
+    timeout_ms = settings.HEALTH_MONGO_TIMEOUT_MS
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(
+            client.admin.command("ping", maxTimeMS=timeout_ms),
+            timeout=timeout_ms / 1000
+        )
+    except asyncio.TimeoutError:
+        return {"ok": False, "error": f"ping 超时（{timeout_ms}ms）"}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+    latency_ms = (time.perf_counter() - start) * 1000
+    return {"ok": latency_ms <= settings.HEALTH_MAX_MONGO_PING_MS, "latency_ms": round(latency_ms, 2)}
+
+
+async def _run_readiness_checks() -> dict:
+    mongo = await _ping_mongo()
+
+    saturation = pool_monitor.saturation
+    pool = {
+        "ok": saturation < settings.HEALTH_MAX_POOL_SATURATION,
+        "checked_out": pool_monitor.checked_out,
+        "waiting": pool_monitor.waiting,
+        "max_pool_size": pool_monitor.max_pool_size,
+        "saturation": round(saturation, 3),
+    }
+
+    lag_ms = loop_lag_monitor.lag_ms
+    loop = {
+        "ok": lag_ms is None or lag_ms <= settings.HEALTH_MAX_LOOP_LAG_MS,
+        "lag_ms": None if lag_ms is None else round(lag_ms, 2),
+    }
+
+    ready = mongo["ok"] and pool["ok"] and loop["ok"]
+    if not ready:
+        logger.warning(f"就绪检查未通过: mongo={mongo} pool={pool} loop={loop}")
+    return {
+        "status": "ready" if ready else "unavailable",
+        "checks": {"mongodb": mongo, "connection_pool": pool, "event_loop": loop},
+    }
+
+
+async def check_readiness() -> dict:
+    """就绪检查（结果缓存 HEALTH_CACHE_SECONDS 秒）"""
+    global _cached_readiness, _cached_at
+
+    now = time.monotonic()
+    if _cached_readiness is not None and now - _cached_at < settings.HEALTH_CACHE_SECONDS:
+        return _cached_readiness
+
+    result = await _readiness_checks.do("readiness", _run_readiness_checks)
+    _cached_readiness, _cached_at = result, time.monotonic()
+    return result
@@ -0,0 +1,142 @@
+"""
+日志配置 - 基于 Loguru
+
+- 所有 sink 均使用 enqueue=True，由后台线程负责写入，磁盘抖动不会阻塞请求
+- 文件日志为 JSON 格式（每行一个对象，异常堆栈放在 exception 字段中），包含 request_id 和路由
+- 文件按大小或时间轮转（先到者为准）
+- 标准库 logging（uvicorn 等）统一转发到 Loguru
+"""
+import inspect
+import json
+import logging
+import sys
+import time
+import traceback
+from datetime import timezone
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.context import get_request_context
+
+CONSOLE_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
+    "<level>{level: <8}</level> | "
+    "<cyan>{extra[request_id]}</cyan> | "
+    "{message}"
+)
+
+
+class SizeOrTimeRotation:
+    """按文件大小或时间间隔轮转，任一条件满足即轮转"""
+
+    def __init__(self, max_bytes: int, interval_seconds: float):
+        self.max_bytes = max_bytes
+        self.interval_seconds = interval_seconds
+        self._rotate_at = None
+
+    def __call__(self, message, file) -> bool:
+        now = time.time()
+        if self._rotate_at is None:
+            self._rotate_at = now + self.interval_seconds
+
+        if now >= self._rotate_at or file.tell() + len(message) > self.max_bytes:
+            self._rotate_at = now + self.interval_seconds
+            return True
+        return False
+
+
+class InterceptHandler(logging.Handler):
+    """将标准库 logging 的日志转发到 Loguru"""
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+
+        # 跳过 logging 模块自身的栈帧，定位到真正的调用方
+        frame, depth = inspect.currentframe(), 0
+        while frame and (depth == 0 or frame.f_code.co_filename == logging.__file__):
+            frame = frame.f_back
+            depth += 1
+
+        logger.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
+
+
+def _patch_request_context(record):
+    """为每条日志附加当前请求的 request_id 和路由"""
+    context = get_request_context()
+    if context is not None:
+        record["extra"].setdefault("request_id", context.request_id)
+        record["extra"].setdefault("route", context.route)
+    else:
+        record["extra"].setdefault("request_id", "-")
+        record["extra"].setdefault("route", None)
+
+
+def _json_format(record) -> str:
+    """文件日志的 JSON 格式"""
+    extra = dict(record["extra"])
+    payload = {
+        "time": record["time"].astimezone(timezone.utc).isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "request_id": extra.pop("request_id", None),
+        "route": extra.pop("route", None),
+        "module": record["name"],
+        "line": record["line"],
+    }
+    extra.pop("_json", None)
+    if extra:
+        payload["extra"] = extra
+    if record["exception"] is not None:
+        exc_type, exc_value, exc_traceback = record["exception"]
+        payload["exception"] = "".join(traceback.format_exception(exc_type, exc_value, exc_traceback))
+
+    record["extra"]["_json"] = json.dumps(payload, ensure_ascii=False, default=str)
+    # 格式为函数时 loguru 不会自动追加异常，堆栈只出现在 JSON 中，保证每行都是合法 JSON
+    return "{extra[_json]}\n"
+
+
+def setup_logging():
+    """根据 Settings 初始化日志"""
+    logger.remove()
+    logger.configure(patcher=_patch_request_context)
+
+    logger.add(
+        sys.stderr,
+        level=settings.LOG_LEVEL,
+        format=CONSOLE_FORMAT,
+        enqueue=True,
+        backtrace=False,
+        diagnose=settings.DEBUG,
+    )
+
+    if settings.LOG_FILE:
+        logger.add(
+            settings.LOG_FILE,
+            level=settings.LOG_LEVEL,
+            format=_json_format if settings.LOG_JSON else CONSOLE_FORMAT,
+            rotation=SizeOrTimeRotation(
+                settings.LOG_ROTATION_SIZE_MB * 1024 * 1024,
+                settings.LOG_ROTATION_HOURS * 3600,
+            ),
+            retention=settings.LOG_RETENTION,
+            compression="gz",
+            encoding="utf-8",
+            enqueue=True,
+            backtrace=False,
+            diagnose=False,
+        )
+
+    # uvicorn 等使用标准库 logging 的日志统一走 Loguru
+    logging.basicConfig(
+        handlers=[InterceptHandler()],
+        level=logging.getLevelName(settings.LOG_LEVEL.upper()),
+        force=True,
+    )
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access", "fastapi"):
+        std_logger = logging.getLogger(name)
+        std_logger.handlers = []
+        std_logger.propagate = True
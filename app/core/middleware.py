@@ -0,0 +1,279 @@
+"""
+ASGI 中间件
+
+使用纯 ASGI 实现（不使用 BaseHTTPMiddleware），端点与中间件运行在同一任务中，
+contextvars 可以在两者之间正常传递，且不会缓冲流式响应
+"""
+import asyncio
+import json
+import random
+
+from loguru import logger
+
+from app.core.compression import StreamCompressor, choose_encoding, is_compressible
+from app.core.config import settings
+from app.core.context import RequestContext, get_request_context, reset_request_context, set_request_context
+from app.core.deadline import DeadlineScope, deadline_expired, parse_timeout_header
+from app.core.db_metrics import DbStats, check_roundtrip_budget, server_timing_header
+
+
+class RequestContextMiddleware:
+    """建立请求上下文（request_id、数据库往返统计），并输出采样的访问日志"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+
+        context = RequestContext(scope, request_id)
+        context.db_stats = DbStats()
+        token = set_request_context(context)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # 普通响应在此时端点已执行完毕，统计的是完整的数据库往返
+                check_roundtrip_budget(context)
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", context.request_id.encode("latin-1")))
+                headers.append((b"server-timing", server_timing_header(context.db_stats)))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _log_access(context, status_code)
+            reset_request_context(token)
+
+
+class DeadlineMiddleware:
+    """
+    请求截止时间与客户端断开处理
+
+    - 超过截止时间时取消请求处理并返回 504；MongoDB 已因 maxTimeMS 中止查询、
+      端点将其转换为 500 的情况也改写为 504
+    - 客户端断开连接时取消仍在执行的请求处理，不再继续消耗数据库资源
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        context = get_request_context()
+        if scope["type"] != "http" or context is None:
+            await self.app(scope, receive, send)
+            return
+
+        context.requested_timeout_ms = parse_timeout_header(scope)
+        task = asyncio.current_task()
+        messages = asyncio.Queue()
+        consumed = asyncio.Event()
+        response_started = False
+        response_complete = False
+        replaced_with_timeout = False
+        disconnected = False
+
+        async def read_messages():
+            # 唯一读取 receive 的任务：请求体按应用的读取进度转发，读完后等待断开事件
+            nonlocal disconnected
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    if not response_complete:
+                        disconnected = True
+                        task.cancel()
+                    return
+                if message.get("more_body", False):
+                    await consumed.wait()
+                    consumed.clear()
+
+        async def receive_wrapper():
+            message = await messages.get()
+            consumed.set()
+            return message
+
+        async def send_wrapper(message):
+            nonlocal response_started, response_complete, replaced_with_timeout
+            if replaced_with_timeout:
+                return
+            if message["type"] == "http.response.start":
+                # 截止时间只约束首字节之前的处理，响应开始后不再取消
+                timeout_scope = context.timeout_scope
+                if timeout_scope is not None and not timeout_scope.expired():
+                    timeout_scope.reschedule(None)
+                if message["status"] == 500 and deadline_expired(context):
+                    replaced_with_timeout = True
+                    await _send_timeout(send)
+                    response_started = response_complete = True
+                    return
+                response_started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        reader = asyncio.create_task(read_messages())
+        timeout_scope = DeadlineScope(task)
+        context.timeout_scope = timeout_scope
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        except asyncio.CancelledError:
+            if not timeout_scope.expired() and not disconnected:
+                raise
+            # 取消由本中间件发起，处理完毕后任务继续执行
+            if hasattr(task, "uncancel"):
+                task.uncancel()
+            if timeout_scope.expired():
+                logger.warning(f"请求超过截止时间: {context.method} {context.route}")
+                if not response_started and not disconnected:
+                    await _send_timeout(send)
+            else:
+                logger.info(f"客户端已断开，取消请求: {context.method} {context.route}")
+        finally:
+            timeout_scope.close()
+            context.timeout_scope = None
+            reader.cancel()
+
+
+class CompressionMiddleware:
+    """
+    响应压缩（gzip / brotli）
+
+    - 只压缩允许列表中的内容类型，已设置 Content-Encoding 的响应（如预压缩内容）原样返回
+    - 完整响应小于 COMPRESSION_MIN_SIZE 时不压缩
+    - 流式响应逐块压缩并立即 flush，不会缓冲整个响应
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope.get("headers", ()):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = {name.lower(): value for name, value in message.get("headers", [])}
+                if (
+                    message["status"] < 200
+                    or message["status"] in (204, 304)
+                    or b"content-encoding" in headers
+                    or b"content-range" in headers
+                    or not is_compressible(headers.get(b"content-type", b"").decode("latin-1"))
+                ):
+                    passthrough = True
+                    await send(message)
+                    return
+                # 等第一个响应体分块到达后再决定是否压缩
+                start_message = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                if not more_body and len(body) < settings.COMPRESSION_MIN_SIZE:
+                    passthrough = True
+                    await send(_with_vary(start_message))
+                    await send(message)
+                    return
+                compressor = StreamCompressor(encoding)
+                headers = [
+                    (name, value) for name, value in start_message.get("headers", [])
+                    if name.lower() != b"content-length"
+                ]
+                headers.append((b"content-encoding", encoding.encode()))
+                start_message = _with_vary({**start_message, "headers": headers})
+                if not more_body:
+                    body = compressor.compress(body, flush=False) + compressor.finish()
+                    start_message["headers"].append((b"content-length", str(len(body)).encode()))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start_message)
+                start_message = None
+
+            chunk = compressor.compress(body) if body else b""
+            if not more_body:
+                chunk += compressor.finish()
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def _with_vary(message):
+    """响应随 Accept-Encoding 变化，提示缓存分别保存"""
+    headers = list(message.get("headers", []))
+    for index, (name, value) in enumerate(headers):
+        if name.lower() == b"vary":
+            if b"accept-encoding" not in value.lower():
+                headers[index] = (name, value + b", Accept-Encoding")
+            break
+    else:
+        headers.append((b"vary", b"Accept-Encoding"))
+    return {**message, "headers": headers}
+
+
+async def _send_timeout(send):
+    body = json.dumps({"detail": "请求超时"}, ensure_ascii=False).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 504,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def _log_access(context: RequestContext, status_code: int):
+    """访问日志采样：错误和慢请求总是记录，其余按比例采样"""
+    elapsed_ms = context.elapsed_ms()
+    if (
+        status_code < 500
+        and elapsed_ms < settings.LOG_ACCESS_SLOW_MS
+        and random.random() >= settings.LOG_ACCESS_SAMPLE_RATE
+    ):
+        return
+
+    logger.bind(
+        access=True,
+        method=context.method,
+        status=status_code,
+        duration_ms=round(elapsed_ms, 2),
+        db_ops=context.db_stats.ops,
+        db_ms=round(context.db_stats.total_ms, 2),
+    ).info(f"{context.method} {context.scope.get('path', '')} {status_code} {elapsed_ms:.1f}ms")
@@ -0,0 +1,77 @@
+"""
+查询索引守卫（调试模式）
+
+每种新的查询形状（过滤字段、操作符和排序，不含具体取值）第一次出现时执行 explain，
+如果胜出的执行计划包含 COLLSCAN（全表扫描）或 SORT（内存排序），则记录警告或直接拒绝。
+结果按查询形状缓存，每种形状只 explain 一次。
+"""
+import json
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from loguru import logger
+
+from app.core.config import settings
+
+GUARDRAIL_OFF = "off"
+GUARDRAIL_WARN = "warn"
+GUARDRAIL_REJECT = "reject"
+
+BAD_STAGES = ("COLLSCAN", "SORT")
+
+_checked_shapes: Dict[str, Optional[str]] = {}
+
+
+def _shape(value):
+    """去掉具体取值，只保留查询结构"""
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_shape(item) for item in value]
+    return "?"
+
+
+def query_shape(collection_name: str, query: dict, sort: Optional[List[Tuple[str, int]]]) -> str:
+    return json.dumps(
+        {"collection": collection_name, "filter": _shape(query), "sort": sort or []},
+        sort_keys=True
+    )
+
+
+def _find_bad_stages(plan) -> List[str]:
+    """递归查找执行计划中的 COLLSCAN / SORT 阶段"""
+    found = []
+    if isinstance(plan, dict):
+        if plan.get("stage") in BAD_STAGES:
+            found.append(plan["stage"])
+        for value in plan.values():
+            found.extend(_find_bad_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            found.extend(_find_bad_stages(value))
+    return found
+
+
+async def check_query(collection, query: dict, sort: Optional[List[Tuple[str, int]]] = None):
+    """调试模式下检查查询是否能由索引完成"""
+    mode = settings.QUERY_GUARDRAIL_MODE
+    if not settings.DEBUG or mode == GUARDRAIL_OFF:
+        return
+
+    shape = query_shape(collection.name, query, sort)
+    if shape not in _checked_shapes:
+        cursor = collection.find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = _find_bad_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        _checked_shapes[shape] = ", ".join(sorted(set(stages))) or None
+
+    problem = _checked_shapes[shape]
+    if problem is None:
+        return
+
+    message = f"查询未能完全使用索引（{problem}）: {shape}"
+    if mode == GUARDRAIL_REJECT:
+        raise HTTPException(status_code=400, detail=message)
+    logger.warning(message)
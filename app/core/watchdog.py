@@ -0,0 +1,125 @@
+"""
+事件循环阻塞监控（watchdog）
+
+事件循环中的心跳任务定期更新时间戳，独立的监控线程检查心跳是否超时。
+超过阈值说明事件循环被同步代码阻塞，此时从监控线程抓取事件循环线程的调用栈，
+并从栈帧中找出正在处理的请求路由，按路由统计阻塞次数。
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.context import RequestContext
+
+UNKNOWN_ROUTE = "-"
+
+
+def _find_request_context(frame) -> Optional[RequestContext]:
+    """沿调用栈向外查找 RequestContextMiddleware 中的请求上下文"""
+    while frame is not None:
+        context = frame.f_locals.get("context")
+        if isinstance(context, RequestContext):
+            return context
+        frame = frame.f_back
+    return None
+
+
+class BlockingWatchdog:
+    """检测事件循环长时间未让出控制权的情况"""
+
+    def __init__(self, threshold_ms: float):
+        self.threshold_seconds = threshold_ms / 1000
+        self.incidents: Counter = Counter()
+        self.last_incident: Optional[dict] = None
+        self._heartbeat = 0.0
+        self._reported_heartbeat = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        """在事件循环中启动心跳任务和监控线程"""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._beat())
+        self._thread = threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"🐶 事件循环阻塞监控已启动，阈值 {self.threshold_seconds * 1000:.0f}ms")
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._thread.join(timeout=1)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.running,
+            "threshold_ms": self.threshold_seconds * 1000,
+            "total": sum(self.incidents.values()),
+            "incidents": dict(self.incidents.most_common()),
+            "last_incident": self.last_incident,
+        }
+
+    async def _beat(self):
+        interval = self.threshold_seconds / 4
+        while True:
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(interval)
+
+    def _monitor(self):
+        interval = self.threshold_seconds / 4
+        while not self._stop.wait(interval):
+            heartbeat = self._heartbeat
+            blocked_seconds = time.monotonic() - heartbeat
+            # 同一次阻塞只报告一次
+            if blocked_seconds < self.threshold_seconds or heartbeat == self._reported_heartbeat:
+                continue
+            self._reported_heartbeat = heartbeat
+            self._report(blocked_seconds)
+
+    def _report(self, blocked_seconds: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = "".join(traceback.format_stack(frame))
+        context = _find_request_context(frame)
+        route = context.route if context is not None else UNKNOWN_ROUTE
+        request_id = context.request_id if context is not None else None
+        del frame
+
+        self.incidents[route] += 1
+        self.last_incident = {
+            "route": route,
+            "request_id": request_id,
+            "blocked_ms": round(blocked_seconds * 1000, 1),
+            "stack": stack,
+        }
+        logger.bind(request_id=request_id or "-", route=route).warning(
+            f"⚠️ 事件循环被阻塞超过 {blocked_seconds * 1000:.0f}ms，路由 {route}，调用栈:\n{stack}"
+        )
+
+
+watchdog = BlockingWatchdog(settings.WATCHDOG_THRESHOLD_MS)
@@ -1,7 +1,10 @@
 """
 共享的数据类型定义
 """
+from typing import List
+
 from bson import ObjectId
+from pydantic import BaseModel, Field
 
 
 class PyObjectId(ObjectId):
@@ -18,4 +21,9 @@ class PyObjectId(ObjectId):
 
     @classmethod
     def __get_pydantic_json_schema__(cls, field_schema):
-        field_schema.update(type="string") 
\ No newline at end of file
+        field_schema.update(type="string") 
+
+
+class BatchGetRequest(BaseModel):
+    """按 ID 批量读取请求"""
+    ids: List[str] = Field(..., min_length=1)
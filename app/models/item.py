@@ -2,7 +2,7 @@
 物品数据模型 - MongoDB 版本
 """
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
 from app.models.common import PyObjectId
@@ -39,6 +39,55 @@ class ItemResponse(ItemBase):
         json_encoders = {ObjectId: str}
 
 
+class ItemPage(BaseModel):
+    """游标分页的物品列表"""
+    items: List[ItemResponse]
+    next_cursor: Optional[str] = None
+
+
+class ItemBatchEntry(BaseModel):
+    """批量读取中的单个物品，found 为 False 时 item 为空"""
+    id: str
+    found: bool
+    item: Optional[ItemResponse] = None
+
+
+class ItemBatchResponse(BaseModel):
+    """批量读取物品结果，顺序与请求一致"""
+    results: List[ItemBatchEntry]
+    found: int
+    missing: int
+
+
+class ImportRowError(BaseModel):
+    """导入失败的行"""
+    row: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    """批量导入结果"""
+    total_rows: int
+    inserted: int
+    failed: int
+    errors: List[ImportRowError]
+    errors_truncated: bool = False
+
+
+class PriceChange(BaseModel):
+    """价格变更记录"""
+    price: float
+    old_price: Optional[float] = None
+    changed_at: datetime
+    changed_by: Optional[str] = None
+
+
+class PriceHistoryResponse(BaseModel):
+    """价格历史响应模型"""
+    item_id: str
+    changes: List[PriceChange]
+
+
 # MongoDB 文档模型
 class ItemDocument(BaseModel):
     """MongoDB 物品文档模型"""
@@ -0,0 +1,18 @@
+"""
+后台任务数据模型
+"""
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+
+class JobResponse(BaseModel):
+    """后台任务响应模型"""
+    id: str
+    type: str
+    status: str
+    processed: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,43 @@
+"""
+物品快照数据模型
+"""
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from datetime import datetime
+
+
+class SnapshotInfo(BaseModel):
+    """快照构建结果"""
+    mode: str
+    rows: int
+    changed: int
+    size_bytes: int
+    built_at: datetime
+    watermark: Optional[datetime] = None
+
+
+class HistogramBin(BaseModel):
+    """直方图区间 [start, end)，最后一个区间包含 end"""
+    start: float
+    end: float
+    count: int
+
+
+class OwnerPriceTotal(BaseModel):
+    """按所有者汇总的价格"""
+    owner_id: str
+    count: int
+    sum: float
+
+
+class PriceStats(BaseModel):
+    """快照上的价格统计"""
+    rows: int
+    built_at: datetime
+    sum: float
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+    percentiles: Dict[str, float]
+    histogram: List[HistogramBin]
+    top_owners: List[OwnerPriceTotal]
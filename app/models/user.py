@@ -2,10 +2,11 @@
 用户数据模型 - MongoDB 版本
 """
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
 from app.models.common import PyObjectId
+from app.models.item import ItemResponse
 
 
 # Pydantic 模型用于 API
@@ -53,6 +54,31 @@ class UserResponse(UserBase):
         json_encoders = {ObjectId: str}
 
 
+class UserSummary(BaseModel):
+    """用户概览：用户信息、物品统计和最近的物品"""
+    user: UserResponse
+    item_count: int
+    price_total: float
+    price_avg: Optional[float] = None
+    price_min: Optional[float] = None
+    price_max: Optional[float] = None
+    recent_items: List[ItemResponse]
+
+
+class UserBatchEntry(BaseModel):
+    """批量读取中的单个用户，found 为 False 时 user 为空"""
+    id: str
+    found: bool
+    user: Optional[UserResponse] = None
+
+
+class UserBatchResponse(BaseModel):
+    """批量读取用户结果，顺序与请求一致"""
+    results: List[UserBatchEntry]
+    found: int
+    missing: int
+
+
 class Token(BaseModel):
     """令牌模型"""
     access_token: str
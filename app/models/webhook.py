@@ -0,0 +1,35 @@
+"""
+Webhook 数据模型
+"""
+from pydantic import BaseModel, Field, HttpUrl
+from typing import List, Optional
+from datetime import datetime
+
+
+class WebhookCreate(BaseModel):
+    """创建 Webhook 订阅模型"""
+    url: HttpUrl
+    # 订阅的事件类型，为空表示全部
+    events: List[str] = []
+    # 签名密钥，设置后请求带 X-Webhook-Signature 头
+    secret: Optional[str] = Field(None, min_length=8, max_length=200)
+
+
+class WebhookResponse(BaseModel):
+    """Webhook 订阅响应模型（不返回密钥）"""
+    id: str
+    url: str
+    events: List[str]
+    is_active: bool
+    created_at: datetime
+
+
+class WebhookDeadLetter(BaseModel):
+    """投递失败的记录"""
+    id: str
+    webhook_id: Optional[str] = None
+    url: str
+    events: List[dict]
+    error: Optional[str] = None
+    attempts: int
+    created_at: datetime
@@ -0,0 +1,393 @@
+"""
+物品目录内存副本 - 按价格范围浏览和最便宜的 N 个物品直接在进程内存中查询
+
+- 每个物品占用一个槽位，字段保存在按槽位索引的定长数组中（id 12 字节、价格、创建时间、所有者字典编码），
+  标题和描述保存在列表中；删除后的槽位会被复用
+- 另外维护按价格排序的 (价格, 槽位) 数组，范围查询只需两次二分查找
+- 启动时在后台从 items 集合加载，加载完成前查询回退到 MongoDB；
+  加载期间发生的写操作会在加载完成后重放
+- 写接口、批量导入和级联任务在写入 MongoDB 成功后同步更新副本
+- 超出内存预算时副本停用，查询回退到 MongoDB
+- 更新副本时发现内部数据不一致（如排序数组缺少记录），副本停用并在后台重新加载，不影响已成功的写请求
+- 定期与 MongoDB 对比数量和抽样数据，不一致时重新加载（多 worker 部署时其他进程的写入也依赖这一点）
+"""
+import asyncio
+import contextvars
+import random
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from loguru import logger
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.models.item import ItemResponse
+from app.services.snapshot import from_micros, to_micros
+
+CATALOG_PROJECTION = {"title": 1, "description": 1, "price": 1, "owner_id": 1, "created_at": 1}
+
+_ID_SIZE = 12
+# 每条记录在定长数组和 id -> 槽位字典中的大致开销（字节）
+_RECORD_OVERHEAD = _ID_SIZE + 8 + 8 + 4 + 8 + 4 + 120
+
+
+def _text_bytes(value: Optional[str]) -> int:
+    return sys.getsizeof(value) if value is not None else 0
+
+
+class _CatalogInconsistency(Exception):
+    """副本内部数据不一致"""
+
+
+class _CatalogData:
+    """副本数据，重新加载时整体替换"""
+
+    def __init__(self):
+        self.ids = bytearray()
+        self.prices = array("d")
+        self.created_at = array("q")
+        self.owners = array("I")
+        self.titles: List[Optional[str]] = []
+        self.descriptions: List[Optional[str]] = []
+        self.owner_values: List[str] = []
+        self.owner_codes: Dict[str, int] = {}
+        self.slots: Dict[bytes, int] = {}
+        self.free: List[int] = []
+        self.sorted_prices = array("d")
+        self.sorted_slots = array("I")
+        self.memory = 0
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def _owner_code(self, owner_id) -> int:
+        owner = str(owner_id)
+        code = self.owner_codes.get(owner)
+        if code is None:
+            code = len(self.owner_values)
+            self.owner_values.append(owner)
+            self.owner_codes[owner] = code
+            self.memory += sys.getsizeof(owner) + 100
+        return code
+
+    def _insert_sorted(self, slot: int, price: float):
+        position = bisect_right(self.sorted_prices, price)
+        self.sorted_prices.insert(position, price)
+        self.sorted_slots.insert(position, slot)
+
+    def _remove_sorted(self, slot: int, price: float):
+        # 只在价格相同的区间内查找槽位
+        start = bisect_left(self.sorted_prices, price)
+        end = bisect_right(self.sorted_prices, price, start)
+        for position in range(start, end):
+            if self.sorted_slots[position] == slot:
+                del self.sorted_prices[position]
+                del self.sorted_slots[position]
+                return
+        raise _CatalogInconsistency(f"排序数组中找不到槽位 {slot}（价格 {price}）")
+
+    def append(self, item: dict):
+        """加载时追加记录（不维护排序数组，加载结束后调用 build_sorted）"""
+        key = item["_id"].binary
+        if key in self.slots:
+            return
+        self.slots[key] = len(self.prices)
+        self.ids += key
+        self.prices.append(float(item["price"]))
+        self.created_at.append(to_micros(item["created_at"]))
+        self.owners.append(self._owner_code(item["owner_id"]))
+        self.titles.append(item["title"])
+        self.descriptions.append(item.get("description"))
+        self.memory += _RECORD_OVERHEAD + _text_bytes(item["title"]) + _text_bytes(item.get("description"))
+
+    def build_sorted(self):
+        order = sorted(self.slots.values(), key=self.prices.__getitem__)
+        self.sorted_slots = array("I", order)
+        self.sorted_prices = array("d", (self.prices[slot] for slot in order))
+
+    def upsert(self, item: dict):
+        key = item["_id"].binary
+        price = float(item["price"])
+        slot = self.slots.get(key)
+        if slot is None:
+            if self.free:
+                slot = self.free.pop()
+                self.ids[slot * _ID_SIZE:(slot + 1) * _ID_SIZE] = key
+                self.prices[slot] = price
+                self.created_at[slot] = to_micros(item["created_at"])
+                self.owners[slot] = self._owner_code(item["owner_id"])
+                self.titles[slot] = item["title"]
+                self.descriptions[slot] = item.get("description")
+                self.slots[key] = slot
+                self.memory += _text_bytes(item["title"]) + _text_bytes(item.get("description"))
+            else:
+                self.append(item)
+                slot = self.slots[key]
+            self._insert_sorted(slot, price)
+            return
+
+        self.memory += (
+            _text_bytes(item["title"]) + _text_bytes(item.get("description"))
+            - _text_bytes(self.titles[slot]) - _text_bytes(self.descriptions[slot])
+        )
+        if self.prices[slot] != price:
+            self._remove_sorted(slot, self.prices[slot])
+            self.prices[slot] = price
+            self._insert_sorted(slot, price)
+        self.owners[slot] = self._owner_code(item["owner_id"])
+        self.titles[slot] = item["title"]
+        self.descriptions[slot] = item.get("description")
+
+    def remove(self, key: bytes):
+        slot = self.slots.pop(key, None)
+        if slot is None:
+            return
+        self._remove_sorted(slot, self.prices[slot])
+        self.memory -= _text_bytes(self.titles[slot]) + _text_bytes(self.descriptions[slot])
+        self.titles[slot] = None
+        self.descriptions[slot] = None
+        self.free.append(slot)
+
+    def set_owner(self, key: bytes, owner_id: ObjectId):
+        slot = self.slots.get(key)
+        if slot is not None:
+            self.owners[slot] = self._owner_code(owner_id)
+
+    def record(self, slot: int) -> ItemResponse:
+        return ItemResponse(
+            id=self.ids[slot * _ID_SIZE:(slot + 1) * _ID_SIZE].hex(),
+            title=self.titles[slot],
+            description=self.descriptions[slot],
+            price=self.prices[slot],
+            owner_id=self.owner_values[self.owners[slot]],
+            created_at=from_micros(self.created_at[slot])
+        )
+
+    def sample_keys(self, count: int) -> List[bytes]:
+        """随机抽取最多 count 个物品 id：按槽位抽样，开销只与 count 有关，不复制整个 id 集合"""
+        picked = random.sample(range(len(self.prices)), min(count, len(self.prices)))
+        keys = []
+        for slot in picked:
+            key = bytes(self.ids[slot * _ID_SIZE:(slot + 1) * _ID_SIZE])
+            # 跳过已删除、等待复用的槽位
+            if self.slots.get(key) == slot:
+                keys.append(key)
+        return keys
+
+    def values(self, key: bytes) -> Optional[Tuple[float, str, str]]:
+        """一致性检查用：(价格, 所有者, 标题)"""
+        slot = self.slots.get(key)
+        if slot is None:
+            return None
+        return self.prices[slot], self.owner_values[self.owners[slot]], self.titles[slot]
+
+
+class CatalogIndex:
+    """物品目录内存副本"""
+
+    def __init__(self, memory_budget_bytes: int):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.loaded_at: Optional[datetime] = None
+        self.disabled_reason: Optional[str] = None
+        self._data: Optional[_CatalogData] = None
+        # 加载期间的写操作，加载完成后重放
+        self._pending: Optional[list] = None
+        self._tasks: List[asyncio.Task] = []
+        self._database = None
+        self._reload_task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._data is not None
+
+    def start(self, database):
+        """在后台加载副本并启动定期一致性检查"""
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self.load(database)))
+        if settings.CATALOG_VERIFY_SECONDS > 0:
+            self._tasks.append(asyncio.create_task(self._verify_loop(database)))
+
+    async def stop(self):
+        tasks = self._tasks + ([self._reload_task] if self._reload_task is not None else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._reload_task = None
+
+    async def load(self, database):
+        """从 MongoDB 加载全部物品，完成后替换当前数据"""
+        self._database = database
+        if self._pending is not None:
+            return
+        self._pending = []
+        data = _CatalogData()
+        try:
+            batch = []
+            cursor = database.items.find({}, CATALOG_PROJECTION, batch_size=settings.CATALOG_LOAD_BATCH_SIZE)
+            async for item in cursor:
+                batch.append(item)
+                if len(batch) >= settings.CATALOG_LOAD_BATCH_SIZE:
+                    await run_in_threadpool(self._append_batch, data, batch)
+                    batch = []
+            await run_in_threadpool(self._append_batch, data, batch)
+            await run_in_threadpool(data.build_sorted)
+
+            for operation, args in self._pending:
+                getattr(data, operation)(*args)
+            self._data = data
+            self.loaded_at = datetime.utcnow()
+            self.disabled_reason = None
+            logger.info(f"✅ 物品目录副本加载完成: {len(data)} 个物品，约 {data.memory // 1024 // 1024} MB")
+        except MemoryError as e:
+            self._disable(str(e))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ 物品目录副本加载失败: {e}")
+        finally:
+            self._pending = None
+
+    def _append_batch(self, data: _CatalogData, items: List[dict]):
+        for item in items:
+            data.append(item)
+        if data.memory > self.memory_budget_bytes:
+            raise MemoryError(f"超出内存预算 {self.memory_budget_bytes // 1024 // 1024} MB")
+
+    def _disable(self, reason: str):
+        self._data = None
+        self.disabled_reason = reason
+        logger.warning(f"⚠️ 物品目录副本已停用，查询回退到 MongoDB: {reason}")
+
+    def _invalidate(self, reason: str):
+        """副本数据不一致：停用并在后台重新加载（MongoDB 已写入成功，调用方不受影响）"""
+        logger.error(f"❌ 物品目录副本数据不一致，查询回退到 MongoDB 并重新加载: {reason}")
+        self._data = None
+        self.disabled_reason = reason
+        if self._database is None or (self._reload_task is not None and not self._reload_task.done()):
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        # 在空的上下文中创建任务，不继承触发写入的请求的 pymongo.timeout 截止时间
+        self._reload_task = contextvars.Context().run(asyncio.create_task, self.load(self._database))
+
+    def _apply(self, operation: str, *args):
+        if self._pending is not None:
+            self._pending.append((operation, args))
+        if self._data is None:
+            return
+        try:
+            getattr(self._data, operation)(*args)
+        except _CatalogInconsistency as e:
+            self._invalidate(str(e))
+            return
+        if self._data.memory > self.memory_budget_bytes:
+            self._disable(f"超出内存预算 {self.memory_budget_bytes // 1024 // 1024} MB")
+
+    def upsert(self, item: dict):
+        """新增或更新物品（item 为 MongoDB 文档，至少包含 CATALOG_PROJECTION 中的字段）"""
+        # 只保留需要的字段，调用方之后修改原文档不会影响重放
+        self._apply("upsert", {"_id": item["_id"], **{field: item.get(field) for field in CATALOG_PROJECTION}})
+
+    def upsert_many(self, items: Iterable[dict]):
+        for item in items:
+            self.upsert(item)
+
+    def remove(self, item_id: ObjectId):
+        self._apply("remove", item_id.binary)
+
+    def remove_many(self, item_ids: Iterable[ObjectId]):
+        for item_id in item_ids:
+            self.remove(item_id)
+
+    def set_owner(self, item_ids: Iterable[ObjectId], owner_id: ObjectId):
+        for item_id in item_ids:
+            self._apply("set_owner", item_id.binary, owner_id)
+
+    def price_range(
+        self,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        skip: int = 0,
+        limit: int = 50,
+    ) -> Tuple[int, List[ItemResponse]]:
+        """价格在 [min_price, max_price] 内的物品（按价格升序），返回 (总数, 当前页)"""
+        data = self._data
+        start = 0 if min_price is None else bisect_left(data.sorted_prices, min_price)
+        end = len(data.sorted_prices) if max_price is None else bisect_right(data.sorted_prices, max_price)
+        page = data.sorted_slots[start + skip:min(start + skip + limit, end)] if start + skip < end else []
+        return max(end - start, 0), [data.record(slot) for slot in page]
+
+    def cheapest(self, n: int) -> List[ItemResponse]:
+        data = self._data
+        return [data.record(slot) for slot in data.sorted_slots[:n]]
+
+    async def verify(self, database, sample: int) -> dict:
+        """与 MongoDB 对比：数量，以及双向抽样的价格、所有者和标题"""
+        data = self._data
+        report = {"ready": data is not None, "consistent": False, "mongo_count": None,
+                  "catalog_count": None, "sampled": 0, "mismatches": []}
+        report["mongo_count"] = await database.items.estimated_document_count()
+        if data is None:
+            return report
+        report["catalog_count"] = len(data)
+
+        mismatches = []
+        sampled = await database.items.aggregate([
+            {"$sample": {"size": sample}},
+            {"$project": {"price": 1, "owner_id": 1, "title": 1}},
+        ]).to_list(length=sample)
+        for item in sampled:
+            expected = (float(item["price"]), str(item["owner_id"]), item["title"])
+            if data.values(item["_id"].binary) != expected:
+                mismatches.append(str(item["_id"]))
+
+        # 副本中的物品在 MongoDB 中是否仍然存在
+        keys = data.sample_keys(sample)
+        if keys:
+            existing = await database.items.distinct("_id", {"_id": {"$in": [ObjectId(key) for key in keys]}})
+            existing = {object_id.binary for object_id in existing}
+            mismatches.extend(key.hex() for key in keys if key not in existing)
+
+        report["sampled"] = len(sampled) + len(keys)
+        report["mismatches"] = mismatches[:20]
+        report["consistent"] = not mismatches and report["mongo_count"] == report["catalog_count"]
+        return report
+
+    async def _verify_loop(self, database):
+        while True:
+            await asyncio.sleep(settings.CATALOG_VERIFY_SECONDS)
+            if self._data is None:
+                continue
+            try:
+                report = await self.verify(database, settings.CATALOG_VERIFY_SAMPLE)
+                if not report["consistent"]:
+                    logger.warning(
+                        f"⚠️ 物品目录副本与 MongoDB 不一致（{report['catalog_count']} / {report['mongo_count']}），重新加载"
+                    )
+                    await self.load(database)
+            except Exception as e:
+                logger.error(f"物品目录副本一致性检查失败: {e}")
+
+    def stats(self) -> dict:
+        data = self._data
+        return {
+            "enabled": settings.CATALOG_ENABLED,
+            "ready": data is not None,
+            "loading": self._pending is not None,
+            "items": len(data) if data is not None else 0,
+            "memory_bytes": data.memory if data is not None else 0,
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "loaded_at": self.loaded_at,
+            "disabled_reason": self.disabled_reason,
+        }
+
+
+catalog = CatalogIndex(settings.CATALOG_MAX_MEMORY_MB * 1024 * 1024)
@@ -0,0 +1,164 @@
+"""
+物品变更事件 - 进程内发布/订阅
+
+- 事件在发布时只序列化一次（SSE 格式的 bytes），然后分发给所有订阅者
+- 每个订阅者有一个有界队列，队列满（消费过慢）时该订阅者被踢出，客户端需重新连接
+- 订阅者空闲时只发送心跳，几乎不占用资源
+- 其他模块（如 webhook 投递）可通过 add_listener 接收原始事件，监听器必须是非阻塞的同步函数
+
+注意：事件只在当前进程内分发，多 worker 部署时每个 worker 只推送本进程处理的写操作
+"""
+import asyncio
+import itertools
+import json
+from typing import AsyncIterator, Callable, List, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+from loguru import logger
+
+from app.core.config import settings
+
+ITEM_CREATED = "item.created"
+ITEM_UPDATED = "item.updated"
+ITEM_DELETED = "item.deleted"
+ITEMS_IMPORTED = "items.imported"
+ITEM_EVENT_TYPES = (ITEM_CREATED, ITEM_UPDATED, ITEM_DELETED, ITEMS_IMPORTED)
+
+# 订阅者被踢出时放入队列的标记
+_EVICTED = object()
+
+HEARTBEAT = b": ping\n\n"
+
+
+class Subscriber:
+    """事件订阅者"""
+
+    __slots__ = ("queue", "evicted")
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.evicted = False
+
+    def evict(self):
+        """清空积压的事件并放入踢出标记"""
+        self.evicted = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_EVICTED)
+
+
+class EventHub:
+    """进程内事件中心"""
+
+    def __init__(self, queue_size: int, max_subscribers: int):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.published = 0
+        self.evicted = 0
+        self._subscribers: Set[Subscriber] = set()
+        self._listeners: List[Callable[[str, dict], None]] = []
+        self._sequence = itertools.count(1)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def has_capacity(self) -> bool:
+        return len(self._subscribers) < self.max_subscribers
+
+    def subscribe(self) -> Optional[Subscriber]:
+        """新建订阅者，超过上限时返回 None"""
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        subscriber = Subscriber(self.queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def add_listener(self, listener: Callable[[str, dict], None]):
+        """注册事件监听器，每次发布时以 (event_type, data) 调用"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, dict], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def publish(self, event_type: str, data: dict) -> bytes:
+        """发布事件，返回序列化后的 SSE 消息"""
+        payload = (
+            f"id: {next(self._sequence)}\n"
+            f"event: {event_type}\n"
+            f"data: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+        ).encode()
+        self.published += 1
+
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # 消费过慢：踢出该订阅者，不影响其他订阅者
+                self._subscribers.discard(subscriber)
+                subscriber.evict()
+                self.evicted += 1
+
+        for listener in self._listeners:
+            try:
+                listener(event_type, data)
+            except Exception as e:
+                logger.error(f"事件监听器处理 {event_type} 失败: {e}")
+        return payload
+
+    async def stream(self, subscriber: Subscriber, heartbeat_seconds: float) -> AsyncIterator[bytes]:
+        """订阅者的 SSE 消息流，空闲时定期发送心跳"""
+        try:
+            yield f"retry: {settings.SSE_RETRY_MS}\n\n".encode()
+            while True:
+                try:
+                    payload = await asyncio.wait_for(subscriber.queue.get(), heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+                    continue
+                if payload is _EVICTED:
+                    yield b"event: evicted\ndata: {}\n\n"
+                    return
+                yield payload
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def open_stream(self, heartbeat_seconds: float) -> AsyncIterator[bytes]:
+        """
+        开始迭代时才订阅的 SSE 消息流
+
+        响应开始发送前客户端就断开时生成器不会被迭代，因此不会占用订阅名额；
+        调用方应先用 has_capacity 检查名额，检查后名额被占满时只发送一条错误事件
+        """
+        subscriber = self.subscribe()
+        if subscriber is None:
+            yield f"retry: {settings.SSE_RETRY_MS}\n\n".encode()
+            yield "event: error\ndata: {\"detail\": \"订阅者数量已达上限\"}\n\n".encode()
+            return
+        stream = self.stream(subscriber, heartbeat_seconds)
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            self.unsubscribe(subscriber)
+            await stream.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self.subscriber_count,
+            "published": self.published,
+            "evicted": self.evicted,
+        }
+
+
+item_events = EventHub(settings.SSE_QUEUE_SIZE, settings.SSE_MAX_SUBSCRIBERS)
+
+
+def publish_item_event(event_type: str, data: dict):
+    """发布物品变更事件"""
+    item_events.publish(event_type, data)
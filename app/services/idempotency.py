@@ -0,0 +1,209 @@
+"""
+幂等键（Idempotency-Key）支持
+
+客户端超时重试创建请求时，携带相同的 Idempotency-Key 即可拿到第一次请求的响应，
+不会重复写入，也不会重复计算密码哈希。
+
+处理中的记录带有租约（locked_until）：处理请求的进程崩溃或卡住时，
+租约过期后重复请求会原子地接管执行，键不会一直停留在 processing 状态。
+
+idempotency_keys 集合中的记录：
+{
+    "_id": "<scope>:<key>",
+    "fingerprint": str,        # 请求内容的 HMAC，防止同一个键被用于不同的请求
+    "status": "processing" | "completed",
+    "lease_id": str,           # 当前执行者的标识，只有执行者本人可以完成或释放记录
+    "started_at": datetime,
+    "locked_until": datetime,  # 租约到期时间
+    "status_code": int,
+    "body": Any,
+    "created_at": datetime     # TTL 索引，过期自动删除
+}
+"""
+import asyncio
+import contextvars
+import hashlib
+import hmac
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from loguru import logger
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+
+STATUS_PROCESSING = "processing"
+STATUS_COMPLETED = "completed"
+
+# 本进程内正在处理的键，重复请求直接等待事件而不是轮询数据库
+_in_flight: Dict[str, asyncio.Event] = {}
+
+
+def request_fingerprint(*parts: Any) -> str:
+    """计算请求指纹（使用 SECRET_KEY 做 HMAC，请求中的密码不会以可逆推的形式保存）"""
+    payload = json.dumps(jsonable_encoder(parts), sort_keys=True, ensure_ascii=False)
+    return hmac.new(settings.SECRET_KEY.encode(), payload.encode(), hashlib.sha256).hexdigest()
+
+
+def _replay(record: dict) -> JSONResponse:
+    return JSONResponse(
+        status_code=record["status_code"],
+        content=record["body"],
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+
+def _lease_expired(record: dict, now: datetime) -> bool:
+    # 没有 locked_until 的旧记录按创建时间计算租约
+    locked_until = record.get("locked_until")
+    if locked_until is None:
+        locked_until = record["created_at"] + timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS)
+    return locked_until <= now
+
+
+async def _take_over(collection, record_id: str, lease_id: str) -> bool:
+    """原子地接管租约已过期的处理中记录，多个重复请求中只有一个能成功"""
+    now = datetime.utcnow()
+    expired_before = now - timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS)
+    record = await collection.find_one_and_update(
+        {
+            "_id": record_id,
+            "status": STATUS_PROCESSING,
+            "$or": [
+                {"locked_until": {"$lte": now}},
+                {"locked_until": {"$exists": False}, "created_at": {"$lte": expired_before}},
+            ],
+        },
+        {"$set": {
+            "lease_id": lease_id,
+            "started_at": now,
+            "locked_until": now + timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS),
+        }},
+        return_document=ReturnDocument.AFTER,
+    )
+    return record is not None
+
+
+async def _release(collection, record_id: str, lease_id: str):
+    """删除本请求持有的记录，允许客户端重试"""
+    # 在空的上下文中执行：请求可能已因超过截止时间被取消，不能继承请求的 pymongo.timeout
+    task = contextvars.Context().run(
+        asyncio.create_task, collection.delete_one({"_id": record_id, "lease_id": lease_id})
+    )
+    try:
+        await asyncio.shield(task)
+    except Exception as e:
+        logger.warning(f"释放幂等键失败 {record_id}: {e}")
+
+
+async def _wait_for_record(collection, record_id: str, fingerprint: str, deadline: float) -> Optional[dict]:
+    """
+    等待第一个请求处理完成，返回记录；记录被删除（第一个请求失败）时返回 None，
+    租约过期时返回处理中的记录，由调用方尝试接管。
+    请求内容不同时不等待，立即返回 422
+    """
+    delay = 0.05
+    while True:
+        record = await collection.find_one({"_id": record_id})
+        if record is None:
+            return None
+        if record["fingerprint"] != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key 已被用于不同的请求")
+        if record["status"] == STATUS_COMPLETED or _lease_expired(record, datetime.utcnow()):
+            return record
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise HTTPException(status_code=409, detail="相同幂等键的请求正在处理中，请稍后重试")
+
+        event = _in_flight.get(record_id)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.5)
+
+
+async def run_idempotent(
+    database,
+    key: Optional[str],
+    scope: str,
+    fingerprint: str,
+    handler: Callable[[], Awaitable[Any]],
+):
+    """
+    以幂等方式执行 handler
+
+    - 未携带幂等键：直接执行
+    - 首次请求：执行并保存响应
+    - 重复请求：等待首次请求完成后返回保存的响应
+    - 同一个键用于不同的请求内容：返回 422
+    """
+    if not key:
+        return await handler()
+    if len(key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key 过长")
+
+    collection = database[IDEMPOTENCY_COLLECTION]
+    record_id = f"{scope}:{key}"
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+
+    lease_id = uuid.uuid4().hex
+    while True:
+        now = datetime.utcnow()
+        try:
+            await collection.insert_one({
+                "_id": record_id,
+                "fingerprint": fingerprint,
+                "status": STATUS_PROCESSING,
+                "lease_id": lease_id,
+                "started_at": now,
+                "locked_until": now + timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS),
+                "created_at": now,
+            })
+            break
+        except DuplicateKeyError:
+            record = await _wait_for_record(collection, record_id, fingerprint, deadline)
+            if record is None:
+                # 第一个请求失败并释放了键，由本请求重新执行
+                continue
+            if record["status"] == STATUS_COMPLETED:
+                return _replay(record)
+            # 第一个请求的租约已过期（进程崩溃或卡住），接管执行；未抢到时继续等待
+            if await _take_over(collection, record_id, lease_id):
+                logger.warning(f"幂等键租约已过期，接管执行: {record_id}")
+                break
+
+    event = asyncio.Event()
+    _in_flight[record_id] = event
+    try:
+        result = await handler()
+    except BaseException:
+        # 请求失败时释放键，允许客户端重试
+        await _release(collection, record_id, lease_id)
+        raise
+    else:
+        # 只有仍持有租约时才保存响应，避免覆盖接管者的结果
+        await collection.update_one(
+            {"_id": record_id, "lease_id": lease_id},
+            {"$set": {
+                "status": STATUS_COMPLETED,
+                "status_code": 200,
+                "body": jsonable_encoder(result),
+            }}
+        )
+        return result
+    finally:
+        event.set()
+        _in_flight.pop(record_id, None)
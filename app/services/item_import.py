@@ -0,0 +1,184 @@
+"""
+物品批量导入（CSV / NDJSON）
+
+- 上传文件由 Starlette 写入 SpooledTemporaryFile（超过 1MB 落盘），不会整体读入内存。
+  没有直接解析 request.stream()：multipart 请求体需要先拆分出文件部分，Starlette 已按块读取请求体
+  并写入临时文件，代价是大文件多一次磁盘写入和读取；解析本身仍是逐行进行的
+- 在线程池中逐行解析并用 ItemCreate 校验，每次只处理 IMPORT_BATCH_SIZE 行
+- 解析下一批的同时写入当前批，写入使用无序 insert_many
+- 内存占用只与批大小有关，与文件大小无关
+
+CSV 需要包含表头 title,price，可选 description；NDJSON 每行一个 JSON 对象
+"""
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.models.item import ItemCreate
+from app.services.catalog import catalog
+
+FORMAT_CSV = "csv"
+FORMAT_NDJSON = "ndjson"
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """根据文件名或 Content-Type 判断文件格式"""
+    filename = (filename or "").lower()
+    content_type = (content_type or "").lower()
+    if filename.endswith(".csv") or "csv" in content_type:
+        return FORMAT_CSV
+    if filename.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type or "jsonl" in content_type:
+        return FORMAT_NDJSON
+    return None
+
+
+def _iter_raw_rows(text: io.TextIOBase, file_format: str) -> Iterator[Tuple[int, object]]:
+    """逐行读取，返回 (行号, 原始数据或解析错误)"""
+    if file_format == FORMAT_CSV:
+        reader = csv.DictReader(text)
+        for row_number, row in enumerate(reader, start=1):
+            yield row_number, row
+        return
+
+    row_number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            yield row_number, json.loads(line)
+        except ValueError as e:
+            yield row_number, ValueError(f"JSON 解析失败: {e}")
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+def _build_document(raw, owner_id: ObjectId, now: datetime) -> dict:
+    """校验一行数据并生成物品文档（字段与 ItemDocument 一致）"""
+    if isinstance(raw, Exception):
+        raise raw
+    if not isinstance(raw, dict):
+        raise ValueError("每行必须是 JSON 对象")
+    if raw.get("description") == "":
+        raw["description"] = None
+    item = ItemCreate(**raw)
+    return {
+        "_id": ObjectId(),
+        "title": item.title,
+        "description": item.description,
+        "price": item.price,
+        "owner_id": owner_id,
+        "created_at": now,
+        "updated_at": None,
+    }
+
+
+class ItemImporter:
+    """单次导入的执行状态"""
+
+    def __init__(self, database, owner_id: ObjectId, file_format: str):
+        self.database = database
+        self.owner_id = owner_id
+        self.file_format = file_format
+        self.total_rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self.errors_truncated = False
+
+    def _add_error(self, row_number: int, message: str):
+        self.failed += 1
+        if len(self.errors) < settings.IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+        else:
+            self.errors_truncated = True
+
+    def _parse_batch(
+        self, rows: Iterator[Tuple[int, object]], rows_before: int
+    ) -> Tuple[List[dict], List[int], List[Tuple[int, str]], int, bool]:
+        """
+        解析一批数据（在线程池中执行），返回 (文档, 对应行号, 错误, 读取行数, 是否已读完)
+
+        与上一批的写入并发执行，因此不修改导入状态，错误和计数回到事件循环后再合并
+        """
+        documents, row_numbers, errors = [], [], []
+        rows_read = 0
+        now = datetime.utcnow()
+        try:
+            for row_number, raw in rows:
+                rows_read += 1
+                try:
+                    documents.append(_build_document(raw, self.owner_id, now))
+                    row_numbers.append(row_number)
+                except ValidationError as e:
+                    errors.append((row_number, _format_validation_error(e)))
+                except (ValueError, TypeError) as e:
+                    errors.append((row_number, str(e)))
+                if len(documents) >= settings.IMPORT_BATCH_SIZE:
+                    return documents, row_numbers, errors, rows_read, False
+        except UnicodeDecodeError:
+            errors.append((rows_before + rows_read + 1, "文件编码必须为 UTF-8"))
+        return documents, row_numbers, errors, rows_read, True
+
+    async def _insert_batch(self, documents: List[dict], row_numbers: List[int]):
+        try:
+            result = await self.database.items.insert_many(documents, ordered=False)
+            self.inserted += len(result.inserted_ids)
+            catalog.upsert_many(documents)
+        except BulkWriteError as e:
+            self.inserted += e.details.get("nInserted", 0)
+            failed = set()
+            for write_error in e.details.get("writeErrors", []):
+                failed.add(write_error["index"])
+                self._add_error(row_numbers[write_error["index"]], write_error.get("errmsg", "写入失败"))
+            catalog.upsert_many(document for index, document in enumerate(documents) if index not in failed)
+
+    async def run(self, binary_file):
+        """执行导入"""
+        text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+        rows = _iter_raw_rows(text, self.file_format)
+        parsing = asyncio.ensure_future(run_in_threadpool(self._parse_batch, rows, 0))
+        try:
+            while True:
+                documents, row_numbers, errors, rows_read, done = await parsing
+                self.total_rows += rows_read
+                for row_number, message in errors:
+                    self._add_error(row_number, message)
+                # 写入当前批的同时解析下一批
+                if not done:
+                    parsing = asyncio.ensure_future(run_in_threadpool(self._parse_batch, rows, self.total_rows))
+                if documents:
+                    await self._insert_batch(documents, row_numbers)
+                if done:
+                    break
+        finally:
+            # 等待仍在进行的解析结束，再解除 TextIOWrapper 与上传文件的关联，
+            # 避免其被回收时关闭底层文件
+            if not parsing.done():
+                await asyncio.wait([parsing])
+            if not parsing.cancelled():
+                parsing.exception()
+            text.detach()
+
+    def report(self) -> dict:
+        return {
+            "total_rows": self.total_rows,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.errors_truncated,
+        }
@@ -0,0 +1,93 @@
+"""
+物品查询服务
+"""
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+from app.models.item import ItemDocument, ItemResponse
+from app.utils.pagination import decode_cursor, encode_cursor
+
+# 列表只读取响应需要的字段
+ITEM_LIST_PROJECTION = {"title": 1, "description": 1, "price": 1, "owner_id": 1, "created_at": 1}
+
+# 与 (owner_id, created_at desc, _id desc) 复合索引一致的排序
+OWNER_ITEMS_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+# 物品列表允许的排序字段（“-” 前缀表示倒序），均有对应的复合索引（见 ITEM_QUERY_INDEXES）
+ITEM_SORT_FIELDS = ("created_at", "price", "title")
+ITEM_SORT_PATTERN = "^-?(" + "|".join(ITEM_SORT_FIELDS) + ")$"
+DEFAULT_ITEM_SORT = "-created_at"
+
+
+def parse_item_sort(sort: str) -> List[Tuple[str, int]]:
+    """解析排序参数，以 _id 作为同方向的第二排序键"""
+    direction = DESCENDING if sort.startswith("-") else ASCENDING
+    field = sort.lstrip("-")
+    if field not in ITEM_SORT_FIELDS:
+        raise ValueError(f"不支持的排序字段: {field}")
+    return [(field, direction), ("_id", direction)]
+
+
+def build_item_query(
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    owner_id: Optional[ObjectId] = None,
+) -> dict:
+    """构建物品列表的过滤条件"""
+    query = {}
+    if owner_id is not None:
+        query["owner_id"] = owner_id
+    price_range = {}
+    if min_price is not None:
+        price_range["$gte"] = min_price
+    if max_price is not None:
+        price_range["$lte"] = max_price
+    if price_range:
+        query["price"] = price_range
+    return query
+
+
+def to_item_response(item_data: dict) -> ItemResponse:
+    """MongoDB 文档转换为物品响应模型"""
+    item_data = dict(item_data)
+    item_data["id"] = item_data.pop("_id", None)
+    item_doc = ItemDocument(**item_data)
+    return ItemResponse(
+        id=str(item_doc.id),
+        title=item_doc.title,
+        description=item_doc.description,
+        price=item_doc.price,
+        owner_id=str(item_doc.owner_id),
+        created_at=item_doc.created_at
+    )
+
+
+async def list_items_by_owner(
+    database,
+    owner_id: ObjectId,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+) -> Tuple[List[ItemResponse], Optional[str]]:
+    """按创建时间倒序列出用户的物品，返回 (物品列表, 下一页游标)"""
+    query = {"owner_id": owner_id}
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}},
+        ]
+
+    # 多取一条用于判断是否还有下一页
+    documents = await database.items.find(query, ITEM_LIST_PROJECTION).sort(
+        OWNER_ITEMS_SORT
+    ).limit(limit + 1).to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = encode_cursor(last["created_at"], last["_id"])
+
+    return [to_item_response(document) for document in documents], next_cursor
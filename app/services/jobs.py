@@ -0,0 +1,159 @@
+"""
+后台任务 - 删除用户后级联处理其物品
+
+任务记录保存在 jobs 集合中，由进程内的 asyncio 任务执行：
+- 每批最多处理 CASCADE_BATCH_SIZE 条物品，批次之间休眠 CASCADE_THROTTLE_MS，避免影响前台请求
+- 每批完成后更新进度，应用重启时未完成的任务会自动恢复
+- 任务记录先于删除用户创建，删除成功后才开始执行，避免用户已删除但物品无人处理；
+  执行前确认用户已被删除，删除失败时残留的任务记录不会误删物品
+"""
+import asyncio
+import contextvars
+from datetime import datetime
+from typing import Dict, Optional
+
+from bson import ObjectId
+from loguru import logger
+
+from app.core.config import settings
+from app.services.catalog import catalog
+
+JOBS_COLLECTION = "jobs"
+
+JOB_TYPE_USER_ITEMS_CASCADE = "user_items_cascade"
+
+JOB_STATUS_PENDING = "pending"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_COMPLETED = "completed"
+JOB_STATUS_FAILED = "failed"
+
+
+class JobRunner:
+    """进程内后台任务执行器"""
+
+    def __init__(self):
+        self._database = None
+        self._tasks: Dict[ObjectId, asyncio.Task] = {}
+
+    async def start(self, database):
+        """启动执行器，并恢复未完成的任务"""
+        self._database = database
+        cursor = database[JOBS_COLLECTION].find(
+            {"status": {"$in": [JOB_STATUS_PENDING, JOB_STATUS_RUNNING]}}
+        )
+        async for job in cursor:
+            logger.info(f"🔁 恢复后台任务 {job['_id']} ({job['type']})")
+            self._schedule(job)
+
+    async def stop(self):
+        """停止执行器，未完成的任务保持 running 状态，下次启动时恢复"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def create_user_items_cascade(
+        self,
+        user_id: ObjectId,
+        reassign_to: Optional[ObjectId] = None,
+    ) -> dict:
+        """创建级联任务记录（删除用户的物品，或将其转移给 reassign_to），删除用户后调用 submit 执行"""
+        job = {
+            "type": JOB_TYPE_USER_ITEMS_CASCADE,
+            "status": JOB_STATUS_PENDING,
+            "params": {"user_id": user_id, "reassign_to": reassign_to},
+            "processed": 0,
+            "error": None,
+            "created_at": datetime.utcnow(),
+            "updated_at": None,
+            "finished_at": None,
+        }
+        result = await self._database[JOBS_COLLECTION].insert_one(job)
+        job["_id"] = result.inserted_id
+        return job
+
+    def submit(self, job: dict):
+        """开始执行已创建的任务"""
+        self._schedule(job)
+
+    async def discard(self, job_id: ObjectId):
+        """删除尚未执行的任务记录（删除用户失败时调用）"""
+        await self._database[JOBS_COLLECTION].delete_one({"_id": job_id, "status": JOB_STATUS_PENDING})
+
+    async def enqueue_user_items_cascade(
+        self,
+        user_id: ObjectId,
+        reassign_to: Optional[ObjectId] = None,
+    ) -> ObjectId:
+        """创建并立即执行级联任务"""
+        job = await self.create_user_items_cascade(user_id, reassign_to)
+        self.submit(job)
+        return job["_id"]
+
+    def _schedule(self, job: dict):
+        if job["_id"] in self._tasks:
+            return
+        # 在空的上下文中创建任务：任务常由请求触发，不能继承请求的 pymongo.timeout 截止时间和请求上下文
+        task = contextvars.Context().run(asyncio.create_task, self._run(job))
+        self._tasks[job["_id"]] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job["_id"], None))
+
+    async def _update(self, job_id: ObjectId, **fields):
+        fields["updated_at"] = datetime.utcnow()
+        await self._database[JOBS_COLLECTION].update_one({"_id": job_id}, {"$set": fields})
+
+    async def _run(self, job: dict):
+        job_id = job["_id"]
+        try:
+            await self._update(job_id, status=JOB_STATUS_RUNNING)
+            await self._run_user_items_cascade(job)
+            await self._update(job_id, status=JOB_STATUS_COMPLETED, finished_at=datetime.utcnow())
+            logger.info(f"✅ 后台任务 {job_id} 完成")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ 后台任务 {job_id} 失败: {e}")
+            await self._update(job_id, status=JOB_STATUS_FAILED, error=str(e), finished_at=datetime.utcnow())
+
+    async def _run_user_items_cascade(self, job: dict):
+        items = self._database.items
+        user_id = job["params"]["user_id"]
+        reassign_to = job["params"].get("reassign_to")
+        processed = job.get("processed", 0)
+
+        # 删除用户失败（或进程在删除前退出）时任务记录可能残留，此时不能处理其物品
+        if await self._database.users.find_one({"_id": user_id}, {"_id": 1}):
+            raise RuntimeError(f"用户 {user_id} 未被删除，跳过级联处理")
+
+        # 每批按 _id 取一小段，处理后条件不再匹配，因此中断后从头查询即可继续
+        while True:
+            batch = await items.find(
+                {"owner_id": user_id}, {"_id": 1}
+            ).limit(settings.CASCADE_BATCH_SIZE).to_list(length=settings.CASCADE_BATCH_SIZE)
+            if not batch:
+                break
+
+            ids = [item["_id"] for item in batch]
+            if reassign_to is not None:
+                result = await items.update_many(
+                    {"_id": {"$in": ids}, "owner_id": user_id},
+                    {"$set": {"owner_id": reassign_to, "updated_at": datetime.utcnow()}}
+                )
+                catalog.set_owner(ids, reassign_to)
+                processed += result.modified_count
+            else:
+                result = await items.delete_many({"_id": {"$in": ids}, "owner_id": user_id})
+                catalog.remove_many(ids)
+                processed += result.deleted_count
+
+            await self._update(job["_id"], processed=processed)
+            await asyncio.sleep(settings.CASCADE_THROTTLE_MS / 1000)
+
+
+job_runner = JobRunner()
+
+
+async def get_job(database, job_id: ObjectId) -> Optional[dict]:
+    """查询任务"""
+    return await database[JOBS_COLLECTION].find_one({"_id": job_id})
@@ -0,0 +1,148 @@
+"""
+物品价格历史 - 分桶存储
+
+每个物品在每个时间窗口内只有一个（或少数几个）文档，价格变更追加到文档的 changes 数组中：
+{
+    "item_id": ObjectId,
+    "bucket_start": datetime,   # 时间窗口起点
+    "count": int,               # 桶内变更数，达到上限后新建桶
+    "first_at": datetime,
+    "last_at": datetime,
+    "changes": [{"change_id", "price", "old_price", "changed_at", "changed_by"}]
+}
+写入是一次 upsert，范围查询只需读取少量文档，由 (item_id, bucket_start) 索引支持
+
+单机 MongoDB 不支持事务，价格历史通过物品文档中的待写列表（outbox）保证不丢失：
+更新物品时用同一条 update_one 把变更追加到 pending_price_changes，写入历史后再移除；
+进程在两步之间退出时，启动时由 replay_pending_price_changes 补写。按 change_id 去重，重复补写不会产生重复记录
+"""
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from bson import ObjectId
+
+from app.core.config import settings
+
+PRICE_HISTORY_COLLECTION = "item_price_history"
+# 物品文档中尚未写入价格历史的变更
+PENDING_PRICE_CHANGES_FIELD = "pending_price_changes"
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    """统一为不带时区的 UTC 时间（与 datetime.utcnow() 一致）"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def bucket_start(value: datetime) -> datetime:
+    """计算时间所在窗口的起点"""
+    window = timedelta(hours=settings.PRICE_HISTORY_BUCKET_HOURS)
+    epoch = datetime(1970, 1, 1)
+    return epoch + ((value - epoch) // window) * window
+
+
+def new_price_change(
+    old_price: Optional[float],
+    new_price: float,
+    changed_by: Optional[ObjectId] = None,
+    changed_at: Optional[datetime] = None,
+) -> dict:
+    """创建一条价格变更（随物品更新写入 pending_price_changes，再由 record_price_change 写入历史）"""
+    return {
+        "change_id": ObjectId(),
+        "price": new_price,
+        "old_price": old_price,
+        "changed_at": changed_at or datetime.utcnow(),
+        "changed_by": changed_by,
+    }
+
+
+async def record_price_change(database, item_id: ObjectId, change: dict):
+    """把一条待写变更追加到价格历史并从物品的待写列表中移除（可重复调用）"""
+    history = database[PRICE_HISTORY_COLLECTION]
+    recorded = await history.find_one(
+        {"item_id": item_id, "changes.change_id": change["change_id"]}, {"_id": 1}
+    )
+    if recorded is None:
+        await _append_change(history, item_id, change)
+    await database.items.update_one(
+        {"_id": item_id},
+        {"$pull": {PENDING_PRICE_CHANGES_FIELD: {"change_id": change["change_id"]}}},
+    )
+
+
+async def _append_change(history, item_id: ObjectId, change: dict):
+    changed_at = change["changed_at"]
+    await history.update_one(
+        {
+            "item_id": item_id,
+            "bucket_start": bucket_start(changed_at),
+            "count": {"$lt": settings.PRICE_HISTORY_BUCKET_SIZE},
+        },
+        {
+            "$push": {"changes": change},
+            "$inc": {"count": 1},
+            "$min": {"first_at": changed_at},
+            "$max": {"last_at": changed_at},
+        },
+        upsert=True,
+    )
+
+
+async def replay_pending_price_changes(database) -> int:
+    """补写上次运行中已更新物品但未写入历史的价格变更，返回补写条数"""
+    replayed = 0
+    cursor = database.items.find(
+        {f"{PENDING_PRICE_CHANGES_FIELD}.change_id": {"$exists": True}},
+        {PENDING_PRICE_CHANGES_FIELD: 1},
+    )
+    async for item in cursor:
+        for change in item[PENDING_PRICE_CHANGES_FIELD]:
+            await record_price_change(database, item["_id"], change)
+            replayed += 1
+    return replayed
+
+
+async def get_price_history(
+    database,
+    item_id: ObjectId,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 1000,
+) -> List[dict]:
+    """查询时间范围内的价格变更（按时间升序）"""
+    start = to_naive_utc(start) if start else None
+    end = to_naive_utc(end) if end else None
+
+    query = {"item_id": item_id}
+    bucket_range = {}
+    if start:
+        bucket_range["$gte"] = bucket_start(start)
+    if end:
+        bucket_range["$lte"] = end
+    if bucket_range:
+        query["bucket_start"] = bucket_range
+
+    changes = []
+    current_start = None
+    cursor = database[PRICE_HISTORY_COLLECTION].find(
+        query, {"_id": 0, "bucket_start": 1, "changes": 1}
+    ).sort("bucket_start", 1)
+    async for bucket in cursor:
+        # 桶满后同一窗口会新建桶，这些桶中的变更时间可能交错，
+        # 因此同一窗口的桶全部合并后才按 limit 截断
+        if bucket["bucket_start"] != current_start:
+            if len(changes) >= limit:
+                break
+            current_start = bucket["bucket_start"]
+        for change in bucket["changes"]:
+            changed_at = change["changed_at"]
+            if start and changed_at < start:
+                continue
+            if end and changed_at > end:
+                continue
+            changes.append(change)
+
+    changes.sort(key=lambda change: change["changed_at"])
+    return changes[:limit]
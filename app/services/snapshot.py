@@ -0,0 +1,469 @@
+"""
+物品列式快照 - 供离线分析使用
+
+文件格式（小端字节序，所有列按 8 字节对齐，可直接 mmap）：
+
+    [8 字节 magic "ITEMSNAP"][8 字节无符号整数：头部长度][JSON 头部（末尾以空格补齐）][列数据]
+
+JSON 头部记录行数、水位线以及每一列的 dtype、绝对偏移和元素个数，dtype 使用 numpy 的写法，
+分析端可以直接用 numpy.memmap(path, dtype, mode="r", offset, shape) 打开任意一列：
+
+- id: S12，物品 ObjectId 的 12 字节
+- price: <f8
+- created_at / updated_at: <i8，UTC 微秒时间戳（未更新过的物品 updated_at 等于 created_at）
+- owner / title: <u4，字典编码，字典本身以 <name>.offsets（<u8，长度为字典大小 + 1）
+  和 <name>.data（u1，UTF-8 拼接）两列保存
+
+快照按水位线增量构建：只读取 created_at 或 updated_at 不早于上次水位线的物品并按 id 覆盖。
+删除不会反映在增量构建中：距上次全量构建超过 SNAPSHOT_FULL_REBUILD_HOURS 时自动改为全量重建
+（也可传 full=True）；每次写入前丢弃不再被任何行引用的字典值（改名、转移所有者后的旧值）
+"""
+import asyncio
+import contextlib
+import heapq
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from loguru import logger
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+MAGIC = b"ITEMSNAP"
+VERSION = 1
+SNAPSHOT_FILENAME = "items.snapshot"
+
+_PREAMBLE = struct.Struct("<8sQ")
+_ALIGN = 8
+_ID_SIZE = 12
+_EPOCH = datetime(1970, 1, 1)
+_ENDIAN = "<" if sys.byteorder == "little" else ">"
+
+# 列名 -> (numpy dtype, array typecode)
+_NUMERIC_COLUMNS = {
+    "price": ("f8", "d"),
+    "created_at": ("i8", "q"),
+    "updated_at": ("i8", "q"),
+    "owner": ("u4", "I"),
+    "title": ("u4", "I"),
+}
+_DICTIONARIES = ("owner", "title")
+
+SNAPSHOT_PROJECTION = {"price": 1, "created_at": 1, "updated_at": 1, "owner_id": 1, "title": 1}
+
+
+def snapshot_path() -> str:
+    return os.path.join(settings.SNAPSHOT_DIR, SNAPSHOT_FILENAME)
+
+
+def to_micros(value: datetime) -> int:
+    """datetime 转为 UTC 微秒时间戳（无时区的视为 UTC）"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=value)
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _fsync_directory(directory: str):
+    """同步目录项，保证 os.replace 的结果在崩溃后仍然可见（不支持的平台上忽略）"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _Dictionary:
+    """字符串字典编码"""
+
+    __slots__ = ("values", "codes")
+
+    def __init__(self, values: Optional[List[str]] = None):
+        self.values = list(values or [])
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def to_columns(self):
+        offsets = array("Q", [0])
+        data = bytearray()
+        for value in self.values:
+            data += value.encode()
+            offsets.append(len(data))
+        return offsets, data
+
+
+class ItemSnapshot:
+    """只读打开的快照文件（基于 mmap，列以零拷贝的 memoryview 返回）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_length = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"不是有效的快照文件: {path}")
+        self.header = json.loads(self._mmap[_PREAMBLE.size:_PREAMBLE.size + header_length])
+        self._view = memoryview(self._mmap)
+
+    @property
+    def rows(self) -> int:
+        return self.header["rows"]
+
+    @property
+    def watermark(self) -> Optional[int]:
+        return self.header.get("watermark")
+
+    def _raw(self, name: str) -> memoryview:
+        column = self.header["columns"][name]
+        # dtype 形如 "<f8"、"|S12"、"|u1"，第三个字符起为元素字节数
+        size = int(column["dtype"][2:])
+        return self._view[column["offset"]:column["offset"] + column["length"] * size]
+
+    def column(self, name: str) -> memoryview:
+        """数值列的类型化视图"""
+        return self._raw(name).cast(_NUMERIC_COLUMNS[name][1])
+
+    def ids(self) -> memoryview:
+        return self._raw("id")
+
+    def dictionary(self, name: str) -> List[str]:
+        """解码整个字典"""
+        offsets = self._raw(f"{name}.offsets").cast("Q")
+        data = self._raw(f"{name}.data")
+        return [bytes(data[offsets[i]:offsets[i + 1]]).decode() for i in range(len(offsets) - 1)]
+
+    def dictionary_value(self, name: str, code: int) -> str:
+        offsets = self._raw(f"{name}.offsets").cast("Q")
+        return bytes(self._raw(f"{name}.data")[offsets[code]:offsets[code + 1]]).decode()
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SnapshotBuilder:
+    """在内存中构建快照，按物品 id 覆盖或追加"""
+
+    def __init__(self):
+        self.ids = bytearray()
+        self.columns: Dict[str, array] = {
+            name: array(typecode) for name, (_, typecode) in _NUMERIC_COLUMNS.items()
+        }
+        self.dictionaries = {name: _Dictionary() for name in _DICTIONARIES}
+        self.watermark: Optional[int] = None
+        # 上次全量构建的时间（UTC 微秒），增量构建时沿用
+        self.full_built_at: Optional[int] = None
+        self._rows: Dict[bytes, int] = {}
+
+    @classmethod
+    def from_snapshot(cls, snapshot: ItemSnapshot) -> "SnapshotBuilder":
+        builder = cls()
+        builder.ids = bytearray(snapshot.ids())
+        for name in _NUMERIC_COLUMNS:
+            builder.columns[name] = array(_NUMERIC_COLUMNS[name][1], snapshot.column(name))
+        for name in _DICTIONARIES:
+            builder.dictionaries[name] = _Dictionary(snapshot.dictionary(name))
+        builder.watermark = snapshot.watermark
+        builder.full_built_at = snapshot.header.get("full_built_at")
+        ids = bytes(builder.ids)
+        builder._rows = {ids[i:i + _ID_SIZE]: i // _ID_SIZE for i in range(0, len(ids), _ID_SIZE)}
+        return builder
+
+    @property
+    def rows(self) -> int:
+        return len(self._rows)
+
+    def upsert(self, item: dict):
+        """写入一个物品文档（需包含 SNAPSHOT_PROJECTION 中的字段）"""
+        created_at = to_micros(item["created_at"])
+        updated_at = to_micros(item["updated_at"]) if item.get("updated_at") else created_at
+        values = {
+            "price": float(item["price"]),
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "owner": self.dictionaries["owner"].encode(str(item["owner_id"])),
+            "title": self.dictionaries["title"].encode(item.get("title", "")),
+        }
+        key = item["_id"].binary
+        row = self._rows.get(key)
+        if row is None:
+            self._rows[key] = self.rows
+            self.ids += key
+            for name, value in values.items():
+                self.columns[name].append(value)
+        else:
+            for name, value in values.items():
+                self.columns[name][row] = value
+        self.watermark = max(self.watermark or updated_at, updated_at)
+
+    def upsert_many(self, items: List[dict]):
+        for item in items:
+            self.upsert(item)
+
+    def compact_dictionaries(self):
+        """丢弃没有被任何行引用的字典值并重新编码，避免字典随增量构建无限增长"""
+        for name in _DICTIONARIES:
+            column = self.columns[name]
+            dictionary = self.dictionaries[name]
+            used = sorted(set(column))
+            if len(used) == len(dictionary.values):
+                continue
+            remap = {old: new for new, old in enumerate(used)}
+            self.columns[name] = array(column.typecode, (remap[code] for code in column))
+            self.dictionaries[name] = _Dictionary([dictionary.values[code] for code in used])
+
+    def _layout(self):
+        """按写入顺序返回 (列名, numpy dtype, 元素个数, bytes-like)"""
+        blocks = [("id", f"|S{_ID_SIZE}", self.rows, self.ids)]
+        for name, (dtype, _) in _NUMERIC_COLUMNS.items():
+            column = self.columns[name]
+            blocks.append((name, _ENDIAN + dtype, len(column), column))
+        for name in _DICTIONARIES:
+            offsets, data = self.dictionaries[name].to_columns()
+            blocks.append((f"{name}.offsets", _ENDIAN + "u8", len(offsets), offsets))
+            blocks.append((f"{name}.data", "|u1", len(data), data))
+        return blocks
+
+    def write(self, path: str, built_at: datetime) -> int:
+        """写入文件（先写临时文件再原子替换，正在读取旧文件的请求不受影响），返回文件大小"""
+        self.compact_dictionaries()
+        blocks = self._layout()
+        header = {
+            "version": VERSION,
+            "rows": self.rows,
+            "built_at": built_at.isoformat(),
+            "watermark": self.watermark,
+            "full_built_at": self.full_built_at,
+            "columns": {},
+        }
+
+        # 头部长度影响数据起始位置，迭代到偏移稳定为止
+        data_start = 0
+        while True:
+            offset = data_start
+            for name, dtype, length, block in blocks:
+                header["columns"][name] = {"dtype": dtype, "offset": offset, "length": length}
+                offset = _align(offset + memoryview(block).nbytes)
+            raw_header = json.dumps(header, ensure_ascii=False).encode()
+            required = _align(_PREAMBLE.size + len(raw_header))
+            if required <= data_start:
+                break
+            data_start = required
+
+        raw_header = raw_header.ljust(data_start - _PREAMBLE.size, b" ")
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # 临时文件名唯一，多个进程同时重建快照时不会互相覆盖
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(_PREAMBLE.pack(MAGIC, len(raw_header)))
+                file.write(raw_header)
+                for name, _, _, block in blocks:
+                    file.seek(header["columns"][name]["offset"])
+                    file.write(memoryview(block).cast("B"))
+                size = file.tell()
+                # 替换前落盘，避免崩溃后留下指向未写完数据的文件
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+            raise
+        _fsync_directory(directory)
+        return size
+
+
+_build_lock = asyncio.Lock()
+
+
+def _full_rebuild_due(builder: SnapshotBuilder) -> bool:
+    """距上次全量构建是否已超过 SNAPSHOT_FULL_REBUILD_HOURS（旧快照没有记录时视为需要）"""
+    if not settings.SNAPSHOT_FULL_REBUILD_HOURS:
+        return False
+    if builder.full_built_at is None:
+        return True
+    age = datetime.utcnow() - from_micros(builder.full_built_at)
+    return age >= timedelta(hours=settings.SNAPSHOT_FULL_REBUILD_HOURS)
+
+
+async def build_items_snapshot(database, full: bool = False, path: Optional[str] = None) -> dict:
+    """
+    构建物品快照。已有快照且 full 为 False 时，只读取水位线之后新建或修改过的物品
+    """
+    path = path or snapshot_path()
+    async with _build_lock:
+        builder = None
+        if not full and os.path.exists(path):
+            with ItemSnapshot(path) as snapshot:
+                builder = await run_in_threadpool(SnapshotBuilder.from_snapshot, snapshot)
+        incremental = builder is not None and builder.watermark is not None and not _full_rebuild_due(builder)
+        builder = builder if incremental else SnapshotBuilder()
+        if not incremental:
+            builder.full_built_at = to_micros(datetime.utcnow())
+
+        query = {}
+        if incremental:
+            # 回退一小段时间，覆盖写入时间早于提交时间的物品；重复读取的物品按 id 覆盖
+            since = from_micros(builder.watermark) - timedelta(seconds=settings.SNAPSHOT_WATERMARK_LAG_SECONDS)
+            query = {"$or": [{"created_at": {"$gte": since}}, {"updated_at": {"$gte": since}}]}
+
+        # 编码在线程池中按批进行，避免长时间占用事件循环
+        changed = 0
+        batch = []
+        cursor = database.items.find(query, SNAPSHOT_PROJECTION, batch_size=settings.SNAPSHOT_BATCH_SIZE)
+        async for item in cursor:
+            batch.append(item)
+            if len(batch) >= settings.SNAPSHOT_BATCH_SIZE:
+                await run_in_threadpool(builder.upsert_many, batch)
+                changed += len(batch)
+                batch = []
+        if batch:
+            await run_in_threadpool(builder.upsert_many, batch)
+            changed += len(batch)
+
+        built_at = datetime.utcnow()
+        size = await run_in_threadpool(builder.write, path, built_at)
+        logger.info(
+            f"📦 物品快照构建完成（{'增量' if incremental else '全量'}）: 共 {builder.rows} 行，本次读取 {changed} 行"
+        )
+        return {
+            "mode": "incremental" if incremental else "full",
+            "rows": builder.rows,
+            "changed": changed,
+            "size_bytes": size,
+            "built_at": built_at,
+            "watermark": from_micros(builder.watermark) if builder.watermark is not None else None,
+        }
+
+
+def _percentile(ordered, fraction: float) -> float:
+    """线性插值百分位数，ordered 已排序"""
+    position = fraction * (len(ordered) - 1)
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def compute_price_stats(snapshot: ItemSnapshot, bins: int = 20, top_owners: int = 10) -> dict:
+    """在快照上计算价格统计：汇总、百分位数、直方图和按所有者汇总"""
+    prices = snapshot.column("price")
+    count = len(prices)
+    stats = {
+        "rows": count,
+        "built_at": snapshot.header["built_at"],
+        "sum": 0.0,
+        "min": None,
+        "max": None,
+        "mean": None,
+        "percentiles": {},
+        "histogram": [],
+        "top_owners": [],
+    }
+    if not count:
+        return stats
+
+    # 排序由内置 sorted 完成（会为每个价格创建 float 对象），结果存回紧凑的 array
+    ordered = array("d", sorted(prices))
+    total = math.fsum(ordered)
+    low, high = ordered[0], ordered[-1]
+    stats.update(sum=total, min=low, max=high, mean=total / count)
+    stats["percentiles"] = {
+        f"p{p}": _percentile(ordered, p / 100) for p in (50, 90, 95, 99)
+    }
+
+    # 等宽直方图：每个边界在有序数组上二分查找
+    width = (high - low) / bins or 1.0
+    edges = [low + width * i for i in range(bins)] + [high]
+    positions = [bisect_left(ordered, edge) for edge in edges[:-1]] + [bisect_right(ordered, high)]
+    stats["histogram"] = [
+        {"start": edges[i], "end": edges[i + 1], "count": positions[i + 1] - positions[i]}
+        for i in range(bins)
+    ]
+
+    # 按所有者汇总：所有者已字典编码，逐行在 Python 中累加到定长列表（按编码下标，无需哈希）
+    owner_count = snapshot.header["columns"]["owner.offsets"]["length"] - 1
+    sums = [0.0] * owner_count
+    counts = [0] * owner_count
+    for code, price in zip(snapshot.column("owner"), prices):
+        sums[code] += price
+        counts[code] += 1
+    stats["top_owners"] = [
+        {"owner_id": snapshot.dictionary_value("owner", code), "count": counts[code], "sum": sums[code]}
+        for code in heapq.nlargest(top_owners, range(owner_count), key=sums.__getitem__)
+        if counts[code]
+    ]
+    return stats
+
+
+def read_price_stats(bins: int, top_owners: int, path: Optional[str] = None) -> Optional[dict]:
+    """打开快照文件并计算价格统计，快照不存在时返回 None"""
+    path = path or snapshot_path()
+    if not os.path.exists(path):
+        return None
+    with ItemSnapshot(path) as snapshot:
+        return compute_price_stats(snapshot, bins, top_owners)
+
+
+class SnapshotRefresher:
+    """定期增量构建快照"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, database):
+        if self._task is None and settings.SNAPSHOT_REFRESH_SECONDS > 0:
+            self._task = asyncio.create_task(self._run(database))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, database):
+        while True:
+            await asyncio.sleep(settings.SNAPSHOT_REFRESH_SECONDS)
+            try:
+                await build_items_snapshot(database)
+            except Exception as e:
+                logger.error(f"定期构建物品快照失败: {e}")
+
+
+snapshot_refresher = SnapshotRefresher()
@@ -0,0 +1,78 @@
+"""
+用户查询服务
+"""
+from typing import Optional
+
+from bson import ObjectId
+
+from app.models.user import UserResponse, UserSummary
+from app.services.items import ITEM_LIST_PROJECTION, OWNER_ITEMS_SORT, to_item_response
+
+
+def to_user_response(user_data: dict) -> UserResponse:
+    """MongoDB 文档（可不含密码哈希）转换为用户响应模型"""
+    return UserResponse(
+        id=str(user_data["_id"]),
+        username=user_data["username"],
+        email=user_data["email"],
+        is_active=user_data.get("is_active", True),
+        is_superuser=user_data.get("is_superuser", False),
+        created_at=user_data["created_at"]
+    )
+
+
+def user_summary_pipeline(user_id: ObjectId, recent: int) -> list:
+    """
+    用户概览聚合管道：从 users 出发，通过非关联 $lookup 在 items 上执行一次 $facet，
+    同时得到物品统计和最近的物品。$lookup 子管道只执行一次，并使用 owner_id 开头的复合索引
+    """
+    return [
+        {"$match": {"_id": user_id}},
+        {"$lookup": {
+            "from": "items",
+            "pipeline": [
+                {"$match": {"owner_id": user_id}},
+                {"$facet": {
+                    "totals": [
+                        {"$group": {
+                            "_id": None,
+                            "count": {"$sum": 1},
+                            "price_total": {"$sum": "$price"},
+                            "price_avg": {"$avg": "$price"},
+                            "price_min": {"$min": "$price"},
+                            "price_max": {"$max": "$price"},
+                        }},
+                    ],
+                    "recent": [
+                        {"$sort": dict(OWNER_ITEMS_SORT)},
+                        {"$limit": recent},
+                        {"$project": ITEM_LIST_PROJECTION},
+                    ],
+                }},
+            ],
+            "as": "item_summary",
+        }},
+        {"$project": {"hashed_password": 0}},
+    ]
+
+
+async def get_user_summary(database, user_id: ObjectId, recent: int = 5) -> Optional[UserSummary]:
+    """一次数据库往返获取用户信息、物品统计和最近的物品"""
+    documents = await database.users.aggregate(
+        user_summary_pipeline(user_id, recent)
+    ).to_list(length=1)
+    if not documents:
+        return None
+
+    user_data = documents[0]
+    item_summary = user_data.pop("item_summary")[0]
+    totals = item_summary["totals"][0] if item_summary["totals"] else {}
+    return UserSummary(
+        user=to_user_response(user_data),
+        item_count=totals.get("count", 0),
+        price_total=totals.get("price_total", 0.0),
+        price_avg=totals.get("price_avg"),
+        price_min=totals.get("price_min"),
+        price_max=totals.get("price_max"),
+        recent_items=[to_item_response(item) for item in item_summary["recent"]]
+    )
@@ -0,0 +1,501 @@
+"""
+Webhook 投递 - 将物品变更事件推送给已注册的订阅地址
+
+- 写接口只把事件放入有界队列（不等待网络），队列满时丢弃并记录日志
+- 后台 worker 从队列中按批取出事件，按订阅分组后放入各订阅自己的有界队列，每个地址每批只发一次 POST
+- 每个订阅由独立任务按顺序投递（含重试），一个地址响应慢或不可用不会阻塞其他订阅；
+  订阅队列满时该批事件直接写入死信
+- 所有投递共用一个带连接池的 httpx.AsyncClient
+- 失败时指数退避重试，重试耗尽（或返回不可重试的 4xx）后写入死信
+- 订阅列表缓存在内存中，修改后立即刷新，并定期从数据库重新加载（多 worker 部署）
+- 只允许 https 地址（WEBHOOK_ALLOWED_HOSTS 中的主机除外）；注册时解析域名，拒绝内网、回环、
+  链路本地和保留地址，投递时在建立连接时解析并校验，只连接校验过的 IP，防止 DNS 重绑定
+"""
+import asyncio
+import contextlib
+import hashlib
+import hmac
+import ipaddress
+import json
+import random
+import socket
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+import httpcore
+import httpx
+from fastapi.encoders import jsonable_encoder
+from loguru import logger
+
+from app.core.config import settings
+
+WEBHOOKS_COLLECTION = "webhooks"
+DEAD_LETTERS_COLLECTION = "webhook_dead_letters"
+
+SIGNATURE_HEADER = "X-Webhook-Signature"
+
+DeadLetterSink = Callable[[dict], Awaitable[None]]
+
+
+def sign_payload(secret: str, body: bytes) -> str:
+    """计算请求体签名，接收方用相同的密钥校验"""
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def mongo_dead_letter_sink(database) -> DeadLetterSink:
+    """死信写入 webhook_dead_letters 集合"""
+    async def sink(record: dict):
+        await database[DEAD_LETTERS_COLLECTION].insert_one(record)
+    return sink
+
+
+class WebhookURLError(ValueError):
+    """Webhook 地址不允许投递"""
+
+
+def _is_allowed_host(host: str) -> bool:
+    return host.lower() in {allowed.lower() for allowed in settings.WEBHOOK_ALLOWED_HOSTS}
+
+
+def _is_public_address(address: str) -> bool:
+    """是否为公网地址（排除内网、回环、链路本地、保留、组播等）"""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def parse_webhook_url(url: str) -> Tuple[str, int]:
+    """校验协议和主机，返回 (主机, 端口)；不解析域名"""
+    try:
+        parsed = httpx.URL(url)
+    except httpx.InvalidURL as e:
+        raise WebhookURLError(f"无效的 Webhook 地址: {e}")
+    host = parsed.host
+    if not host:
+        raise WebhookURLError("Webhook 地址缺少主机名")
+    if parsed.scheme != "https" and not (parsed.scheme == "http" and _is_allowed_host(host)):
+        raise WebhookURLError("Webhook 地址必须使用 https")
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    return host, port
+
+
+async def resolve_public_addresses(host: str, port: int) -> List[str]:
+    """解析主机名，任一地址不是公网地址时拒绝；白名单主机不做限制"""
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise WebhookURLError(f"无法解析 Webhook 主机 {host}: {e}")
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    if not addresses:
+        raise WebhookURLError(f"无法解析 Webhook 主机 {host}")
+    if not _is_allowed_host(host):
+        blocked = [address for address in addresses if not _is_public_address(address)]
+        if blocked:
+            raise WebhookURLError(f"Webhook 主机 {host} 指向非公网地址: {', '.join(blocked)}")
+    return addresses
+
+
+async def validate_webhook_url(url: str):
+    """注册时校验 Webhook 地址（投递时由 _PublicAddressBackend 在建立连接时校验）"""
+    host, port = parse_webhook_url(url)
+    await resolve_public_addresses(host, port)
+
+
+class _BlockedAddressError(httpcore.ConnectError):
+    """连接时解析出的地址未通过校验"""
+
+
+class WebhookAddressBlocked(httpx.ConnectError):
+    """投递时 Webhook 主机解析到了不允许的地址（重试没有意义）"""
+
+
+class _PublicAddressBackend(httpcore.AsyncNetworkBackend):
+    """建立连接时解析并校验地址，只连接校验过的 IP，防止注册后 DNS 被改指到内网（DNS 重绑定）"""
+
+    def __init__(self):
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            addresses = await resolve_public_addresses(host, port)
+        except WebhookURLError as e:
+            raise _BlockedAddressError(str(e))
+        # TLS 握手仍使用原主机名（SNI 和证书校验不受影响）
+        return await self._backend.connect_tcp(
+            addresses[0], port, timeout=timeout, local_address=local_address, socket_options=socket_options
+        )
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        raise _BlockedAddressError("Webhook 不支持 Unix socket")
+
+    async def sleep(self, seconds: float):
+        await self._backend.sleep(seconds)
+
+
+# httpcore 异常到 httpx 异常的映射（子类在前）
+_EXCEPTION_MAP = (
+    (_BlockedAddressError, WebhookAddressBlocked),
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+@contextlib.contextmanager
+def _map_exceptions(request: httpx.Request):
+    try:
+        yield
+    except Exception as e:
+        for core_error, httpx_error in _EXCEPTION_MAP:
+            if isinstance(e, core_error):
+                raise httpx_error(str(e), request=request) from e
+        raise
+
+
+class _ResponseStream(httpx.AsyncByteStream):
+    def __init__(self, stream, request: httpx.Request):
+        self._stream = stream
+        self._request = request
+
+    async def __aiter__(self):
+        with _map_exceptions(self._request):
+            async for chunk in self._stream:
+                yield chunk
+
+    async def aclose(self):
+        if hasattr(self._stream, "aclose"):
+            await self._stream.aclose()
+
+
+class _PublicAddressTransport(httpx.AsyncBaseTransport):
+    """httpx 传输层：使用自建的 httpcore 连接池，由 _PublicAddressBackend 建立连接"""
+
+    def __init__(self, limits: httpx.Limits):
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(trust_env=False),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            network_backend=_PublicAddressBackend(),
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with _map_exceptions(request):
+            response = await self._pool.handle_async_request(core_request)
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=_ResponseStream(response.stream, request),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self._pool.aclose()
+
+
+class _Endpoint:
+    """单个订阅的投递队列，由独立任务按顺序投递，慢速或不可用的地址不会阻塞其他订阅"""
+
+    __slots__ = ("queue", "task")
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.task: Optional[asyncio.Task] = None
+
+
+class WebhookDispatcher:
+    """Webhook 后台投递器"""
+
+    def __init__(
+        self,
+        queue_size: int,
+        workers: int,
+        batch_size: int,
+        batch_wait_ms: int,
+        max_retries: int,
+        retry_backoff_ms: int,
+        endpoint_queue_size: int,
+    ):
+        self.queue_size = queue_size
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait_ms = batch_wait_ms
+        self.max_retries = max_retries
+        self.retry_backoff_ms = retry_backoff_ms
+        self.endpoint_queue_size = endpoint_queue_size
+        self.delivered = 0
+        self.dropped = 0
+        self.dead_lettered = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._database = None
+        self._dead_letter: Optional[DeadLetterSink] = None
+        self._subscriptions: List[dict] = []
+        self._endpoints: Dict[Hashable, _Endpoint] = {}
+        # 包括已删除订阅仍在发送剩余事件的任务
+        self._endpoint_tasks: Set[asyncio.Task] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(
+        self,
+        database,
+        dead_letter: Optional[DeadLetterSink] = None,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        """启动投递 worker；database 为 None 时不加载订阅，需调用 set_subscriptions"""
+        if self.running:
+            return
+        self._database = database
+        self._dead_letter = dead_letter or (mongo_dead_letter_sink(database) if database is not None else None)
+        limits = httpx.Limits(
+            max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+        )
+        # 不读取代理环境变量：经代理转发时无法校验实际连接的地址
+        self._client = client or httpx.AsyncClient(
+            timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+            transport=_PublicAddressTransport(limits),
+            trust_env=False,
+            headers={"User-Agent": f"{settings.PROJECT_NAME} webhooks"},
+        )
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        if database is not None:
+            await self.reload_subscriptions()
+            self._tasks.append(asyncio.create_task(self._refresh_loop()))
+        self._tasks.extend(asyncio.create_task(self._worker()) for _ in range(self.workers))
+
+    async def stop(self, drain_seconds: float = 5.0):
+        """停止投递：先尽量发完队列中的事件，再关闭 worker 和连接池"""
+        if not self.running:
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + drain_seconds
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_seconds)
+            endpoint_queues = [endpoint.queue.join() for endpoint in self._endpoints.values()]
+            await asyncio.wait_for(asyncio.gather(*endpoint_queues), max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            backlog = sum(endpoint.queue.qsize() for endpoint in self._endpoints.values())
+            logger.warning(f"⚠️ Webhook 队列未发完，丢弃 {self._queue.qsize()} 个事件和 {backlog} 批待投递事件")
+        tasks = self._tasks + list(self._endpoint_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._endpoints.clear()
+        await self._client.aclose()
+        self._client = None
+
+    def set_subscriptions(self, subscriptions: List[dict]):
+        """替换内存中的订阅列表（每项包含 _id、url、events、secret）"""
+        self._subscriptions = list(subscriptions)
+        # 已删除的订阅：发完队列中剩余的事件后结束投递任务
+        current = {subscription["_id"] for subscription in self._subscriptions}
+        for subscription_id in [key for key in self._endpoints if key not in current]:
+            endpoint = self._endpoints.pop(subscription_id)
+            try:
+                endpoint.queue.put_nowait(None)
+            except asyncio.QueueFull:
+                endpoint.task.cancel()
+
+    async def reload_subscriptions(self):
+        """从数据库重新加载启用的订阅"""
+        if self._database is None:
+            return
+        subscriptions = await self._database[WEBHOOKS_COLLECTION].find(
+            {"is_active": True}, {"url": 1, "events": 1, "secret": 1}
+        ).to_list(length=None)
+        self.set_subscriptions(subscriptions)
+
+    def enqueue(self, event_type: str, data: dict):
+        """事件入队，不阻塞调用方；可直接注册为事件中心的监听器"""
+        if not self.running or not self._subscriptions:
+            return
+        event = {
+            "id": uuid.uuid4().hex,
+            "type": event_type,
+            "occurred_at": datetime.utcnow().isoformat(),
+            "data": jsonable_encoder(data),
+        }
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"⚠️ Webhook 队列已满，丢弃事件 {event_type}")
+
+    def stats(self) -> dict:
+        return {
+            "subscriptions": len(self._subscriptions),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "endpoint_backlog": sum(endpoint.queue.qsize() for endpoint in self._endpoints.values()),
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "dead_lettered": self.dead_lettered,
+        }
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(settings.WEBHOOK_REFRESH_SECONDS)
+            try:
+                await self.reload_subscriptions()
+            except Exception as e:
+                logger.error(f"刷新 Webhook 订阅失败: {e}")
+
+    async def _next_batch(self) -> List[dict]:
+        """取一批事件：拿到第一个后最多再等待 batch_wait_ms 凑满 batch_size"""
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_wait_ms / 1000
+        while len(batch) < self.batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._deliver_batch(batch)
+            except Exception as e:
+                logger.error(f"Webhook 投递失败: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _deliver_batch(self, events: List[dict]):
+        """按订阅分组，放入各订阅的投递队列（不等待投递完成）"""
+        for subscription in self._subscriptions:
+            wanted = subscription.get("events") or None
+            matched = [event for event in events if wanted is None or event["type"] in wanted]
+            if not matched:
+                continue
+            try:
+                self._endpoint(subscription).queue.put_nowait((subscription, matched))
+            except asyncio.QueueFull:
+                await self._record_dead_letter(subscription, matched, "投递队列已满", 0)
+
+    def _endpoint(self, subscription: dict) -> _Endpoint:
+        endpoint = self._endpoints.get(subscription["_id"])
+        if endpoint is None:
+            endpoint = _Endpoint(self.endpoint_queue_size)
+            endpoint.task = asyncio.create_task(self._endpoint_worker(endpoint))
+            self._endpoint_tasks.add(endpoint.task)
+            endpoint.task.add_done_callback(self._endpoint_tasks.discard)
+            self._endpoints[subscription["_id"]] = endpoint
+        return endpoint
+
+    async def _endpoint_worker(self, endpoint: _Endpoint):
+        while True:
+            item = await endpoint.queue.get()
+            try:
+                if item is None:
+                    return
+                await self._deliver(*item)
+            except Exception as e:
+                logger.error(f"Webhook 投递失败: {e}")
+            finally:
+                endpoint.queue.task_done()
+
+    async def _deliver(self, subscription: dict, events: List[dict]):
+        body = json.dumps({"events": events}, ensure_ascii=False).encode()
+        headers = {"Content-Type": "application/json"}
+        if subscription.get("secret"):
+            headers[SIGNATURE_HEADER] = sign_payload(subscription["secret"], body)
+
+        # 协议和白名单可能在注册后变化，投递前检查（不解析域名，地址在建立连接时校验）
+        try:
+            parse_webhook_url(subscription["url"])
+        except WebhookURLError as e:
+            await self._record_dead_letter(subscription, events, str(e), 0)
+            return
+
+        error = None
+        attempts = 0
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                # 指数退避并加入随机抖动，避免大量投递同时重试
+                delay = self.retry_backoff_ms * (2 ** (attempt - 1)) / 1000
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            attempts += 1
+            try:
+                response = await self._client.post(subscription["url"], content=body, headers=headers)
+            except WebhookAddressBlocked as e:
+                # 域名解析到了不允许的地址，重试没有意义
+                error = str(e)
+                break
+            except httpx.HTTPError as e:
+                error = f"{type(e).__name__}: {e}"
+                continue
+            if response.status_code < 300:
+                self.delivered += len(events)
+                return
+            error = f"HTTP {response.status_code}"
+            # 4xx（429 除外）说明请求本身有问题，重试没有意义
+            if response.status_code < 500 and response.status_code != 429:
+                break
+
+        await self._record_dead_letter(subscription, events, error, attempts)
+
+    async def _record_dead_letter(self, subscription: dict, events: List[dict], error: str, attempts: int):
+        self.dead_lettered += len(events)
+        logger.warning(f"⚠️ Webhook 投递到 {subscription['url']} 失败（{attempts} 次）: {error}")
+        if self._dead_letter is None:
+            return
+        try:
+            await self._dead_letter({
+                "webhook_id": subscription.get("_id"),
+                "url": subscription["url"],
+                "events": events,
+                "error": error,
+                "attempts": attempts,
+                "created_at": datetime.utcnow(),
+            })
+        except Exception as e:
+            logger.error(f"写入 Webhook 死信失败: {e}")
+
+
+webhook_dispatcher = WebhookDispatcher(
+    queue_size=settings.WEBHOOK_QUEUE_SIZE,
+    workers=settings.WEBHOOK_WORKERS,
+    batch_size=settings.WEBHOOK_BATCH_SIZE,
+    batch_wait_ms=settings.WEBHOOK_BATCH_WAIT_MS,
+    max_retries=settings.WEBHOOK_MAX_RETRIES,
+    retry_backoff_ms=settings.WEBHOOK_RETRY_BACKOFF_MS,
+    endpoint_queue_size=settings.WEBHOOK_ENDPOINT_QUEUE_SIZE,
+)
@@ -0,0 +1,30 @@
+"""
+按 ID 批量读取工具
+
+所有 ID 先统一校验，再用一次 $in 查询取回，结果按请求顺序返回，不存在的位置为 None
+"""
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+
+
+def parse_object_ids(ids: List[str]) -> List[ObjectId]:
+    """校验并转换 ID 列表，存在无效 ID 时抛出 ValueError（列出所有无效 ID）"""
+    invalid = [object_id for object_id in ids if not ObjectId.is_valid(object_id)]
+    if invalid:
+        raise ValueError(f"无效的ID: {', '.join(invalid)}")
+    return [ObjectId(object_id) for object_id in ids]
+
+
+async def find_by_ids(
+    collection,
+    object_ids: List[ObjectId],
+    projection: Optional[dict] = None,
+) -> List[Optional[dict]]:
+    """一次 $in 查询取回文档，按 object_ids 的顺序返回，未找到的位置为 None"""
+    unique_ids = list(dict.fromkeys(object_ids))
+    found: Dict[ObjectId, dict] = {}
+    cursor = collection.find({"_id": {"$in": unique_ids}}, projection, batch_size=len(unique_ids))
+    async for document in cursor:
+        found[document["_id"]] = document
+    return [found.get(object_id) for object_id in object_ids]
@@ -0,0 +1,62 @@
+"""
+列表总数统计工具
+
+- 无过滤条件：使用 estimated_document_count（读取集合元数据），并做短期缓存
+- 有过滤条件：使用带 limit 上限的 count_documents，超过上限时只返回“多于 N 条”
+"""
+import time
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+# X-Total-Count-Mode 取值
+COUNT_MODE_ESTIMATED = "estimated"
+COUNT_MODE_EXACT = "exact"
+COUNT_MODE_CAPPED = "capped"
+
+
+class EstimatedCountCache:
+    """estimated_document_count 结果的短期缓存（按集合名）"""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._values: Dict[str, Tuple[float, int]] = {}
+
+    async def get(self, collection) -> int:
+        now = time.monotonic()
+        cached = self._values.get(collection.name)
+        if cached is not None and now - cached[0] < self.ttl_seconds:
+            return cached[1]
+
+        count = await collection.estimated_document_count()
+        self._values[collection.name] = (now, count)
+        return count
+
+    def invalidate(self, collection_name: Optional[str] = None):
+        """清除缓存"""
+        if collection_name is None:
+            self._values.clear()
+        else:
+            self._values.pop(collection_name, None)
+
+
+estimated_count_cache = EstimatedCountCache(settings.COUNT_CACHE_TTL_SECONDS)
+
+
+async def count_total(collection, query: Optional[dict] = None) -> Tuple[int, str]:
+    """统计列表总数，返回 (数量, 统计方式)"""
+    if not query:
+        return await estimated_count_cache.get(collection), COUNT_MODE_ESTIMATED
+
+    # 多统计一条，用于判断是否超过上限
+    cap = settings.COUNT_MAX_EXACT
+    count = await collection.count_documents(query, limit=cap + 1)
+    if count > cap:
+        return cap, COUNT_MODE_CAPPED
+    return count, COUNT_MODE_EXACT
+
+
+def set_total_count_headers(response, count: int, mode: str):
+    """写入 X-Total-Count 相关响应头"""
+    response.headers["X-Total-Count"] = str(count)
+    response.headers["X-Total-Count-Mode"] = mode
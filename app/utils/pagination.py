@@ -0,0 +1,50 @@
+"""
+游标分页工具
+
+游标编码了上一页最后一条记录的排序键 (created_at, _id)，
+下一页从该位置继续向后读取，不需要 skip，深分页的开销与第一页相同。
+游标带有 HMAC 签名，客户端修改过的游标会被拒绝
+"""
+import base64
+import hashlib
+import hmac
+from datetime import datetime
+from typing import Tuple
+
+from bson import ObjectId
+
+from app.core.config import settings
+
+# 签名截取的字节数
+_SIGNATURE_SIZE = 16
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode((value + "=" * (-len(value) % 4)).encode())
+
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(settings.SECRET_KEY.encode(), payload, hashlib.sha256).digest()[:_SIGNATURE_SIZE]
+
+
+def encode_cursor(created_at: datetime, object_id: ObjectId) -> str:
+    """将排序键编码为不透明的游标字符串"""
+    payload = f"{created_at.isoformat()}|{object_id}".encode()
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """解析游标，格式错误或签名不匹配时抛出 ValueError"""
+    try:
+        encoded_payload, encoded_signature = cursor.split(".", 1)
+        payload = _b64decode(encoded_payload)
+        if not hmac.compare_digest(_b64decode(encoded_signature), _sign(payload)):
+            raise ValueError("签名不匹配")
+        created_at, object_id = payload.decode().split("|", 1)
+        return datetime.fromisoformat(created_at), ObjectId(object_id)
+    except Exception as e:
+        raise ValueError("无效的分页游标") from e
@@ -0,0 +1,93 @@
+"""
+请求合并（single-flight）
+
+相同 key 的并发读取只执行一次查询，所有等待者共享同一个结果（或异常）。
+注意：结果对象在等待者之间共享，调用方不应直接修改，需要修改时先复制。
+
+共享查询在空的上下文中执行，不继承发起者的 pymongo.timeout（由客户端的 X-Request-Timeout 决定），
+只受 REQUEST_DEADLINE_MAX_MS 限制；每个等待者按自己的截止时间等待，超时只影响该等待者。
+"""
+import asyncio
+import contextvars
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+import pymongo
+from pymongo import _csot
+from pymongo.errors import ExecutionTimeout
+
+from app.core.config import settings
+from app.core.deadline import remaining_seconds
+
+T = TypeVar("T")
+
+_registry: List["SingleFlight"] = []
+
+
+class SingleFlight:
+    """合并相同 key 的并发异步调用"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.executed = 0
+        self.coalesced = 0
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        _registry.append(self)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """执行 fn；若相同 key 的调用正在进行，则等待其结果"""
+        task = self._calls.get(key)
+        if task is None:
+            # 查询在独立任务中执行，发起者被取消（如客户端断开）不会影响其他等待者；
+            # 使用空的上下文，避免所有等待者受发起者的截止时间限制
+            task = contextvars.Context().run(asyncio.create_task, _run_shared(fn))
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+
+        timeout = _waiter_timeout()
+        if timeout is None:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            raise ExecutionTimeout(f"等待合并的查询超时: {self.name}")
+
+    def forget(self, key: Hashable):
+        """写操作后调用，使后续读取不再复用写入前发起的查询"""
+        self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight(),
+        }
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 所有等待者都已取消时，避免出现 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+
+async def _run_shared(fn: Callable[[], Awaitable[T]]) -> T:
+    with pymongo.timeout(settings.REQUEST_DEADLINE_MAX_MS / 1000):
+        return await fn()
+
+
+def _waiter_timeout() -> Optional[float]:
+    """当前等待者的剩余时间：请求截止时间和 pymongo.timeout 中较早的一个，都未设置时为 None"""
+    candidates = [value for value in (remaining_seconds(), _csot.remaining()) if value is not None]
+    return max(0.0, min(candidates)) if candidates else None
+
+
+def get_singleflight_stats() -> List[dict]:
+    """所有 SingleFlight 实例的统计信息"""
+    return [group.stats() for group in _registry]
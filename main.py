@@ -1,7 +1,9 @@
 """
 FastAPI 学习项目主应用文件
 """
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
@@ -9,10 +11,26 @@ import uvicorn
 from loguru import logger
 
 from app.core.config import settings
-from app.core.database import init_db, close_mongo_connection
+from app.core.logger import setup_logging
+from app.core.deadline import request_deadline
+from app.core.compression import PrecompressedPayload
+from app.core.middleware import CompressionMiddleware, DeadlineMiddleware, RequestContextMiddleware
+from app.core.database import init_db, close_mongo_connection, get_database
+from app.core.health import check_readiness, loop_lag_monitor
+from app.core.watchdog import watchdog
+from app.services.catalog import catalog
+from app.services.events import item_events
+from app.services.jobs import job_runner
+from app.services.price_history import replay_pending_price_changes
+from app.services.snapshot import snapshot_refresher
+from app.services.webhooks import webhook_dispatcher
+from app.utils.singleflight import get_singleflight_stats
 from app.api.v1.api import api_router
 from app.core.auth import get_current_user
 
+# 初始化日志
+setup_logging()
+
 # 安全认证
 security = HTTPBearer()
 
@@ -22,16 +40,46 @@ async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时执行
     logger.info("🚀 启动 FastAPI 应用...")
+    # 生成并预压缩 OpenAPI 文档
+    get_openapi_payload()
     # 初始化数据库
     await init_db()
     logger.info("✅ MongoDB 数据库初始化完成")
+    # 补写上次运行中未写入历史的价格变更
+    replayed = await replay_pending_price_changes(get_database())
+    if replayed:
+        logger.warning(f"🔁 补写 {replayed} 条价格变更历史")
+    # 启动后台任务执行器（恢复未完成的任务）
+    await job_runner.start(get_database())
+    # 启动 Webhook 投递，物品变更事件经事件中心转发给投递队列
+    await webhook_dispatcher.start(get_database())
+    item_events.add_listener(webhook_dispatcher.enqueue)
+    # 后台加载物品目录内存副本
+    if settings.CATALOG_ENABLED:
+        catalog.start(get_database())
+    # 定期增量构建物品快照（SNAPSHOT_REFRESH_SECONDS > 0 时）
+    snapshot_refresher.start(get_database())
+    # 启动事件循环延迟监控
+    loop_lag_monitor.start()
+    # 启动事件循环阻塞监控
+    if settings.WATCHDOG_ENABLED:
+        watchdog.start()
     
     yield
     
     # 关闭时执行
     logger.info("🛑 关闭 FastAPI 应用...")
+    await loop_lag_monitor.stop()
+    await watchdog.stop()
+    await snapshot_refresher.stop()
+    await catalog.stop()
+    await job_runner.stop()
+    item_events.remove_listener(webhook_dispatcher.enqueue)
+    await webhook_dispatcher.stop()
     # 关闭数据库连接
     await close_mongo_connection()
+    # 等待日志队列写完
+    await logger.complete()
 
 
 # 创建 FastAPI 应用实例
@@ -39,9 +87,13 @@ app = FastAPI(
     title=settings.PROJECT_NAME,
     description=settings.DESCRIPTION,
     version=settings.VERSION,
-    docs_url="/docs",
-    redoc_url="/redoc",
-    lifespan=lifespan
+    # 文档路由在下方自定义，OpenAPI 文档只生成和压缩一次
+    openapi_url=None,
+    docs_url=None,
+    redoc_url=None,
+    lifespan=lifespan,
+    # 路由匹配后确定请求截止时间
+    dependencies=[Depends(request_deadline)]
 )
 
 # 配置 CORS
@@ -51,8 +103,56 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Total-Count-Mode", "X-Request-ID", "Server-Timing", "Idempotent-Replayed"],
 )
 
+# 请求截止时间与客户端断开处理（依赖请求上下文，需在其内层）
+app.add_middleware(DeadlineMiddleware)
+
+# 响应压缩（在请求上下文内层，压缩后再添加请求 ID 等响应头）
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# 请求上下文与访问日志（最外层）
+app.add_middleware(RequestContextMiddleware)
+
+
+_openapi_payload = None
+
+
+def get_openapi_payload() -> PrecompressedPayload:
+    """OpenAPI 文档只生成一次，并预先压缩"""
+    global _openapi_payload
+    if _openapi_payload is None:
+        body = JSONResponse(content=app.openapi()).body
+        _openapi_payload = PrecompressedPayload(body, "application/json")
+    return _openapi_payload
+
+
+@app.get("/openapi.json", include_in_schema=False)
+async def openapi_json(request: Request):
+    """OpenAPI 文档（预压缩，支持 ETag 协商缓存）"""
+    payload = get_openapi_payload()
+    headers = {"ETag": payload.etag, "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == payload.etag:
+        return Response(status_code=304, headers=headers)
+    encoding, body = payload.select(request.headers.get("accept-encoding", ""))
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=payload.media_type, headers=headers)
+
+
+@app.get("/docs", include_in_schema=False)
+async def swagger_ui():
+    """Swagger UI 文档"""
+    return get_swagger_ui_html(openapi_url="/openapi.json", title=f"{settings.PROJECT_NAME} - Swagger UI")
+
+
+@app.get("/redoc", include_in_schema=False)
+async def redoc():
+    """ReDoc 文档"""
+    return get_redoc_html(openapi_url="/openapi.json", title=f"{settings.PROJECT_NAME} - ReDoc")
+
 
 @app.get("/")
 async def root():
@@ -71,6 +171,32 @@ async def health_check():
     return {"status": "healthy", "message": "服务运行正常"}
 
 
+@app.get("/health/live")
+async def liveness_check():
+    """存活探针：进程能响应请求即视为存活"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """就绪探针：检查 MongoDB、连接池和事件循环，未就绪时返回 503"""
+    result = await check_readiness()
+    status_code = 200 if result["status"] == "ready" else 503
+    return JSONResponse(status_code=status_code, content=result)
+
+
+@app.get("/health/blocking")
+async def blocking_stats():
+    """事件循环阻塞统计（按路由计数，需开启 WATCHDOG_ENABLED）"""
+    return watchdog.stats()
+
+
+@app.get("/health/singleflight")
+async def singleflight_stats():
+    """请求合并统计（每个 SingleFlight 实例的执行次数、合并次数和进行中的请求数）"""
+    return get_singleflight_stats()
+
+
 @app.get("/protected")
 async def protected_route(
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -94,5 +220,7 @@ if __name__ == "__main__":
         host=settings.HOST,
         port=settings.PORT,
         reload=True,
-        log_level="info"
+        log_level="info",
+        # 访问日志由 RequestContextMiddleware 采样输出
+        access_log=False
     ) 
\ No newline at end of file
@@ -5,8 +5,10 @@ FastAPI 学习项目运行脚本
 import uvicorn
 from loguru import logger
 from app.core.config import settings
+from app.core.logger import setup_logging
 
 if __name__ == "__main__":
+    setup_logging()
     logger.info("🚀 启动 FastAPI 学习项目...")
     logger.info(f"配置信息 - HOST: {settings.HOST}, PORT: {settings.PORT}")
     
@@ -16,5 +18,6 @@ if __name__ == "__main__":
         port=settings.PORT,
         reload=True,
         log_level="info",
-        access_log=True
+        # 访问日志由 RequestContextMiddleware 采样输出
+        access_log=False
     ) 
\ No newline at end of file
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+测试数据生成脚本 - 直接写入 MongoDB，用于复现大数据量下的性能问题
+
+- 根据随机种子生成确定性的用户和物品数据（相同参数生成相同的文档和 ObjectId，不同种子的 ObjectId 不同）
+- 所有用户共用一个预先计算的密码哈希，不为每行计算 bcrypt
+- 多个无序 insert_many 批次并发写入
+- 可选在导入完成后再创建索引（比导入过程中维护索引更快，配合 --drop 使用）
+- 不使用 --drop 重复运行时，已存在的文档（主键重复）会被跳过并统计
+
+用法：
+    python seed.py --users 100000 --items 1000000 --seed 42 --drop --build-indexes
+"""
+import argparse
+import asyncio
+import random
+import struct
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from loguru import logger
+from pymongo.errors import BulkWriteError
+
+from app.core import database as db
+from app.core.auth import get_password_hash
+from app.core.logger import setup_logging
+from app.models.item import ItemDocument
+from app.models.user import UserDocument
+
+# 生成数据的起始时间（固定值，保证结果可复现）
+BASE_TIME = datetime(2024, 1, 1)
+
+# ObjectId 中区分数据类型的标记
+USER_TAG = 1
+ITEM_TAG = 2
+
+DUPLICATE_KEY_ERROR = 11000
+
+ADJECTIVES = ["红色", "蓝色", "复古", "便携", "智能", "经典", "轻量", "豪华", "迷你", "专业"]
+NOUNS = ["水杯", "耳机", "背包", "台灯", "键盘", "雨伞", "手表", "相机", "书架", "风扇"]
+
+
+def make_object_id(tag: int, seed: int, index: int) -> ObjectId:
+    """生成确定性的 ObjectId：4 字节时间戳 + 1 字节类型标记 + 2 字节种子摘要 + 5 字节序号"""
+    timestamp = int((BASE_TIME + timedelta(seconds=index)).replace(tzinfo=timezone.utc).timestamp())
+    seed_digest = zlib.crc32(str(seed).encode()) & 0xFFFF
+    return ObjectId(struct.pack(">IBH", timestamp, tag, seed_digest) + index.to_bytes(5, "big"))
+
+
+def document_template(model) -> dict:
+    """按文档模型的字段（别名）和默认值生成模板，逐行复制后填充，避免逐行校验的开销"""
+    return {
+        field.alias or name: (None if field.is_required() else field.get_default(call_default_factory=False))
+        for name, field in model.model_fields.items()
+    }
+
+
+def generate_users(start: int, count: int, hashed_password: str, seed: int) -> list:
+    template = document_template(UserDocument)
+    documents = []
+    for index in range(start, start + count):
+        document = dict(template)
+        document.update(
+            _id=make_object_id(USER_TAG, seed, index),
+            username=f"user{index:08d}",
+            email=f"user{index:08d}@example.com",
+            hashed_password=hashed_password,
+            created_at=BASE_TIME + timedelta(seconds=index),
+        )
+        documents.append(document)
+    return documents
+
+
+def generate_items(start: int, count: int, user_count: int, seed: int) -> list:
+    # 每批使用独立的随机数生成器，保证并发生成时结果仍然确定
+    rng = random.Random(seed * 1_000_003 + start)
+    template = document_template(ItemDocument)
+    documents = []
+    for index in range(start, start + count):
+        title = f"{rng.choice(ADJECTIVES)}{rng.choice(NOUNS)} {index}"
+        document = dict(template)
+        document.update(
+            _id=make_object_id(ITEM_TAG, seed, index),
+            title=title,
+            description=f"{title} 的描述" if rng.random() < 0.8 else None,
+            price=round(rng.uniform(1, 1000), 2),
+            owner_id=make_object_id(USER_TAG, seed, rng.randrange(user_count)),
+            created_at=BASE_TIME + timedelta(seconds=index),
+        )
+        documents.append(document)
+    return documents
+
+
+async def load(collection, total: int, batch_size: int, concurrency: int, generate) -> float:
+    """并发写入，返回每秒写入的行数；已存在的文档跳过"""
+    semaphore = asyncio.Semaphore(concurrency)
+    inserted = 0
+    duplicates = 0
+
+    async def insert(documents):
+        nonlocal inserted, duplicates
+        try:
+            result = await collection.insert_many(documents, ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            # 无序写入时其余文档仍会写入，只有主键重复的错误可以忽略
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            inserted += e.details.get("nInserted", 0)
+            duplicates += len(errors)
+        finally:
+            semaphore.release()
+
+    started = time.perf_counter()
+    tasks = []
+    for start in range(0, total, batch_size):
+        await semaphore.acquire()
+        documents = generate(start, min(batch_size, total - start))
+        tasks.append(asyncio.create_task(insert(documents)))
+    await asyncio.gather(*tasks)
+
+    elapsed = time.perf_counter() - started
+    rate = inserted / elapsed if elapsed else 0.0
+    logger.info(f"📥 {collection.name}: 写入 {inserted} 行，耗时 {elapsed:.1f}s，{rate:,.0f} 行/秒")
+    if duplicates:
+        logger.warning(f"⚠️ {collection.name}: 跳过 {duplicates} 个已存在的文档（需要重新生成请使用 --drop）")
+    return rate
+
+
+async def main(args):
+    if args.items and not args.users:
+        raise SystemExit("生成物品需要同时生成用户（--users > 0）")
+
+    await db.connect_to_mongo(with_indexes=False)
+    database = db.get_database()
+    try:
+        if args.drop:
+            await database.users.drop()
+            await database.items.drop()
+            logger.info("🗑️ 已清空 users 和 items 集合")
+
+        hashed_password = get_password_hash(args.password)
+        if args.users:
+            await load(
+                database.users, args.users, args.batch_size, args.concurrency,
+                lambda start, count: generate_users(start, count, hashed_password, args.seed)
+            )
+        if args.items:
+            await load(
+                database.items, args.items, args.batch_size, args.concurrency,
+                lambda start, count: generate_items(start, count, args.users, args.seed)
+            )
+
+        if args.build_indexes:
+            started = time.perf_counter()
+            await db.create_indexes()
+            logger.info(f"🔧 索引创建完成，耗时 {time.perf_counter() - started:.1f}s")
+    finally:
+        await db.close_mongo_connection()
+        await logger.complete()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="生成测试数据")
+    parser.add_argument("--users", type=int, default=1000, help="用户数量")
+    parser.add_argument("--items", type=int, default=10000, help="物品数量")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--password", default="password123", help="所有用户的密码")
+    parser.add_argument("--batch-size", type=int, default=5000, help="每批写入的行数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发写入的批次数")
+    parser.add_argument("--drop", action="store_true", help="写入前清空 users 和 items 集合")
+    parser.add_argument("--build-indexes", action="store_true", help="写入完成后创建索引")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    setup_logging()
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,7 @@
+"""
+测试公共配置
+"""
+from app.core.config import settings
+
+# 测试中数据库往返次数超出预算直接失败
+settings.DB_ROUNDTRIP_BUDGET_STRICT = True
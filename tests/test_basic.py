@@ -23,6 +23,30 @@ def test_health_check():
     assert response.json()["status"] == "healthy"
 
 
+def test_liveness_check():
+    """测试存活探针"""
+    response = client.get("/health/live")
+    assert response.status_code == 200
+    assert response.json()["status"] == "alive"
+
+
+def test_readiness_without_database():
+    """测试数据库未连接时就绪探针返回 503"""
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    checks = response.json()["checks"]
+    assert checks["mongodb"]["ok"] is False
+    assert "connection_pool" in checks
+    assert "event_loop" in checks
+
+
+def test_request_id_and_server_timing_headers():
+    """测试请求 ID 和 Server-Timing 响应头"""
+    response = client.get("/", headers={"X-Request-ID": "test-request-id"})
+    assert response.headers["x-request-id"] == "test-request-id"
+    assert response.headers["server-timing"].startswith("db;dur=0.00")
+
+
 def test_docs_available():
     """测试文档是否可用"""
     response = client.get("/docs")
@@ -32,4 +56,28 @@ def test_docs_available():
 def test_redoc_available():
     """测试 ReDoc 是否可用"""
     response = client.get("/redoc")
-    assert response.status_code == 200 
\ No newline at end of file
+    assert response.status_code == 200 
+
+
+def test_price_range_rejects_inverted_bounds():
+    """最低价格高于最高价格时返回 422"""
+    from app.api.v1.endpoints.items import get_database_dependency
+    from app.core.auth import get_current_active_user
+
+    app.dependency_overrides[get_current_active_user] = lambda: None
+    app.dependency_overrides[get_database_dependency] = lambda: None
+    try:
+        response = client.get("/api/v1/items/price-range", params={"min_price": 10, "max_price": 5})
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 422
+    assert response.json()["detail"] == "最低价格不能高于最高价格"
+
+
+def test_singleflight_stats():
+    """请求合并统计包含各模块注册的 SingleFlight 实例"""
+    response = client.get("/health/singleflight")
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats
+    assert all({"name", "executed", "coalesced", "in_flight"} <= set(group) for group in stats)
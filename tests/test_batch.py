@@ -0,0 +1,56 @@
+"""
+按 ID 批量读取工具测试
+"""
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from app.utils.batch import find_by_ids, parse_object_ids
+
+
+class _Cursor:
+    def __init__(self, documents):
+        self._documents = iter(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _Collection:
+    """记录查询次数的内存集合"""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.queries = []
+
+    def find(self, query, projection=None, batch_size=0):
+        self.queries.append(query)
+        wanted = set(query["_id"]["$in"])
+        return _Cursor([doc for doc in reversed(self.documents) if doc["_id"] in wanted])
+
+
+def test_parse_object_ids_reports_all_invalid_ids():
+    """所有无效 ID 在查询前一次性报告"""
+    with pytest.raises(ValueError) as exc_info:
+        parse_object_ids([str(ObjectId()), "bad-1", "bad-2"])
+    assert "bad-1" in str(exc_info.value)
+    assert "bad-2" in str(exc_info.value)
+
+
+def test_find_by_ids_keeps_request_order_with_one_query():
+    """一次 $in 查询，按请求顺序返回，缺失位置为 None"""
+    first, second, missing = ObjectId(), ObjectId(), ObjectId()
+    collection = _Collection([{"_id": first, "n": 1}, {"_id": second, "n": 2}])
+
+    results = asyncio.run(find_by_ids(collection, [second, missing, first, second]))
+
+    assert [doc and doc["n"] for doc in results] == [2, None, 1, 2]
+    assert len(collection.queries) == 1
+    assert collection.queries[0]["_id"]["$in"] == [second, missing, first]
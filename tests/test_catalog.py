@@ -0,0 +1,122 @@
+"""
+物品目录内存副本测试
+"""
+import asyncio
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.services.catalog import CatalogIndex
+
+
+class _Cursor:
+    def __init__(self, documents):
+        self._documents = iter(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _Database:
+    def __init__(self, documents):
+        self.items = self
+        self.documents = documents
+
+    def find(self, query, projection=None, batch_size=0):
+        return _Cursor(list(self.documents))
+
+
+def _item(price, owner_id=None, title="物品"):
+    return {
+        "_id": ObjectId(), "title": title, "description": None, "price": price,
+        "owner_id": owner_id or ObjectId(), "created_at": datetime(2024, 1, 1),
+    }
+
+
+def _load(documents, budget=64 * 1024 * 1024) -> CatalogIndex:
+    catalog = CatalogIndex(budget)
+    asyncio.run(catalog.load(_Database(documents)))
+    return catalog
+
+
+def test_price_range_and_cheapest():
+    """范围查询按价格升序，边界包含在内"""
+    documents = [_item(float(price)) for price in (50, 10, 30, 20, 40)]
+    catalog = _load(documents)
+
+    total, items = catalog.price_range(20, 40, skip=1, limit=10)
+    assert total == 3
+    assert [item.price for item in items] == [30.0, 40.0]
+    assert [item.price for item in catalog.cheapest(2)] == [10.0, 20.0]
+    assert catalog.cheapest(1)[0].id == str(documents[1]["_id"])
+
+
+def test_writes_keep_sorted_index_current():
+    """新增、改价、删除和转移所有者都会更新副本，删除的槽位被复用"""
+    cheap, expensive = _item(10.0), _item(90.0)
+    catalog = _load([cheap, expensive])
+
+    catalog.upsert({**expensive, "price": 5.0})
+    catalog.remove(cheap["_id"])
+    new_owner = ObjectId()
+    added = _item(7.0)
+    catalog.upsert(added)
+    catalog.set_owner([added["_id"]], new_owner)
+
+    total, items = catalog.price_range()
+    assert total == 2
+    assert [(item.id, item.price) for item in items] == [(str(expensive["_id"]), 5.0), (str(added["_id"]), 7.0)]
+    assert items[1].owner_id == str(new_owner)
+    assert catalog.stats()["items"] == 2
+
+
+def test_memory_budget_disables_catalog():
+    """超出内存预算时副本停用"""
+    catalog = _load([_item(1.0, title="很长的标题" * 50) for _ in range(10)], budget=1024)
+
+    assert not catalog.ready
+    assert "内存预算" in catalog.stats()["disabled_reason"]
+
+
+def test_inconsistent_sorted_index_triggers_reload():
+    """排序数组缺少记录时不抛出异常，副本停用并在后台重新加载"""
+    documents = [_item(10.0), _item(20.0)]
+    database = _Database(documents)
+    catalog = CatalogIndex(64 * 1024 * 1024)
+
+    async def main():
+        await catalog.load(database)
+        # 模拟排序数组与槽位不一致
+        del catalog._data.sorted_prices[0]
+        del catalog._data.sorted_slots[0]
+        database.documents = documents[1:]
+        catalog.remove(documents[0]["_id"])
+        assert not catalog.ready
+        assert "找不到槽位" in catalog.stats()["disabled_reason"]
+        await catalog._reload_task
+
+    asyncio.run(main())
+    assert catalog.ready
+    assert [item.price for item in catalog.cheapest(5)] == [20.0]
+
+
+def test_sample_keys_is_random_and_skips_free_slots():
+    """一致性检查的抽样覆盖不同物品，不包含已删除的物品"""
+    documents = [_item(float(price)) for price in range(1, 51)]
+    catalog = _load(documents)
+    removed = {document["_id"].binary for document in documents[:10]}
+    catalog.remove_many(document["_id"] for document in documents[:10])
+
+    seen = set()
+    for _ in range(20):
+        keys = catalog._data.sample_keys(10)
+        assert len(keys) == len(set(keys)) <= 10
+        assert not removed & set(keys)
+        seen.update(keys)
+    assert len(seen) > 10
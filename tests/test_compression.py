@@ -0,0 +1,97 @@
+"""
+响应压缩测试
+"""
+import asyncio
+import zlib
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import choose_encoding
+from app.core.middleware import CompressionMiddleware
+from main import app as main_app
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware)
+
+
+@app.get("/large")
+async def large():
+    return {"items": [{"title": "物品", "description": "描述" * 20} for _ in range(50)]}
+
+
+@app.get("/small")
+async def small():
+    return {"ok": True}
+
+
+@app.get("/binary")
+async def binary():
+    return PlainTextResponse("x" * 5000, media_type="application/octet-stream")
+
+
+client = TestClient(app)
+
+
+def test_choose_encoding():
+    """按 q 值选择编码，q=0 表示不接受"""
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("*") in ("gzip", "br")
+
+
+def test_large_json_is_compressed():
+    """超过最小大小的 JSON 响应被压缩"""
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert len(response.json()["items"]) == 50
+
+
+def test_small_or_disallowed_responses_are_not_compressed():
+    """小响应和不在允许列表中的内容类型不压缩"""
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/binary", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_streaming_response_is_compressed_incrementally():
+    """流式响应的每个分块压缩后立即输出"""
+    chunks = [b"data: %d\n\n" % index for index in range(3)]
+
+    async def streaming_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream")]})
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(streaming_app)(scope, None, send))
+
+    assert (b"content-encoding", b"gzip") in messages[0]["headers"]
+    decompressor = zlib.decompressobj(31)
+    # 每个分块单独解压即可得到对应的原始内容
+    for message, chunk in zip(messages[1:4], chunks):
+        assert decompressor.decompress(message["body"]) == chunk
+    assert messages[-1]["more_body"] is False
+
+
+def test_openapi_is_precompressed_with_etag():
+    """OpenAPI 文档返回预压缩内容，并支持 If-None-Match"""
+    main_client = TestClient(main_app)
+    response = main_client.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "paths" in response.json()
+
+    cached = main_client.get("/openapi.json", headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
@@ -0,0 +1,116 @@
+"""
+列表总数统计测试（使用内存中的集合代替 MongoDB）
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints.users import get_database_dependency
+from app.core.auth import get_current_active_user
+from app.core.config import settings
+from app.models.user import UserDocument
+from app.utils.counting import (
+    COUNT_MODE_CAPPED, COUNT_MODE_ESTIMATED, COUNT_MODE_EXACT, count_total, estimated_count_cache,
+)
+from main import app
+
+
+class _Cursor:
+    def __init__(self, documents):
+        self._documents = iter(documents)
+
+    def skip(self, skip):
+        return self
+
+    def limit(self, limit):
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _Collection:
+    """记录统计调用的内存集合，count_documents 按 limit 截断"""
+
+    def __init__(self, name, total, documents=()):
+        self.name = name
+        self.total = total
+        self.documents = list(documents)
+        self.calls = []
+
+    async def estimated_document_count(self):
+        self.calls.append("estimated")
+        return self.total
+
+    async def count_documents(self, query, limit=0):
+        self.calls.append(("count", limit))
+        return min(self.total, limit) if limit else self.total
+
+    def find(self, *args, **kwargs):
+        return _Cursor(self.documents)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    estimated_count_cache.invalidate()
+    yield
+    estimated_count_cache.invalidate()
+
+
+def test_without_filter_uses_cached_estimate():
+    """无过滤条件时使用 estimated_document_count，缓存期内不重复读取"""
+    collection = _Collection("counting_users", 42)
+    assert asyncio.run(count_total(collection)) == (42, COUNT_MODE_ESTIMATED)
+    collection.total = 43
+    assert asyncio.run(count_total(collection, {})) == (42, COUNT_MODE_ESTIMATED)
+    assert collection.calls == ["estimated"]
+
+    estimated_count_cache.invalidate("counting_users")
+    assert asyncio.run(count_total(collection)) == (43, COUNT_MODE_ESTIMATED)
+
+
+def test_filtered_count_is_exact_below_cap(monkeypatch):
+    monkeypatch.setattr(settings, "COUNT_MAX_EXACT", 100)
+    collection = _Collection("counting_items", 100)
+    assert asyncio.run(count_total(collection, {"price": {"$gte": 1}})) == (100, COUNT_MODE_EXACT)
+    assert collection.calls == [("count", 101)]
+
+
+def test_filtered_count_is_capped(monkeypatch):
+    """超过上限时只统计到上限加一条，返回上限和 capped"""
+    monkeypatch.setattr(settings, "COUNT_MAX_EXACT", 100)
+    collection = _Collection("counting_items", 5000)
+    assert asyncio.run(count_total(collection, {"price": {"$gte": 1}})) == (100, COUNT_MODE_CAPPED)
+    assert collection.calls == [("count", 101)]
+
+
+@pytest.fixture
+def users_client():
+    owner = UserDocument(username="owner", email="owner@example.com", hashed_password="x")
+    users = _Collection("users", 7, [owner.model_dump(by_alias=True)])
+    database = SimpleNamespace(users=users)
+    app.dependency_overrides[get_current_active_user] = lambda: owner
+    app.dependency_overrides[get_database_dependency] = lambda: database
+    yield TestClient(app), users
+    app.dependency_overrides.clear()
+
+
+def test_total_headers_only_when_requested(users_client):
+    """不传 with_total 时不统计总数，也不返回 X-Total-Count"""
+    client, users = users_client
+    response = client.get("/api/v1/users/")
+    assert response.status_code == 200
+    assert "x-total-count" not in response.headers
+    assert users.calls == []
+
+    response = client.get("/api/v1/users/", params={"with_total": True})
+    assert response.headers["x-total-count"] == "7"
+    assert response.headers["x-total-count-mode"] == COUNT_MODE_ESTIMATED
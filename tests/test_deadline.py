@@ -0,0 +1,56 @@
+"""
+请求截止时间测试
+"""
+import asyncio
+import time
+
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.core.deadline import remaining_seconds, request_deadline
+from app.core.middleware import DeadlineMiddleware, RequestContextMiddleware
+
+app = FastAPI(dependencies=[Depends(request_deadline)])
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(RequestContextMiddleware)
+
+
+@app.get("/slow")
+async def slow():
+    await asyncio.sleep(1)
+    return {"ok": True}
+
+
+@app.get("/slow-error")
+async def slow_error():
+    # 模拟 MongoDB 因 maxTimeMS 中止查询后，端点将异常转换为 500
+    time.sleep(remaining_seconds() + 0.01)
+    raise HTTPException(status_code=500, detail="查询失败")
+
+
+@app.get("/remaining")
+async def remaining():
+    return {"remaining": remaining_seconds()}
+
+
+client = TestClient(app)
+
+
+def test_request_exceeding_deadline_returns_504():
+    """超过请求头指定的截止时间返回 504"""
+    response = client.get("/slow", headers={"X-Request-Timeout": "50"})
+    assert response.status_code == 504
+
+
+def test_expired_deadline_error_is_reported_as_504():
+    """截止时间已过时，端点返回的 500 改写为 504"""
+    response = client.get("/slow-error", headers={"X-Request-Timeout": "50"})
+    assert response.status_code == 504
+    assert response.json()["detail"] == "请求超时"
+
+
+def test_remaining_budget_is_visible_to_handlers():
+    """端点可以读取剩余的时间预算"""
+    response = client.get("/remaining", headers={"X-Request-Timeout": "2000"})
+    assert response.status_code == 200
+    assert 0 < response.json()["remaining"] <= 2
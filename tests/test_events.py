@@ -0,0 +1,76 @@
+"""
+物品变更事件中心测试
+"""
+import asyncio
+
+from app.services.events import HEARTBEAT, EventHub
+
+
+def test_publish_serializes_once_and_fans_out():
+    """事件只序列化一次，所有订阅者收到同一个 bytes 对象"""
+    async def main():
+        hub = EventHub(queue_size=10, max_subscribers=10)
+        subscribers = [hub.subscribe() for _ in range(3)]
+        payload = hub.publish("item.created", {"id": "1", "title": "测试"})
+        return payload, [subscriber.queue.get_nowait() for subscriber in subscribers]
+
+    payload, received = asyncio.run(main())
+    assert payload.startswith(b"id: 1\nevent: item.created\ndata: ")
+    assert all(item is payload for item in received)
+
+
+def test_slow_subscriber_is_evicted():
+    """队列满的订阅者被踢出，其他订阅者不受影响"""
+    async def main():
+        hub = EventHub(queue_size=2, max_subscribers=10)
+        slow = hub.subscribe()
+        fast = hub.subscribe()
+        for index in range(3):
+            hub.publish("item.updated", {"id": str(index)})
+            fast.queue.get_nowait()
+        chunks = [chunk async for chunk in hub.stream(slow, heartbeat_seconds=1)]
+        return hub, slow, chunks
+
+    hub, slow, chunks = asyncio.run(main())
+    assert slow.evicted
+    assert hub.evicted == 1
+    assert hub.subscriber_count == 1
+    assert chunks[-1].startswith(b"event: evicted")
+
+
+def test_stream_sends_heartbeat_and_unsubscribes():
+    """空闲时发送心跳，流结束后取消订阅"""
+    async def main():
+        hub = EventHub(queue_size=10, max_subscribers=1)
+        subscriber = hub.subscribe()
+        assert hub.subscribe() is None
+        stream = hub.stream(subscriber, heartbeat_seconds=0.01)
+        chunks = [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()
+        return hub, chunks
+
+    hub, chunks = asyncio.run(main())
+    assert chunks[0].startswith(b"retry: ")
+    assert chunks[1] == HEARTBEAT
+    assert hub.subscriber_count == 0
+
+
+def test_open_stream_subscribes_only_while_iterated():
+    """消息流开始迭代时才订阅，未迭代就丢弃的流不占用名额"""
+    async def main():
+        hub = EventHub(queue_size=10, max_subscribers=1)
+        unused = hub.open_stream(heartbeat_seconds=1)
+        counts = [hub.subscriber_count]
+        del unused
+
+        stream = hub.open_stream(heartbeat_seconds=1)
+        await stream.__anext__()
+        counts.append(hub.subscriber_count)
+        full = [chunk async for chunk in hub.open_stream(heartbeat_seconds=1)]
+        await stream.aclose()
+        counts.append(hub.subscriber_count)
+        return counts, full
+
+    counts, full = asyncio.run(main())
+    assert counts == [0, 1, 0]
+    assert full[-1].startswith(b"event: error")
@@ -0,0 +1,158 @@
+"""
+幂等键测试（使用内存中的集合代替 MongoDB）
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.services.idempotency import IDEMPOTENCY_COLLECTION, STATUS_PROCESSING, run_idempotent
+
+
+def _matches(document: dict, query: dict) -> bool:
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(document, branch) for branch in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = document.get(field)
+            if "$exists" in condition and (field in document) != condition["$exists"]:
+                return False
+            if "$lte" in condition and (value is None or value > condition["$lte"]):
+                return False
+        elif document.get(field) != condition:
+            return False
+    return True
+
+
+class _Collection:
+    def __init__(self):
+        self.documents = {}
+
+    async def insert_one(self, document):
+        if document["_id"] in self.documents:
+            raise DuplicateKeyError("duplicate key")
+        self.documents[document["_id"]] = dict(document)
+
+    async def find_one(self, query):
+        document = self.documents.get(query["_id"])
+        return dict(document) if document is not None and _matches(document, query) else None
+
+    async def find_one_and_update(self, query, update, return_document=None):
+        document = self.documents.get(query["_id"])
+        if document is None or not _matches(document, query):
+            return None
+        document.update(update["$set"])
+        return dict(document)
+
+    async def update_one(self, query, update):
+        document = self.documents.get(query["_id"])
+        if document is not None and _matches(document, query):
+            document.update(update["$set"])
+
+    async def delete_one(self, query):
+        document = self.documents.get(query["_id"])
+        if document is not None and _matches(document, query):
+            del self.documents[query["_id"]]
+
+
+@pytest.fixture
+def database(monkeypatch):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 0.2)
+    return {IDEMPOTENCY_COLLECTION: _Collection()}
+
+
+def _stale_record(fingerprint: str, **fields) -> dict:
+    started_at = datetime.utcnow() - timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS + 1)
+    record = {
+        "_id": "items:key",
+        "fingerprint": fingerprint,
+        "status": STATUS_PROCESSING,
+        "lease_id": "crashed",
+        "started_at": started_at,
+        "locked_until": started_at + timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS),
+        "created_at": started_at,
+    }
+    record.update(fields)
+    return record
+
+
+def test_expired_lease_is_taken_over(database):
+    """首次请求的进程崩溃后，租约过期的键由重复请求接管执行"""
+    collection = database[IDEMPOTENCY_COLLECTION]
+    collection.documents["items:key"] = _stale_record("fp")
+
+    async def handler():
+        return {"id": "1"}
+
+    result = asyncio.run(run_idempotent(database, "key", "items", "fp", handler))
+
+    assert result == {"id": "1"}
+    record = collection.documents["items:key"]
+    assert record["status"] == "completed"
+    assert record["body"] == {"id": "1"}
+    assert record["lease_id"] != "crashed"
+
+
+def test_legacy_record_without_lease_is_taken_over(database):
+    """没有 locked_until 的旧记录按创建时间判断租约"""
+    collection = database[IDEMPOTENCY_COLLECTION]
+    record = _stale_record("fp")
+    del record["locked_until"]
+    collection.documents["items:key"] = record
+
+    async def handler():
+        return {"id": "2"}
+
+    assert asyncio.run(run_idempotent(database, "key", "items", "fp", handler)) == {"id": "2"}
+
+
+def test_active_lease_is_not_taken_over(database):
+    """租约未过期时重复请求等待，超时返回 409，不会重复执行"""
+    collection = database[IDEMPOTENCY_COLLECTION]
+    collection.documents["items:key"] = _stale_record("fp", locked_until=datetime.utcnow() + timedelta(minutes=1))
+    calls = 0
+
+    async def handler():
+        nonlocal calls
+        calls += 1
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(run_idempotent(database, "key", "items", "fp", handler))
+
+    assert excinfo.value.status_code == 409
+    assert calls == 0
+
+
+def test_failed_handler_releases_key(database):
+    """handler 抛出异常时删除记录，客户端可以用同一个键重试"""
+    collection = database[IDEMPOTENCY_COLLECTION]
+
+    async def handler():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_idempotent(database, "key", "items", "fp", handler))
+
+    assert collection.documents == {}
+
+
+def test_different_request_is_rejected_without_waiting(database, monkeypatch):
+    """同一个键用于不同的请求内容时立即返回 422，不等待首次请求完成"""
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 5)
+    collection = database[IDEMPOTENCY_COLLECTION]
+    collection.documents["items:key"] = _stale_record("fp", locked_until=datetime.utcnow() + timedelta(minutes=1))
+
+    async def handler():
+        raise AssertionError("不应执行")
+
+    async def run():
+        return await asyncio.wait_for(run_idempotent(database, "key", "items", "other", handler), timeout=1)
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(run())
+
+    assert excinfo.value.status_code == 422
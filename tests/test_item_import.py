@@ -0,0 +1,96 @@
+"""
+物品批量导入测试（使用内存中的集合代替 MongoDB）
+"""
+import asyncio
+import io
+import json
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+from app.core.config import settings
+from app.services.item_import import FORMAT_CSV, FORMAT_NDJSON, ItemImporter
+
+
+class _Items:
+    def __init__(self):
+        self.batches = []
+
+    async def insert_many(self, documents, ordered=True):
+        assert ordered is False
+        self.batches.append(list(documents))
+        return SimpleNamespace(inserted_ids=[document["_id"] for document in documents])
+
+
+def _import(content: bytes, file_format: str) -> tuple:
+    database = SimpleNamespace(items=_Items())
+    importer = ItemImporter(database, ObjectId(), file_format)
+    asyncio.run(importer.run(io.BytesIO(content)))
+    return importer.report(), database.items.batches
+
+
+def _ndjson(rows) -> bytes:
+    return "\n".join(json.dumps(row, ensure_ascii=False) for row in rows).encode()
+
+
+def test_valid_csv_import():
+    content = "title,price,description\n键盘,199.0,机械键盘\n鼠标,59.5,\n".encode("utf-8-sig")
+    report, batches = _import(content, FORMAT_CSV)
+
+    assert report == {"total_rows": 2, "inserted": 2, "failed": 0, "errors": [], "errors_truncated": False}
+    documents = batches[0]
+    assert [document["title"] for document in documents] == ["键盘", "鼠标"]
+    assert documents[0]["price"] == 199.0
+    assert documents[1]["description"] is None
+
+
+def test_row_validation_errors_are_reported():
+    """校验失败的行记录行号和原因，其余行正常写入"""
+    content = _ndjson([{"title": "ok", "price": 1}, {"title": "bad", "price": -1}]) + b"\n{not json\n[1]\n"
+    report, batches = _import(content, FORMAT_NDJSON)
+
+    assert report["total_rows"] == 4
+    assert report["inserted"] == 1
+    assert report["failed"] == 3
+    assert [error["row"] for error in report["errors"]] == [2, 3, 4]
+    assert "price" in report["errors"][0]["error"]
+    assert "JSON" in report["errors"][1]["error"]
+    assert sum(len(batch) for batch in batches) == 1
+
+
+def test_import_spans_multiple_batches(monkeypatch):
+    """超过批大小的文件分多批写入，错误行号与文件中的行号一致"""
+    monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", 3)
+    rows = [{"title": f"item-{index}", "price": index + 1} for index in range(10)]
+    rows[4]["price"] = 0
+    report, batches = _import(_ndjson(rows), FORMAT_NDJSON)
+
+    assert [len(batch) for batch in batches] == [3, 3, 3]
+    assert report["total_rows"] == 10
+    assert report["inserted"] == 9
+    assert [error["row"] for error in report["errors"]] == [5]
+
+
+def test_error_list_is_capped(monkeypatch):
+    """错误数超过上限时只保留前 IMPORT_MAX_ERRORS 条，失败计数仍然准确"""
+    monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", 4)
+    monkeypatch.setattr(settings, "IMPORT_MAX_ERRORS", 5)
+    rows = [{"title": "", "price": 1} for _ in range(20)]
+    report, batches = _import(_ndjson(rows), FORMAT_NDJSON)
+
+    assert report["failed"] == 20
+    assert [error["row"] for error in report["errors"]] == [1, 2, 3, 4, 5]
+    assert report["errors_truncated"] is True
+    assert batches == []
+
+
+@pytest.mark.parametrize("batch_size", [7, 1000])
+def test_invalid_encoding_is_reported(monkeypatch, batch_size):
+    """编码错误记录在出错位置的行号上，之前已读出的行正常写入"""
+    monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", batch_size)
+    rows = [{"title": f"item-{index}", "price": 1} for index in range(2000)]
+    report, _ = _import(_ndjson(rows) + b"\n\xff\xfe\n", FORMAT_NDJSON)
+
+    assert 0 < report["inserted"] == report["total_rows"] < 2000
+    assert report["errors"] == [{"row": report["total_rows"] + 1, "error": "文件编码必须为 UTF-8"}]
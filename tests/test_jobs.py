@@ -0,0 +1,72 @@
+"""
+后台任务执行器测试
+"""
+import asyncio
+
+import pymongo
+from pymongo import _csot
+
+from app.core.context import RequestContext, get_request_context, reset_request_context, set_request_context
+from app.services.jobs import JobRunner
+
+
+def test_job_does_not_inherit_request_deadline():
+    """请求中创建的任务不继承请求的 MongoDB 超时和请求上下文"""
+    runner = JobRunner()
+    seen = {}
+
+    async def run(job):
+        await asyncio.sleep(0.02)
+        seen["timeout"] = _csot.get_timeout()
+        seen["context"] = get_request_context()
+
+    runner._run = run
+
+    async def main():
+        token = set_request_context(RequestContext({"type": "http"}))
+        try:
+            with pymongo.timeout(0.01):
+                runner._schedule({"_id": 1})
+        finally:
+            reset_request_context(token)
+        await asyncio.gather(*runner._tasks.values())
+
+    asyncio.run(main())
+    assert seen == {"timeout": None, "context": None}
+
+
+class _Collection:
+    def __init__(self, documents=None):
+        self.documents = documents or []
+        self.updates = []
+
+    async def find_one(self, query, projection=None):
+        return next((doc for doc in self.documents if doc["_id"] == query["_id"]), None)
+
+    async def update_one(self, query, update):
+        self.updates.append(update["$set"])
+
+    def find(self, *args, **kwargs):
+        raise AssertionError("用户未删除时不应查询物品")
+
+
+class _Database:
+    def __init__(self, users):
+        self.users = _Collection(users)
+        self.items = _Collection()
+        self.jobs = _Collection()
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+def test_cascade_is_skipped_when_user_still_exists():
+    """删除用户失败后残留的任务记录不会处理该用户的物品"""
+    database = _Database(users=[{"_id": 1}])
+    runner = JobRunner()
+    runner._database = database
+
+    asyncio.run(runner._run({"_id": 10, "params": {"user_id": 1}}))
+
+    assert database.jobs.updates[-1]["status"] == "failed"
+    assert "未被删除" in database.jobs.updates[-1]["error"]
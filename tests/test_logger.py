@@ -0,0 +1,69 @@
+"""
+日志配置测试
+"""
+import json
+
+import pytest
+from loguru import logger
+
+from app.core.config import settings
+from app.core.context import RequestContext, reset_request_context, set_request_context
+from app.core.logger import SizeOrTimeRotation, setup_logging
+
+
+@pytest.fixture
+def log_file(tmp_path, monkeypatch):
+    path = tmp_path / "app.log"
+    monkeypatch.setattr(settings, "LOG_FILE", str(path))
+    monkeypatch.setattr(settings, "LOG_JSON", True)
+    setup_logging()
+    yield path
+    monkeypatch.undo()
+    setup_logging()
+
+
+def test_json_log_lines_include_request_id_and_traceback(log_file):
+    """每行都是合法 JSON，异常堆栈在 exception 字段中，request_id 来自请求上下文"""
+    token = set_request_context(RequestContext({"type": "http", "path": "/items"}, request_id="req-1"))
+    try:
+        logger.info("处理请求")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("处理失败")
+    finally:
+        reset_request_context(token)
+    logger.bind(job="cleanup").warning("后台任务")
+    logger.complete()
+
+    records = [json.loads(line) for line in log_file.read_text(encoding="utf-8").splitlines()]
+    assert [record["message"] for record in records] == ["处理请求", "处理失败", "后台任务"]
+    assert [record["request_id"] for record in records] == ["req-1", "req-1", "-"]
+    assert records[0]["route"] == "/items"
+    assert "exception" not in records[0]
+    assert records[1]["exception"].startswith("Traceback (most recent call last):")
+    assert "ValueError: boom" in records[1]["exception"]
+    assert records[2]["extra"] == {"job": "cleanup"}
+
+
+class _File:
+    def __init__(self, size):
+        self.size = size
+
+    def tell(self):
+        return self.size
+
+
+def test_rotation_by_size_or_time(monkeypatch):
+    """超过大小或时间间隔任一条件即轮转"""
+    now = [1000.0]
+    monkeypatch.setattr("app.core.logger.time.time", lambda: now[0])
+    rotation = SizeOrTimeRotation(max_bytes=100, interval_seconds=60)
+
+    assert not rotation("x" * 10, _File(50))
+    assert rotation("x" * 60, _File(50))
+    now[0] += 30
+    assert not rotation("x", _File(0))
+    now[0] += 31
+    assert rotation("x", _File(0))
+    assert not rotation("x", _File(0))
@@ -0,0 +1,138 @@
+"""
+游标分页测试（使用内存中的集合代替 MongoDB）
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints.items import get_database_dependency
+from app.core.auth import get_current_active_user
+from app.models.user import UserDocument
+from app.utils.pagination import decode_cursor, encode_cursor
+from main import app
+
+
+def _sort_key(document: dict, field: str):
+    value = document[field]
+    return value.binary if isinstance(value, ObjectId) else value
+
+
+def _matches(document: dict, query: dict) -> bool:
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(document, branch) for branch in condition):
+                return False
+        elif isinstance(condition, dict):
+            if _sort_key(document, field) >= _sort_key({field: condition["$lt"]}, field):
+                return False
+        elif document[field] != condition:
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, documents):
+        self._documents = documents
+        self._limit = None
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self._documents.sort(key=lambda document: _sort_key(document, field), reverse=direction < 0)
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    async def to_list(self, length=None):
+        return self._documents[:self._limit]
+
+
+class _Collection:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection=None):
+        return _Cursor([dict(document) for document in self.documents if _matches(document, query)])
+
+
+class _Database:
+    def __init__(self, documents):
+        self.items = _Collection(documents)
+
+
+@pytest.fixture
+def owner():
+    return UserDocument(username="owner", email="owner@example.com", hashed_password="x")
+
+
+@pytest.fixture
+def client(owner):
+    created_at = datetime(2024, 1, 1)
+    documents = [
+        # 大多数物品的创建时间相同，只能靠 _id 区分先后
+        {"_id": ObjectId(), "title": f"item-{index}", "description": None, "price": 1.0,
+         "owner_id": owner.id, "created_at": created_at + timedelta(seconds=index // 5)}
+        for index in range(17)
+    ]
+    documents.append({"_id": ObjectId(), "title": "other", "description": None, "price": 1.0,
+                      "owner_id": ObjectId(), "created_at": created_at})
+    database = _Database(documents)
+    app.dependency_overrides[get_current_active_user] = lambda: owner
+    app.dependency_overrides[get_database_dependency] = lambda: database
+    yield TestClient(app), documents[:17]
+    app.dependency_overrides.clear()
+
+
+def test_cursor_roundtrip():
+    created_at, object_id = datetime(2024, 1, 1, 12, 30, 15, 123000), ObjectId()
+    assert decode_cursor(encode_cursor(created_at, object_id)) == (created_at, object_id)
+
+
+@pytest.mark.parametrize("cursor", ["", "abc", "!!!.???", "YWJj.YWJj", "YWJj"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_tampered_cursor_is_rejected():
+    """修改游标中的排序键后签名不再匹配"""
+    cursor = encode_cursor(datetime(2024, 1, 1), ObjectId())
+    payload, signature = cursor.split(".")
+    forged = encode_cursor(datetime(2030, 1, 1), ObjectId()).split(".")[0]
+    with pytest.raises(ValueError):
+        decode_cursor(f"{forged}.{signature}")
+    with pytest.raises(ValueError):
+        decode_cursor(f"{payload}.{signature[:-2]}AA")
+
+
+def test_paging_through_equal_sort_keys(client):
+    """创建时间相同的物品按 _id 倒序排列，逐页读取不重复、不遗漏"""
+    client, documents = client
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/v1/items/mine", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        seen += [item["id"] for item in page["items"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    expected = sorted(documents, key=lambda document: (document["created_at"], document["_id"].binary), reverse=True)
+    assert seen == [str(document["_id"]) for document in expected]
+    assert pages == 6
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(datetime(2024, 1, 1), ObjectId()) + "x"])
+def test_invalid_cursor_returns_400(client, cursor):
+    client, _ = client
+    response = client.get("/api/v1/items/mine", params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "无效的分页游标"
@@ -0,0 +1,127 @@
+"""
+物品价格历史测试（使用内存中的集合代替 MongoDB）
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.services.price_history import (
+    PENDING_PRICE_CHANGES_FIELD, PRICE_HISTORY_COLLECTION, bucket_start, get_price_history, new_price_change,
+    record_price_change, replay_pending_price_changes,
+)
+
+
+class _Cursor:
+    def __init__(self, documents):
+        self._documents = iter(documents)
+        self.sort_args = None
+
+    def sort(self, *args, **kwargs):
+        # 模拟 MongoDB：bucket_start 相同的桶之间顺序不确定，这里保持插入顺序
+        self.sort_args = args
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _Collection:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection=None):
+        self.cursor = _Cursor([document for document in self.documents if document["item_id"] == query["item_id"]])
+        return self.cursor
+
+    async def find_one(self, query, projection=None):
+        change_id = query["changes.change_id"]
+        for document in self.documents:
+            if document["item_id"] == query["item_id"] and any(
+                change["change_id"] == change_id for change in document["changes"]
+            ):
+                return {"_id": None}
+        return None
+
+    async def update_one(self, query, update, upsert=False):
+        for document in self.documents:
+            if (document["item_id"], document["bucket_start"]) == (query["item_id"], query["bucket_start"]):
+                break
+        else:
+            document = {"item_id": query["item_id"], "bucket_start": query["bucket_start"], "count": 0, "changes": []}
+            self.documents.append(document)
+        document["changes"].append(update["$push"]["changes"])
+        document["count"] += 1
+
+
+class _Items:
+    def __init__(self, documents):
+        self.documents = {document["_id"]: document for document in documents}
+
+    def find(self, query, projection=None):
+        return _Cursor([dict(document) for document in self.documents.values() if document[PENDING_PRICE_CHANGES_FIELD]])
+
+    async def update_one(self, query, update):
+        change_id = update["$pull"][PENDING_PRICE_CHANGES_FIELD]["change_id"]
+        document = self.documents[query["_id"]]
+        document[PENDING_PRICE_CHANGES_FIELD] = [
+            change for change in document[PENDING_PRICE_CHANGES_FIELD] if change["change_id"] != change_id
+        ]
+
+
+def _change(price, changed_at):
+    return {"price": price, "old_price": None, "changed_at": changed_at, "changed_by": None}
+
+
+def test_overflow_buckets_in_same_window_are_merged_before_limit():
+    """同一窗口的多个桶全部读取后再截断，不会漏掉时间更早的变更"""
+    item_id = ObjectId()
+    now = datetime(2024, 1, 1, 12)
+    start = bucket_start(now)
+    later = {"item_id": item_id, "bucket_start": start,
+             "changes": [_change(3.0, now + timedelta(minutes=2)), _change(4.0, now + timedelta(minutes=3))]}
+    earlier = {"item_id": item_id, "bucket_start": start,
+               "changes": [_change(1.0, now), _change(2.0, now + timedelta(minutes=1))]}
+    next_window = {"item_id": item_id, "bucket_start": start + timedelta(days=1),
+                   "changes": [_change(5.0, now + timedelta(days=1))]}
+    database = {PRICE_HISTORY_COLLECTION: _Collection([later, earlier, next_window])}
+
+    changes = asyncio.run(get_price_history(database, item_id, limit=2))
+
+    assert [change["price"] for change in changes] == [1.0, 2.0]
+    # 只按 (item_id, bucket_start) 索引中的字段排序
+    assert database[PRICE_HISTORY_COLLECTION].cursor.sort_args == ("bucket_start", 1)
+
+
+class _Database(dict):
+    def __init__(self, history, items):
+        super().__init__({PRICE_HISTORY_COLLECTION: history})
+        self.items = items
+
+
+def test_pending_changes_are_replayed_once():
+    """已写入历史但未移出待写列表的变更不会重复写入，未写入的变更在启动时补写"""
+    item_id = ObjectId()
+    now = datetime(2024, 1, 1, 12)
+    recorded = new_price_change(1.0, 2.0, changed_at=now)
+    lost = new_price_change(2.0, 3.0, changed_at=now + timedelta(minutes=1))
+    history = _Collection([])
+    database = _Database(history, _Items([{"_id": item_id, PENDING_PRICE_CHANGES_FIELD: [recorded, lost]}]))
+    asyncio.run(history.update_one(
+        {"item_id": item_id, "bucket_start": bucket_start(now)}, {"$push": {"changes": recorded}}, upsert=True
+    ))
+
+    assert asyncio.run(replay_pending_price_changes(database)) == 2
+    assert asyncio.run(replay_pending_price_changes(database)) == 0
+    assert database.items.documents[item_id][PENDING_PRICE_CHANGES_FIELD] == []
+    changes = asyncio.run(get_price_history(database, item_id))
+    assert [change["change_id"] for change in changes] == [recorded["change_id"], lost["change_id"]]
+
+    asyncio.run(record_price_change(database, item_id, lost))
+    assert len(asyncio.run(get_price_history(database, item_id))) == 2
@@ -0,0 +1,28 @@
+"""
+查询索引守卫测试
+"""
+from app.core.query_guard import _find_bad_stages, query_shape
+from app.services.items import build_item_query, parse_item_sort
+
+
+def test_query_shape_ignores_values():
+    """查询形状只与结构有关，与具体取值无关"""
+    first = query_shape("items", build_item_query(min_price=1, max_price=10), parse_item_sort("-price"))
+    second = query_shape("items", build_item_query(min_price=5, max_price=50), parse_item_sort("-price"))
+    third = query_shape("items", build_item_query(min_price=5), parse_item_sort("-price"))
+    assert first == second
+    assert first != third
+
+
+def test_find_bad_stages_in_winning_plan():
+    """识别执行计划中的全表扫描和内存排序"""
+    index_plan = {"stage": "LIMIT", "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}
+    sort_plan = {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}
+    assert _find_bad_stages(index_plan) == []
+    assert sorted(_find_bad_stages(sort_plan)) == ["COLLSCAN", "SORT"]
+
+
+def test_parse_item_sort_uses_id_tiebreak():
+    """排序以同方向的 _id 作为第二排序键"""
+    assert parse_item_sort("-price") == [("price", -1), ("_id", -1)]
+    assert parse_item_sort("title") == [("title", 1), ("_id", 1)]
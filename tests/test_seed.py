@@ -0,0 +1,79 @@
+"""
+测试数据生成脚本测试
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from app.models.item import ItemDocument
+from app.models.user import UserDocument
+from seed import ITEM_TAG, USER_TAG, generate_items, generate_users, load, make_object_id
+
+
+def test_same_seed_generates_identical_data():
+    assert generate_users(0, 20, "hash", seed=1) == generate_users(0, 20, "hash", seed=1)
+    assert generate_items(0, 50, 20, seed=1) == generate_items(0, 50, 20, seed=1)
+
+
+def test_seed_changes_ids_and_values():
+    first, second = generate_items(0, 50, 20, seed=1), generate_items(0, 50, 20, seed=2)
+    assert not {item["_id"] for item in first} & {item["_id"] for item in second}
+    assert [item["price"] for item in first] != [item["price"] for item in second]
+    assert make_object_id(USER_TAG, 1, 0) != make_object_id(ITEM_TAG, 1, 0)
+
+
+def test_batches_match_a_single_pass():
+    """分批并发生成与一次生成的结果相同（每批的随机数只取决于种子和起始行）"""
+    whole = generate_users(0, 30, "hash", seed=7)
+    assert generate_users(0, 10, "hash", seed=7) + generate_users(10, 20, "hash", seed=7) == whole
+
+
+def test_documents_match_models_and_reference_users():
+    users = generate_users(0, 10, "hash", seed=3)
+    items = generate_items(0, 100, 10, seed=3)
+
+    for user in users:
+        assert set(user) == {field.alias or name for name, field in UserDocument.model_fields.items()}
+        UserDocument(**user)
+    for item in items:
+        assert set(item) == {field.alias or name for name, field in ItemDocument.model_fields.items()}
+        ItemDocument(**item)
+    assert {item["owner_id"] for item in items} <= {user["_id"] for user in users}
+    assert len({item["_id"] for item in items}) == 100
+
+
+class _Collection:
+    name = "items"
+
+    def __init__(self, existing=(), error_code=11000):
+        self.ids = set(existing)
+        self.error_code = error_code
+
+    async def insert_many(self, documents, ordered=True):
+        errors = [
+            {"index": index, "code": self.error_code, "errmsg": "E11000 duplicate key"}
+            for index, document in enumerate(documents) if document["_id"] in self.ids
+        ]
+        for document in documents:
+            self.ids.add(document["_id"])
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(documents) - len(errors)})
+        return SimpleNamespace(inserted_ids=[document["_id"] for document in documents])
+
+
+def _generate(start, count):
+    return generate_items(start, count, 10, seed=5)
+
+
+def test_rerun_without_drop_skips_existing_documents():
+    collection = _Collection(existing=[item["_id"] for item in _generate(0, 30)])
+    asyncio.run(load(collection, 50, 10, 2, _generate))
+    assert len(collection.ids) == 50
+
+
+def test_other_write_errors_are_raised():
+    collection = _Collection(existing=[item["_id"] for item in _generate(0, 5)], error_code=121)
+    with pytest.raises(BulkWriteError):
+        asyncio.run(load(collection, 10, 10, 1, _generate))
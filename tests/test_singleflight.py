@@ -0,0 +1,98 @@
+"""
+请求合并（single-flight）测试
+"""
+import asyncio
+
+import pymongo
+import pytest
+from pymongo import _csot
+from pymongo.errors import ExecutionTimeout
+
+from app.core.config import settings
+from app.utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    """相同 key 的并发调用只执行一次"""
+    group = SingleFlight("test")
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": 42}
+
+    async def main():
+        return await asyncio.gather(*[group.do("key", fetch) for _ in range(10)])
+
+    results = asyncio.run(main())
+    assert calls == 1
+    assert all(result == {"value": 42} for result in results)
+    assert group.executed == 1
+    assert group.coalesced == 9
+    assert group.in_flight() == 0
+
+
+def test_errors_propagate_to_all_waiters():
+    """异常会传递给所有等待者，且不会被缓存"""
+    group = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*[group.do("key", fail) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+    async def ok():
+        return "ok"
+
+    assert asyncio.run(group.do("key", ok)) == "ok"
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    """发起者被取消时，其他等待者仍能拿到结果"""
+    group = SingleFlight("test")
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(group.do("key", fetch))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(group.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_each_waiter_uses_its_own_deadline():
+    """共享查询不继承发起者的超时，每个等待者只受自己的截止时间限制"""
+    group = SingleFlight("test")
+    seen = {}
+
+    async def fetch():
+        seen["timeout"] = _csot.get_timeout()
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def call(timeout):
+        with pymongo.timeout(timeout):
+            return await group.do("key", fetch)
+
+    async def main():
+        return await asyncio.gather(call(0.001), call(30), return_exceptions=True)
+
+    short, long = asyncio.run(main())
+    assert isinstance(short, ExecutionTimeout)
+    assert long == "done"
+    assert seen["timeout"] == settings.REQUEST_DEADLINE_MAX_MS / 1000
@@ -0,0 +1,102 @@
+"""
+物品列式快照测试
+"""
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.core.config import settings
+from app.services.snapshot import (
+    ItemSnapshot, SnapshotBuilder, _full_rebuild_due, compute_price_stats, to_micros,
+)
+
+
+def _item(price, owner_id, title="物品", created_at=datetime(2024, 1, 1), updated_at=None):
+    return {
+        "_id": ObjectId(), "price": price, "owner_id": owner_id, "title": title,
+        "created_at": created_at, "updated_at": updated_at,
+    }
+
+
+def test_snapshot_roundtrip_and_incremental_upsert(tmp_path):
+    """写入后可 mmap 读回；从已有快照继续构建时按 id 覆盖"""
+    path = str(tmp_path / "items.snapshot")
+    owner = ObjectId()
+    first, second = _item(10.0, owner, "苹果"), _item(20.0, owner, "苹果")
+    builder = SnapshotBuilder()
+    builder.upsert_many([first, second])
+    builder.write(path, datetime.utcnow())
+
+    with ItemSnapshot(path) as snapshot:
+        assert snapshot.rows == 2
+        assert list(snapshot.column("price")) == [10.0, 20.0]
+        assert list(snapshot.column("title")) == [0, 0]
+        assert snapshot.dictionary("title") == ["苹果"]
+        assert snapshot.dictionary_value("owner", 0) == str(owner)
+        # 每列按 8 字节对齐，numpy.memmap 可直接打开
+        assert all(column["offset"] % 8 == 0 for column in snapshot.header["columns"].values())
+        builder = SnapshotBuilder.from_snapshot(snapshot)
+
+    updated_at = datetime(2024, 2, 1)
+    first.update(price=15.0, updated_at=updated_at)
+    builder.upsert_many([first, _item(30.0, ObjectId(), "香蕉")])
+    builder.write(path, datetime.utcnow())
+
+    with ItemSnapshot(path) as snapshot:
+        assert snapshot.rows == 3
+        assert list(snapshot.column("price")) == [15.0, 20.0, 30.0]
+        assert snapshot.watermark == to_micros(updated_at)
+    # 临时文件替换后不残留
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["items.snapshot"]
+
+
+def test_price_stats(tmp_path):
+    """百分位数、直方图和按所有者汇总"""
+    path = str(tmp_path / "items.snapshot")
+    rich, poor = ObjectId(), ObjectId()
+    builder = SnapshotBuilder()
+    builder.upsert_many([_item(float(price), rich if price > 50 else poor) for price in range(1, 101)])
+    builder.write(path, datetime.utcnow())
+
+    with ItemSnapshot(path) as snapshot:
+        stats = compute_price_stats(snapshot, bins=4, top_owners=1)
+
+    assert stats["rows"] == 100
+    assert stats["sum"] == 5050.0
+    assert stats["percentiles"]["p50"] == 50.5
+    assert [bucket["count"] for bucket in stats["histogram"]] == [25, 25, 25, 25]
+    assert stats["top_owners"] == [{"owner_id": str(rich), "count": 50, "sum": 3775.0}]
+
+
+def test_unused_dictionary_values_are_dropped(tmp_path):
+    """改名后旧标题不再留在字典中，编码随之重排"""
+    path = str(tmp_path / "items.snapshot")
+    owner = ObjectId()
+    first, second = _item(10.0, owner, "旧标题"), _item(20.0, owner, "苹果")
+    builder = SnapshotBuilder()
+    builder.upsert_many([first, second])
+    builder.write(path, datetime.utcnow())
+
+    first.update(title="香蕉", updated_at=datetime(2024, 2, 1))
+    with ItemSnapshot(path) as snapshot:
+        builder = SnapshotBuilder.from_snapshot(snapshot)
+    builder.upsert(first)
+    builder.write(path, datetime.utcnow())
+
+    with ItemSnapshot(path) as snapshot:
+        assert snapshot.dictionary("title") == ["苹果", "香蕉"]
+        assert [snapshot.dictionary_value("title", code) for code in snapshot.column("title")] == ["香蕉", "苹果"]
+        assert snapshot.dictionary("owner") == [str(owner)]
+
+
+def test_full_rebuild_is_due_after_interval(monkeypatch):
+    """超过 SNAPSHOT_FULL_REBUILD_HOURS 或没有全量构建记录时改为全量重建"""
+    monkeypatch.setattr(settings, "SNAPSHOT_FULL_REBUILD_HOURS", 24)
+    builder = SnapshotBuilder()
+    assert _full_rebuild_due(builder)
+    builder.full_built_at = to_micros(datetime.utcnow() - timedelta(hours=1))
+    assert not _full_rebuild_due(builder)
+    builder.full_built_at = to_micros(datetime.utcnow() - timedelta(hours=25))
+    assert _full_rebuild_due(builder)
+    monkeypatch.setattr(settings, "SNAPSHOT_FULL_REBUILD_HOURS", 0)
+    assert not _full_rebuild_due(builder)
@@ -0,0 +1,149 @@
+"""
+用户概览测试（用一个只支持概览管道所需阶段的内存聚合代替 MongoDB）
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.models.user import UserSummary
+from app.services.items import to_item_response
+from app.services.users import get_user_summary, to_user_response, user_summary_pipeline
+
+
+def _project(document: dict, spec: dict) -> dict:
+    if all(not value for value in spec.values()):
+        return {field: value for field, value in document.items() if field not in spec}
+    return {field: value for field, value in document.items() if field == "_id" or spec.get(field)}
+
+
+def _group(documents: list, spec: dict) -> list:
+    # 输入为空时 $group 不输出文档
+    if not documents:
+        return []
+    result = {"_id": spec["_id"]}
+    for name, accumulator in spec.items():
+        if name == "_id":
+            continue
+        (operator, expression), = accumulator.items()
+        values = [1 if expression == 1 else document[expression[1:]] for document in documents]
+        result[name] = {"$sum": sum, "$min": min, "$max": max, "$avg": lambda v: sum(v) / len(v)}[operator](values)
+    return [result]
+
+
+def _sort(documents: list, spec: dict) -> list:
+    for field, direction in reversed(list(spec.items())):
+        documents = sorted(documents, key=lambda document: _key(document[field]), reverse=direction < 0)
+    return documents
+
+
+def _key(value):
+    return value.binary if isinstance(value, ObjectId) else value
+
+
+def _aggregate(collections: dict, documents: list, pipeline: list) -> list:
+    for stage in pipeline:
+        (operator, spec), = stage.items()
+        if operator == "$match":
+            documents = [d for d in documents if all(d.get(field) == value for field, value in spec.items())]
+        elif operator == "$lookup":
+            joined = _aggregate(collections, collections[spec["from"]], spec["pipeline"])
+            documents = [dict(document, **{spec["as"]: joined}) for document in documents]
+        elif operator == "$facet":
+            documents = [{name: _aggregate(collections, documents, branch) for name, branch in spec.items()}]
+        elif operator == "$group":
+            documents = _group(documents, spec)
+        elif operator == "$sort":
+            documents = _sort(documents, spec)
+        elif operator == "$limit":
+            documents = documents[:spec]
+        elif operator == "$project":
+            documents = [_project(document, spec) for document in documents]
+        else:
+            raise AssertionError(f"不支持的阶段 {operator}")
+    return documents
+
+
+class _AggregateCursor:
+    def __init__(self, documents):
+        self._documents = documents
+
+    async def to_list(self, length=None):
+        return self._documents[:length]
+
+
+class _Users:
+    def __init__(self, collections):
+        self._collections = collections
+
+    def aggregate(self, pipeline):
+        return _AggregateCursor(_aggregate(self._collections, self._collections["users"], pipeline))
+
+
+class _Database:
+    def __init__(self, users, items):
+        self.users = _Users({"users": users, "items": items})
+
+
+def _multi_query_summary(users: list, items: list, user_id: ObjectId, recent: int):
+    """改为单次聚合之前的做法：分别查询用户、统计物品、读取最近的物品"""
+    user = next((user for user in users if user["_id"] == user_id), None)
+    if user is None:
+        return None
+    owned = [item for item in items if item["owner_id"] == user_id]
+    prices = [item["price"] for item in owned]
+    latest = sorted(owned, key=lambda item: (item["created_at"], item["_id"].binary), reverse=True)[:recent]
+    return UserSummary(
+        user=to_user_response(user),
+        item_count=len(owned),
+        price_total=sum(prices),
+        price_avg=sum(prices) / len(prices) if prices else None,
+        price_min=min(prices, default=None),
+        price_max=max(prices, default=None),
+        recent_items=[to_item_response(item) for item in latest],
+    )
+
+
+def _fixture():
+    now = datetime(2024, 1, 1)
+    users = [
+        {"_id": ObjectId(), "username": name, "email": f"{name}@example.com", "hashed_password": "secret",
+         "is_active": True, "is_superuser": False, "created_at": now}
+        for name in ("seller", "buyer")
+    ]
+    seller, other = users[0]["_id"], ObjectId()
+    items = [
+        {"_id": ObjectId(), "title": f"item-{index}", "description": None, "price": float(index + 1),
+         "owner_id": seller if index % 3 else other, "created_at": now + timedelta(minutes=index // 2)}
+        for index in range(12)
+    ]
+    return users, items
+
+
+def test_summary_matches_multi_query_result():
+    """单次聚合的结果与分别查询的结果一致，包括没有物品的用户"""
+    users, items = _fixture()
+    database = _Database(users, items)
+    for user in users:
+        summary = asyncio.run(get_user_summary(database, user["_id"], recent=3))
+        assert summary == _multi_query_summary(users, items, user["_id"], 3)
+
+    # 密码哈希在聚合中就被去掉，不会离开数据库
+    documents = asyncio.run(database.users.aggregate(user_summary_pipeline(users[0]["_id"], 3)).to_list(1))
+    assert "hashed_password" not in documents[0]
+
+    empty = asyncio.run(get_user_summary(database, users[1]["_id"]))
+    assert (empty.item_count, empty.price_total, empty.price_avg, empty.recent_items) == (0, 0.0, None, [])
+    assert asyncio.run(get_user_summary(database, ObjectId())) is None
+
+
+def test_pipeline_runs_one_lookup_on_owner_index():
+    """$lookup 子管道以 owner_id 过滤开头，最近物品按索引顺序排序"""
+    user_id = ObjectId()
+    pipeline = user_summary_pipeline(user_id, 5)
+    lookup = pipeline[1]["$lookup"]
+    assert lookup["pipeline"][0] == {"$match": {"owner_id": user_id}}
+    recent = lookup["pipeline"][1]["$facet"]["recent"]
+    assert list(recent[0]["$sort"].items()) == [("created_at", -1), ("_id", -1)]
+    assert recent[1] == {"$limit": 5}
+    assert pipeline[-1] == {"$project": {"hashed_password": 0}}
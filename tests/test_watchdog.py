@@ -0,0 +1,45 @@
+"""
+事件循环阻塞监控测试
+"""
+import asyncio
+import time
+
+from app.core.context import RequestContext
+from app.core.watchdog import BlockingWatchdog
+
+
+def test_blocking_call_is_reported_with_route():
+    """同步阻塞调用会被检测到，并记录所属路由和调用栈"""
+    watchdog = BlockingWatchdog(threshold_ms=50)
+
+    async def blocking_handler():
+        context = RequestContext({"type": "http", "method": "GET", "path": "/blocking"})
+        time.sleep(0.3)
+        return context
+
+    async def main():
+        watchdog.start()
+        await asyncio.sleep(0.05)
+        await blocking_handler()
+        await asyncio.sleep(0.05)
+        await watchdog.stop()
+
+    asyncio.run(main())
+
+    assert watchdog.incidents["/blocking"] == 1
+    assert "time.sleep" in watchdog.last_incident["stack"]
+
+
+def test_yielding_loop_is_not_reported():
+    """正常让出控制权的事件循环不会被误报"""
+    watchdog = BlockingWatchdog(threshold_ms=50)
+
+    async def main():
+        watchdog.start()
+        for _ in range(20):
+            await asyncio.sleep(0.01)
+        await watchdog.stop()
+
+    asyncio.run(main())
+
+    assert sum(watchdog.incidents.values()) == 0
@@ -0,0 +1,215 @@
+"""
+Webhook 投递测试（使用本地 HTTP 服务作为接收方）
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services.events import EventHub
+from app.services.webhooks import (
+    SIGNATURE_HEADER,
+    WebhookDispatcher,
+    WebhookURLError,
+    sign_payload,
+    validate_webhook_url,
+)
+
+
+class _Receiver(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path == "/slow":
+            time.sleep(0.5)
+        self.server.received.append((self.path, dict(self.headers), body))
+        self.send_response(500 if self.path == "/fail" else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def receiver(monkeypatch):
+    # 本地接收方走 http 且是回环地址，需要加入白名单
+    monkeypatch.setattr(settings, "WEBHOOK_ALLOWED_HOSTS", ["127.0.0.1"])
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Receiver)
+    server.received = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _dispatcher() -> WebhookDispatcher:
+    return WebhookDispatcher(
+        queue_size=100, workers=1, batch_size=10, batch_wait_ms=50, max_retries=2, retry_backoff_ms=10,
+        endpoint_queue_size=10,
+    )
+
+
+def test_events_are_batched_per_endpoint(receiver):
+    """一批事件对每个订阅地址只发送一次，并按订阅的事件类型过滤"""
+    base = f"http://127.0.0.1:{receiver.server_port}"
+    dispatcher = _dispatcher()
+    hub = EventHub(queue_size=10, max_subscribers=10)
+
+    async def main():
+        await dispatcher.start(None, dead_letter=lambda record: asyncio.sleep(0))
+        dispatcher.set_subscriptions([
+            {"_id": 1, "url": f"{base}/all", "events": [], "secret": "s3cret-key"},
+            {"_id": 2, "url": f"{base}/deleted", "events": ["item.deleted"]},
+        ])
+        hub.add_listener(dispatcher.enqueue)
+        for index in range(5):
+            hub.publish("item.created", {"id": str(index)})
+        hub.publish("item.deleted", {"id": "0"})
+        await dispatcher.stop()
+
+    asyncio.run(main())
+
+    by_path = {path: (headers, json.loads(body)) for path, headers, body in receiver.received}
+    assert len(receiver.received) == 2
+    headers, payload = by_path["/all"]
+    assert [event["type"] for event in payload["events"]] == ["item.created"] * 5 + ["item.deleted"]
+    body = next(body for path, _, body in receiver.received if path == "/all")
+    assert headers[SIGNATURE_HEADER] == sign_payload("s3cret-key", body)
+    assert [event["type"] for event in by_path["/deleted"][1]["events"]] == ["item.deleted"]
+    assert dispatcher.delivered == 7
+
+
+def test_failed_delivery_is_retried_then_dead_lettered(receiver):
+    """5xx 按重试次数重试，耗尽后写入死信"""
+    dead_letters = []
+    dispatcher = _dispatcher()
+
+    async def sink(record):
+        dead_letters.append(record)
+
+    async def main():
+        await dispatcher.start(None, dead_letter=sink)
+        dispatcher.set_subscriptions([
+            {"_id": 1, "url": f"http://127.0.0.1:{receiver.server_port}/fail", "events": []},
+        ])
+        dispatcher.enqueue("item.updated", {"id": "1"})
+        await dispatcher.stop()
+
+    asyncio.run(main())
+
+    assert len(receiver.received) == 3
+    assert len(dead_letters) == 1
+    assert dead_letters[0]["attempts"] == 3
+    assert dead_letters[0]["error"] == "HTTP 500"
+    assert dead_letters[0]["events"][0]["data"] == {"id": "1"}
+
+
+@pytest.mark.parametrize("url", [
+    "http://example.com/hook",
+    "https://127.0.0.1/hook",
+    "https://10.0.0.5/hook",
+    "https://169.254.169.254/latest/meta-data",
+    "https://[::1]/hook",
+    "https://[::ffff:192.168.1.1]/hook",
+    "https://localhost/hook",
+])
+def test_non_public_webhook_urls_are_rejected(url):
+    """非 https 或解析到内网/回环/链路本地地址的地址不允许注册"""
+    with pytest.raises(WebhookURLError):
+        asyncio.run(validate_webhook_url(url))
+
+
+def test_public_webhook_url_is_accepted():
+    asyncio.run(validate_webhook_url("https://8.8.8.8/hook"))
+
+
+def test_private_subscription_is_dead_lettered_without_request(receiver, monkeypatch):
+    """投递时重新校验地址，已不在白名单的内网地址直接写入死信，不发送请求"""
+    dead_letters = []
+    dispatcher = _dispatcher()
+
+    async def sink(record):
+        dead_letters.append(record)
+
+    async def main():
+        await dispatcher.start(None, dead_letter=sink)
+        dispatcher.set_subscriptions([
+            {"_id": 1, "url": f"http://127.0.0.1:{receiver.server_port}/all", "events": []},
+        ])
+        monkeypatch.setattr(settings, "WEBHOOK_ALLOWED_HOSTS", [])
+        dispatcher.enqueue("item.updated", {"id": "1"})
+        await dispatcher.stop()
+
+    asyncio.run(main())
+
+    assert receiver.received == []
+    assert len(dead_letters) == 1
+    assert dead_letters[0]["attempts"] == 0
+    assert "https" in dead_letters[0]["error"]
+
+
+def test_connection_to_private_address_is_refused(monkeypatch):
+    """连接时再次校验解析结果，校验后被改指到内网的域名无法连接"""
+    dispatcher = _dispatcher()
+
+    async def main():
+        await dispatcher.start(None, dead_letter=lambda record: asyncio.sleep(0))
+        try:
+            with pytest.raises(httpx.ConnectError) as excinfo:
+                await dispatcher._client.post("https://localhost:1/hook", content=b"{}")
+        finally:
+            await dispatcher.stop()
+        return excinfo.value
+
+    error = asyncio.run(main())
+    assert "非公网地址" in str(error)
+
+
+def test_slow_endpoint_does_not_block_other_subscriptions(receiver):
+    """每个订阅独立投递，慢速地址不会拖慢其他订阅"""
+    base = f"http://127.0.0.1:{receiver.server_port}"
+    dispatcher = _dispatcher()
+
+    async def main():
+        await dispatcher.start(None, dead_letter=lambda record: asyncio.sleep(0))
+        dispatcher.set_subscriptions([
+            {"_id": 1, "url": f"{base}/slow", "events": []},
+            {"_id": 2, "url": f"{base}/fast", "events": []},
+        ])
+        for index in range(2):
+            dispatcher.enqueue("item.created", {"id": str(index)})
+            await asyncio.sleep(0.15)
+        fast_paths = [path for path, _, _ in receiver.received]
+        await dispatcher.stop()
+        return fast_paths
+
+    paths_before_stop = asyncio.run(main())
+    assert paths_before_stop == ["/fast", "/fast"]
+    assert sorted(path for path, _, _ in receiver.received) == ["/fast", "/fast", "/slow", "/slow"]
+
+
+def test_blocked_address_is_not_retried(receiver):
+    """连接时解析到不允许的地址直接写入死信，不重试"""
+    dead_letters = []
+    dispatcher = _dispatcher()
+
+    async def sink(record):
+        dead_letters.append(record)
+
+    async def main():
+        await dispatcher.start(None, dead_letter=sink)
+        dispatcher.set_subscriptions([{"_id": 1, "url": "https://127.0.0.2:1/hook", "events": []}])
+        dispatcher.enqueue("item.updated", {"id": "1"})
+        await dispatcher.stop()
+
+    asyncio.run(main())
+
+    assert len(dead_letters) == 1
+    assert dead_letters[0]["attempts"] == 1
+    assert "非公网地址" in dead_letters[0]["error"]